@@ -16,10 +16,42 @@ In addition, you should have the following subfolders
     Sounds        (sound effects for the game)
     Images        (image files to use in the game)
 
-Moving any of these folders or files will prevent the game from working properly"""
+Moving any of these folders or files will prevent the game from working properly
+
+To play, type (in the folder that holds this one)
+
+    python breakout [settings] [--record FILE] [--telemetry FILE] [--memory FILE]
+
+where the settings are described in constants.parseArgs.  The options record the
+session (see replay.py), the telemetry events (see telemetry.py) and a memory
+report (see memory.py) to the given files."""
+import argparse
+import os
+
+# The game has its own options, so Kivy must not read the command line
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+import breakout
 from constants import *
 from breakout import *
 
 # Application code
 if __name__ == '__main__':
-    Breakout(width=GAME_WIDTH,height=GAME_HEIGHT).run()
+    parser = argparse.ArgumentParser(description='Play Breakout.')
+    parser.add_argument('settings', nargs='*',
+                        help='bricks in a row and rows, a level file, or a profile')
+    # The files set in constants.py are the defaults
+    parser.add_argument('--record', metavar='FILE', default=REPLAY_FILE,
+                        help='record the session to FILE (see replay.py)')
+    parser.add_argument('--telemetry', metavar='FILE', default=TELEMETRY_FILE,
+                        help='record telemetry events to FILE (see telemetry.py)')
+    parser.add_argument('--memory', metavar='FILE', default=MEMORY_REPORT,
+                        help='track memory and write a report to FILE at exit')
+    args = parser.parse_args()
+
+    config = parseArgs(args.settings)
+    breakout.GAME_CONFIG = config
+    breakout.REPLAY_FILE = args.record
+    breakout.TELEMETRY_FILE = args.telemetry
+    breakout.MEMORY_REPORT = args.memory
+    Breakout(width=config.GAME_WIDTH,height=config.GAME_HEIGHT,fps=config.FRAME_RATE).run()
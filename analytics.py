@@ -0,0 +1,429 @@
+# analytics.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Analytics module for Breakout
+
+This module summarizes telemetry files (see telemetry.py).  It computes
+
+    * a heatmap of the bricks destroyed in each cell of the brick grid
+    * a histogram of the time it takes to clear the wall
+    * histograms of where the ball was missed, both across the screen and
+      relative to the center of the paddle
+    * frame time percentiles for each build
+
+The files are never loaded all at once.  Each file is read as a stream of
+events, cut into chunks of CHUNK events, and each chunk is added to NumPy
+histograms and grids of a fixed size.  So memory use does not depend on the
+size of the files.  A Summary of one file can be merged with the Summary of
+another, so the files are analyzed in parallel by a pool of processes and the
+results are added up at the end.
+
+The build of a file is the name of the folder it is in, so the logs of each
+build should be kept in their own folder, as in logs/<build>/events.jsonl.
+
+The brick grid, the width of the screen and the width of the paddle are taken
+from the settings of the games played (a GameConfig), so all of the files of
+one analysis must be of games with the same settings.
+
+To analyze files (or folders of files), type
+
+    python analytics.py [-j processes] [--profile name] [--level file.lvl] [--save out.npz] path ...
+
+where name is a key of PROFILES (default: classic)."""
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import numpy
+from constants import *
+from telemetry import *
+
+
+#: the number of events in a chunk
+CHUNK = 65536
+
+#: the bin edges for time to clear, in seconds
+CLEAR_BINS = numpy.linspace(0.0, 600.0, 121)
+#: the number of bins for the x position of a missed ball, across the screen
+MISS_BINS = 48
+#: the number of bins for a missed ball relative to the paddle center, over
+#: twice the width of the screen
+OFFSET_BINS = 96
+#: the bin edges for frame (update) times, in seconds, from 1 microsecond to 1 second
+FRAME_BINS = numpy.logspace(-6, 0, 121)
+
+#: the percentiles reported for frame times
+PERCENTILES = (50, 90, 99, 99.9)
+
+# The dtype of a chunk of events
+_EVENT_DTYPE = numpy.dtype([('t', '<f8'), ('kind', 'u1'), ('a', '<f8'), ('b', '<f8')])
+
+
+class Summary(object):
+    """An instance holds the aggregates of one or more telemetry files.
+
+    All aggregates are arrays of a fixed size, so summaries of games with the
+    same settings can be merged by adding them.
+
+    INSTANCE ATTRIBUTES:
+        _config  [GameConfig]: the settings of the games summarized
+        _missbins   [float array]: the bin edges for missed ball x, across the screen
+        _offsetbins [float array]: the bin edges for missed ball x relative to
+                 the paddle center
+        _heat    [int array (rows, columns)]: bricks destroyed per grid cell
+        _outside [int >= 0]: brick events outside the grid, which are not in _heat
+        _clear   [int array]: histogram of the time to clear, over CLEAR_BINS
+        _miss    [int array]: histogram of missed ball x, over _missbins
+        _offset  [int array]: histogram of missed ball x minus paddle center,
+                 over _offsetbins
+        _frames  [dict of str to int array]: histogram of update times per
+                 build, over FRAME_BINS
+        _games   [int >= 0]: the number of games completed
+        _wins    [int >= 0]: the number of games won
+        _events  [int >= 0]: the number of events read
+        _start   [float or None]: the start time of the game being read
+        _last    [int or None]: the kind (EVENT_BRICK or EVENT_LOST) of the
+                 last brick or lost event of the game being read
+    """
+
+    # GETTERS AND SETTERS
+
+    def getConfig(self):
+        """Returns: the settings of the games summarized"""
+        return self._config
+
+    def getHeat(self):
+        """Returns: the number of bricks destroyed per grid cell"""
+        return self._heat
+
+    def getOutside(self):
+        """Returns: the number of brick events outside the grid
+
+        These are not counted in getHeat.  If there are any, the files are of
+        games with other settings than this summary."""
+        return self._outside
+
+    def getClear(self):
+        """Returns: the histogram of time to clear (over CLEAR_BINS)"""
+        return self._clear
+
+    def getMiss(self):
+        """Returns: the histogram of missed ball positions (over getMissBins)"""
+        return self._miss
+
+    def getMissBins(self):
+        """Returns: the bin edges of getMiss, across the screen"""
+        return self._missbins
+
+    def getOffset(self):
+        """Returns: the histogram of missed ball positions relative to the
+        paddle center (over getOffsetBins)"""
+        return self._offset
+
+    def getOffsetBins(self):
+        """Returns: the bin edges of getOffset"""
+        return self._offsetbins
+
+    def getGames(self):
+        """Returns: the number of games completed"""
+        return self._games
+
+    def getWins(self):
+        """Returns: the number of games won"""
+        return self._wins
+
+    def getEvents(self):
+        """Returns: the number of events read"""
+        return self._events
+
+    def getBuilds(self):
+        """Returns: the sorted list of builds with frame times"""
+        return sorted(self._frames)
+
+    def getFrameTimes(self, build):
+        """Returns: a dictionary of frame time percentiles for the build
+
+        The keys are PERCENTILES and the values are in seconds.  A percentile
+        is the upper edge of the FRAME_BINS bin it falls in.
+
+            :param build: the build
+            **Precondition**: a value in getBuilds()"""
+        counts = numpy.cumsum(self._frames[build])
+        result = {}
+        for percent in PERCENTILES:
+            index = numpy.searchsorted(counts, counts[-1]*percent/100.0)
+            result[percent] = FRAME_BINS[min(index+1, len(FRAME_BINS)-1)]
+        return result
+
+    def __init__(self, config=None):
+        """Initialize an empty summary for games with the given settings.
+
+        The brick grid is the grid of the level file of the settings, if they
+        have one, and BRICKS_IN_ROW x BRICK_ROWS otherwise.
+
+            :param config: the settings of the games
+            **Precondition**: a GameConfig, or None for DEFAULT_CONFIG"""
+        self._config = DEFAULT_CONFIG if config is None else config
+        width = self._config.GAME_WIDTH
+        self._missbins   = numpy.linspace(0.0, width, MISS_BINS+1)
+        self._offsetbins = numpy.linspace(-width, width, OFFSET_BINS+1)
+
+        columns, rows = _grid(self._config)
+        self._heat   = numpy.zeros((rows, columns), dtype=numpy.int64)
+        self._outside = 0
+        self._clear  = numpy.zeros(len(CLEAR_BINS)-1, dtype=numpy.int64)
+        self._miss   = numpy.zeros(MISS_BINS, dtype=numpy.int64)
+        self._offset = numpy.zeros(OFFSET_BINS, dtype=numpy.int64)
+        self._frames = {}
+        self._games  = 0
+        self._wins   = 0
+        self._events = 0
+        self._start  = None
+        self._last   = None
+
+    def add(self, chunk, build):
+        """Adds a chunk of events from one file.
+
+        The chunks of a file must be added in order.
+
+            :param chunk: the events
+            **Precondition**: a NumPy array with dtype _EVENT_DTYPE
+
+            :param build: the build that recorded the events
+            **Precondition**: a string"""
+        self._events += len(chunk)
+        kind = chunk['kind']
+
+        # Bricks destroyed per cell (events outside the grid are only counted)
+        bricks = chunk[kind == EVENT_BRICK]
+        rows = bricks['a'].astype(int)
+        cols = bricks['b'].astype(int)
+        inside = (rows >= 0) & (rows < self._heat.shape[0]) & \
+                 (cols >= 0) & (cols < self._heat.shape[1])
+        numpy.add.at(self._heat, (rows[inside], cols[inside]), 1)
+        self._outside += len(bricks) - int(inside.sum())
+
+        # Missed balls
+        lost = chunk[kind == EVENT_LOST]
+        self._miss += numpy.histogram(lost['a'], self._missbins)[0]
+        center = lost['b'] + self._config.PADDLE_WIDTH/2.0
+        self._offset += numpy.histogram(lost['a'] - center, self._offsetbins)[0]
+
+        # Frame times
+        frames = chunk[kind == EVENT_FRAME]
+        if len(frames):
+            times = numpy.clip(frames['b'], FRAME_BINS[0], FRAME_BINS[-1])
+            if build not in self._frames:
+                self._frames[build] = numpy.zeros(len(FRAME_BINS)-1, dtype=numpy.int64)
+            self._frames[build] += numpy.histogram(times, FRAME_BINS)[0]
+
+        # Games are found in order from the few state, brick and lost events
+        steps = chunk[(kind == EVENT_STATE) | (kind == EVENT_BRICK) | (kind == EVENT_LOST)]
+        clears = []
+        for stamp, event, old, new in steps.tolist():
+            if event != EVENT_STATE:
+                self._last = event
+            elif new == STATE_COUNTDOWN and old in (STATE_INACTIVE, STATE_COMPLETE):
+                self._start = stamp
+                self._last = None
+            elif new == STATE_COMPLETE and self._start is not None:
+                self._games += 1
+                if self._last == EVENT_BRICK:
+                    self._wins += 1
+                    clears.append(stamp - self._start)
+                self._start = None
+        if clears:
+            self._clear += numpy.histogram(numpy.clip(clears, 0, CLEAR_BINS[-1]), CLEAR_BINS)[0]
+
+    def merge(self, other):
+        """Adds the aggregates of another summary to this one.
+
+        The game being read (if any) is not carried over.
+
+            :param other: the summary to add
+            **Precondition**: a Summary of games with the same settings"""
+        assert self._heat.shape == other._heat.shape, 'the brick grids do not match'
+        assert (self._missbins == other._missbins).all() and \
+            self._config.PADDLE_WIDTH == other._config.PADDLE_WIDTH, 'the settings do not match'
+        self._heat += other._heat
+        self._outside += other._outside
+        self._clear += other._clear
+        self._miss += other._miss
+        self._offset += other._offset
+        for build, counts in other._frames.items():
+            if build in self._frames:
+                self._frames[build] += counts
+            else:
+                self._frames[build] = counts.copy()
+        self._games += other._games
+        self._wins += other._wins
+        self._events += other._events
+
+    def save(self, path):
+        """Saves the aggregates to a NumPy .npz file.
+
+            :param path: the file to save to
+            **Precondition**: a string"""
+        frames = dict(('frames_'+build, counts) for build, counts in self._frames.items())
+        numpy.savez(path, heat=self._heat, clear=self._clear, clear_bins=CLEAR_BINS,
+                    miss=self._miss, miss_bins=self._missbins, offset=self._offset,
+                    offset_bins=self._offsetbins, frame_bins=FRAME_BINS,
+                    games=self._games, wins=self._wins, **frames)
+
+    def report(self):
+        """Returns: a text report of the aggregates"""
+        lines = ['%d events, %d games completed, %d won (%s)' %
+                 (self._events, self._games, self._wins, self._config.getName())]
+
+        if self._wins:
+            counts = numpy.cumsum(self._clear)
+            middle = numpy.searchsorted(counts, counts[-1]/2.0)
+            lines.append('median time to clear: %.0f-%.0f s' %
+                         (CLEAR_BINS[middle], CLEAR_BINS[middle+1]))
+
+        lines.append('bricks destroyed per cell (top row first):')
+        for row in self._heat:
+            lines.append('  ' + ' '.join(['%6d' % count for count in row]))
+        if self._outside:
+            lines.append('warning: %d bricks destroyed outside the %d x %d grid '
+                         '(were the games played with other settings?)' %
+                         (self._outside, self._heat.shape[1], self._heat.shape[0]))
+
+        if self._miss.sum():
+            worst = numpy.argmax(self._miss)
+            lines.append('most misses at x = %.0f-%.0f' %
+                         (self._missbins[worst], self._missbins[worst+1]))
+            right = self._offset[len(self._offset)//2:].sum()
+            lines.append('misses right of paddle center: %.1f%%' %
+                         (100.0*right/self._offset.sum()))
+
+        for build in self.getBuilds():
+            times = self.getFrameTimes(build)
+            lines.append('frame times for %s: ' % build + ', '.join(
+                ['p%g %.3f ms' % (percent, times[percent]*1000) for percent in PERCENTILES]))
+        return '\n'.join(lines)
+
+
+def chunks(path, size=CHUNK):
+    """Returns: a generator of the events in a telemetry file, in chunks
+
+    Each chunk is a NumPy array with fields t, kind, a and b, and at most size
+    events.  Binary files are read straight into the arrays.
+
+        :param path: the file to read
+        **Precondition**: a string, the name of a telemetry file
+
+        :param size: the largest number of events in a chunk
+        **Precondition**: an int > 0"""
+    if path.endswith('.jsonl') or '.jsonl.' in path:
+        events = read(path)
+        while True:
+            block = list(itertools.islice(events, size))
+            if not block:
+                break
+            yield numpy.array(block, dtype=_EVENT_DTYPE)
+    else:
+        with open(path, 'rb') as file:
+            while True:
+                data = file.read(size*EVENT.size)
+                if len(data) < EVENT.size:
+                    break
+                yield numpy.frombuffer(data[:len(data)-len(data) % EVENT.size],
+                                       dtype=_EVENT_DTYPE)
+
+
+def analyze(path, config=None):
+    """Returns: the Summary of a single telemetry file
+
+        :param path: the file to read
+        **Precondition**: a string, the name of a telemetry file
+
+        :param config: the settings of the games in the file
+        **Precondition**: a GameConfig, or None for DEFAULT_CONFIG"""
+    build = os.path.basename(os.path.dirname(os.path.abspath(path)))
+    summary = Summary(config)
+    for chunk in chunks(path):
+        summary.add(chunk, build)
+    return summary
+
+
+def analyzeAll(paths, config=None, processes=None):
+    """Returns: the merged Summary of many telemetry files
+
+    The files are analyzed in parallel by a pool of processes.
+
+        :param paths: the files to read
+        **Precondition**: a list of strings, the names of telemetry files
+
+        :param config: the settings of the games in the files
+        **Precondition**: a GameConfig, or None for DEFAULT_CONFIG
+
+        :param processes: the number of processes
+        **Precondition**: an int > 0, or None for one per CPU"""
+    total = Summary(config)
+    if processes == 1 or len(paths) <= 1:
+        for path in paths:
+            total.merge(analyze(path, config))
+        return total
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        jobs = [(path, config) for path in paths]
+        for summary in pool.imap_unordered(_analyzeJob, jobs):
+            total.merge(summary)
+    finally:
+        pool.close()
+        pool.join()
+    return total
+
+
+def _analyzeJob(job):
+    """Returns: analyze(*job); a helper for the process pool"""
+    return analyze(*job)
+
+
+def _grid(config):
+    """Returns: the brick grid (columns, rows) of the games with the given settings
+
+        :param config: the settings of the games
+        **Precondition**: a GameConfig"""
+    if config.LEVEL_FILE is None:
+        return config.BRICKS_IN_ROW, config.BRICK_ROWS
+    from levels import LevelFile # local, as most analyses have no level file
+    with LevelFile(config.LEVEL_FILE) as level:
+        return level.getColumns(), level.getRows()
+
+
+def _files(paths):
+    """Returns: a generator of the files given, and of the files in the folders given"""
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, subfolders, names in os.walk(path):
+                subfolders.sort()
+                for name in sorted(names):
+                    yield os.path.join(folder, name)
+        else:
+            yield path
+
+
+# Application code
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summarize Breakout telemetry files.')
+    parser.add_argument('paths', nargs='+', help='telemetry files or folders of them')
+    parser.add_argument('-j', type=int, default=None, dest='processes',
+                        help='number of processes (default: one per CPU)')
+    parser.add_argument('--profile', default='classic', choices=sorted(PROFILES),
+                        help='the settings of the games that were played (default: classic)')
+    parser.add_argument('--level', help='the level file that was played')
+    parser.add_argument('--save', help='save the aggregates to this .npz file')
+    args = parser.parse_args()
+
+    config = getProfile(args.profile)
+    if args.level is not None:
+        config = config.replace(LEVEL_FILE=args.level)
+
+    summary = analyzeAll(list(_files(args.paths)), config, args.processes)
+    print(summary.report())
+    if args.save is not None:
+        summary.save(args.save)
@@ -0,0 +1,42 @@
+# atlas.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Atlas builder module for Breakout
+
+This module packs the images of the Images folder into a texture atlas ahead
+of time.  A game packs the images itself when it starts (see GAtlas in
+game2d.py), unless it finds the atlas file ATLAS_FILE in the Images folder.
+Building that file once saves the packing at every startup, which matters for
+a large image set on a slow machine.
+
+To build the atlas, type
+
+    python atlas.py [size]
+
+where size is the width and height of a page in pixels (1024 by default).
+Build it again whenever an image changes.  Delete the atlas file and its pages
+to go back to packing at startup."""
+import sys
+from game2d import *
+
+
+def buildAtlas(size=1024, filename=ATLAS_FILE):
+    """Returns: the atlas of the Images folder, after saving it to a file
+
+        :param size: the width and height of a page in pixels
+        **Precondition**: an int > 0
+
+        :param filename: the atlas file, relative to the Images folder
+        **Precondition**: a string ending in '.atlas'"""
+    atlas = GAtlas(size)
+    atlas.build()
+    if atlas.pages > 0:
+        atlas.save(filename)
+    return atlas
+
+
+# Application code
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    atlas = buildAtlas(size)
+    print('%d images in %d pages of %dx%d' % (len(atlas.names), atlas.pages, size, size))
@@ -0,0 +1,251 @@
+# autopilot.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Autopilot module for Breakout
+
+This module contains a controller that plays Breakout by itself.  It exists so
+that soak tests and frame-time tests can run for hours without anyone dragging
+the mouse.
+
+The autopilot does not move the paddle directly.  It pretends to be a mouse
+that is always pressed, so the paddle moves through the same input path as for
+a human player (Gameplay.updatePaddle).  It computes where the ball will reach
+the top of the paddle, following the reflections off the side walls and the top
+wall, and moves the paddle there.  Bricks are ignored, so even a perfect
+autopilot can be surprised by a brick bounce.
+
+To soak test the game headless, run
+
+    python autopilot.py [frames] [skill] [settings]
+
+To watch the autopilot play in a window for the given number of frames, run
+
+    python autopilot.py [frames] [skill] [settings] --window
+
+where settings are the same as for the game (see constants.parseArgs)."""
+import math
+import random
+import sys
+import time
+from array import array
+from constants import *
+from game2d import *
+
+
+#: the autopilot skill levels.  Each level is a tuple (error, reaction, speed)
+#: where error is the standard deviation (in pixels) of the aiming error,
+#: reaction is the number of frames it takes to react to a bounce, and speed
+#: is the maximum paddle speed (in pixels per frame).
+SKILLS = {
+    'perfect': (0.0,   0, float(GAME_WIDTH)),
+    'expert':  (4.0,   2, 8.0),
+    'average': (12.0,  6, 5.0),
+    'novice':  (25.0, 12, 3.0),
+}
+
+
+class AutoPilot(object):
+    """An instance is a simulated player that moves the paddle.
+
+    Call the method touch once per frame, and use the result in place of the
+    mouse position (GView.touch).
+
+    INSTANCE ATTRIBUTES:
+        _error    [float >= 0]: standard deviation of the aiming error
+        _reaction [int >= 0]:   frames to wait before reacting to a bounce
+        _speed    [float > 0]:  maximum finger movement per frame
+        _random   [random.Random]: the source of aiming errors
+        _finger   [float]:      the x position of the simulated mouse
+        _velocity [tuple or None]: the ball velocity that _target is based on
+        _target   [float or None]: the paddle x position the autopilot aims for
+        _aim      [float]:      the aiming error for the current bounce
+        _delay    [int >= 0]:   frames left before reacting to the last bounce
+        _config   [GameConfig]: the settings of the game being played
+    """
+
+    # GETTERS AND SETTERS
+
+    def getTarget(self):
+        """Returns: the paddle x position the autopilot is moving towards, or
+        None if it has no target"""
+        return self._target
+
+    def __init__(self, skill='expert', seed=None, config=None):
+        """Initialize an autopilot with the given skill.
+
+            :param skill: the skill level
+            **Precondition**: a key of SKILLS
+
+            :param seed: the seed for the aiming errors
+            **Precondition**: an int, or None for a random seed
+
+            :param config: the settings of the game, until touch is given a game
+            **Precondition**: a GameConfig, or None for DEFAULT_CONFIG"""
+        assert skill in SKILLS, repr(skill)+' is not a skill level'
+        self._error, self._reaction, self._speed = SKILLS[skill]
+        self._random = random.Random(seed)
+        self._finger = 0.0
+        self._velocity = None
+        self._target = None
+        self._aim = 0.0
+        self._delay = 0
+        self._config = DEFAULT_CONFIG if config is None else config
+
+    def touch(self, game):
+        """Returns: the simulated mouse position for this frame (a GPoint)
+
+        The mouse is always pressed, so the result is never None. This method
+        should be called exactly once per frame.
+
+            :param game: the game being played
+            **Precondition**: a Gameplay, or None if there is no game yet"""
+        if game is not None:
+            self._config = game.getConfig()
+            self._steer(game.getPaddle(), game.getBall())
+        return GPoint(self._finger, self._config.PADDLE_OFFSET)
+
+    def predict(self, ball):
+        """Returns: the ball center x when the ball comes down to the paddle
+
+        The prediction follows the reflections off the side walls and (if the
+        ball is moving up) the top wall, but it ignores the bricks.
+
+            :param ball: the ball in play
+            **Precondition**: a Ball"""
+        config = self._config
+        vx = ball.getVX()
+        vy = ball.getVY()
+        paddle = config.PADDLE_OFFSET + config.PADDLE_HEIGHT
+
+        # Frames until the bottom of the ball reaches the top of the paddle
+        if vy < 0:
+            frames = (ball.bottom - paddle) / -vy
+        else:
+            frames = ((config.GAME_HEIGHT - ball.top) +
+                      (config.GAME_HEIGHT - ball.height - paddle)) / vy
+        frames = max(0.0, frames)
+
+        # Unfold the side wall reflections
+        span = config.GAME_WIDTH - ball.width
+        left = math.fmod(ball.left + vx*frames, 2*span)
+        if left < 0:
+            left += 2*span
+        if left > span:
+            left = 2*span - left
+        return left + ball.width/2.0
+
+    # HELPER METHODS
+
+    def _steer(self, paddle, ball):
+        """Moves the simulated mouse towards the target for the ball.
+
+            :param paddle: the paddle
+            **Precondition**: a GRectangle
+
+            :param ball: the ball in play
+            **Precondition**: a Ball, or None if waiting for a serve"""
+        right = float(self._config.GAME_WIDTH - self._config.PADDLE_WIDTH)
+        if ball is None:
+            self._velocity = None
+            target = right/2.0
+        else:
+            velocity = (ball.getVX(), ball.getVY())
+            if velocity != self._velocity:
+                # A bounce: pick a new (slightly wrong) target after a delay
+                self._velocity = velocity
+                self._delay = self._reaction
+                self._aim = self._random.gauss(0.0, self._error) if self._error else 0.0
+            if self._delay > 0:
+                self._delay -= 1
+                return
+            target = self.predict(ball) + self._aim - self._config.PADDLE_WIDTH/2.0
+
+        # Keep the target on screen so the paddle never hits the bounds check
+        target = min(max(target, 0.0), right)
+        self._target = target
+
+        # Move the mouse by the same amount the paddle has to move
+        step = min(max(target - paddle.x, -self._speed), self._speed)
+        self._finger += step
+
+
+def soak(frames, skill='expert', seed=None, config=None):
+    """Returns: a dictionary of statistics for a headless run of the game
+
+    This plays the game with an autopilot for the given number of frames,
+    without a window.  Whenever a game is complete, a new game is started.
+    The statistics include the number of games completed and percentiles of
+    the time spent in Breakout.update.
+
+        :param frames: the number of frames to run
+        **Precondition**: an int > 0
+
+        :param skill: the autopilot skill level
+        **Precondition**: a key of SKILLS
+
+        :param seed: the seed for the game and the autopilot
+        **Precondition**: an int, or None for a random seed
+
+        :param config: the game settings
+        **Precondition**: a GameConfig, or None for DEFAULT_CONFIG"""
+    import breakout # local to prevent circular import
+
+    if seed is not None:
+        random.seed(seed)
+    config = DEFAULT_CONFIG if config is None else config
+
+    pilot = AutoPilot(skill, seed, config)
+    # Breakout.init reads the settings from GAME_CONFIG
+    saved = breakout.GAME_CONFIG
+    breakout.GAME_CONFIG = config
+    try:
+        app = breakout.Breakout(width=config.GAME_WIDTH, height=config.GAME_HEIGHT)
+        app.init()
+        app.setPilot(pilot)
+
+        # The times are stored in place, so a soak with memory tracking on
+        # (see memory.py) does not see the soak itself grow every frame
+        dt = 1.0/TICK_RATE
+        games = 0
+        times = array('d', [0.0])*frames
+        start = time.time()
+        for frame in range(frames):
+            before = time.time()
+            app.update(dt)
+            times[frame] = time.time()-before
+
+            if app.getState() == STATE_COMPLETE:
+                games += 1
+                app.init()
+                app.setPilot(pilot)
+        total = time.time()-start
+    finally:
+        breakout.GAME_CONFIG = saved
+
+    times = sorted(times)
+    return {'frames': frames, 'games': games, 'seconds': total,
+            'fps': frames/total if total > 0 else float('inf'),
+            'p50': times[len(times)//2], 'p99': times[(len(times)*99)//100],
+            'max': times[-1]}
+
+
+# Application code
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--window']
+    frames = int(args[0]) if len(args) > 0 else 60*60
+    skill  = args[1] if len(args) > 1 else 'expert'
+    config = parseArgs(args[2:])
+
+    if '--window' in sys.argv:
+        import breakout
+        breakout.AUTOPILOT = skill
+        breakout.GAME_CONFIG = config
+        app = breakout.Breakout(width=config.GAME_WIDTH,height=config.GAME_HEIGHT,
+                                fps=config.FRAME_RATE)
+        Clock.schedule_once(lambda dt: app.stop(), frames/app.fps)
+        app.run()
+    else:
+        stats = soak(frames, skill, config=config)
+        print('%(frames)d frames, %(games)d games in %(seconds).1f seconds (%(fps).0f fps)' % stats)
+        print('update time: p50 %.3f ms, p99 %.3f ms, max %.3f ms' %
+              (stats['p50']*1000, stats['p99']*1000, stats['max']*1000))
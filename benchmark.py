@@ -0,0 +1,114 @@
+# benchmark.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Frame loop benchmark for Breakout
+
+This module times the frame loop of the game, so that the same code can be
+compared on different interpreters (such as Python 2.7 and Python 3), or two
+versions of the code on the same interpreter.
+
+A benchmark is a number of headless soak runs (see autopilot.soak), all with
+the same seed, so every run plays exactly the same frames.  The fastest run is
+kept, as the slower ones only measure other work on the machine.
+
+To time the frame loop, run
+
+    python benchmark.py [frames] [-n runs] [--skill skill] [settings]
+
+where settings are the same as for the game (see constants.parseArgs).  To
+compare two interpreters, save the result of one and compare the other to it:
+
+    python2 benchmark.py --save before.json
+    python3 benchmark.py --compare before.json"""
+import argparse
+import json
+import platform
+from constants import *
+from autopilot import SKILLS, soak
+
+
+#: the seed of every run, so that every run plays the same frames
+BENCHMARK_SEED = 1
+
+
+def benchmark(frames=3600, runs=5, skill='expert', config=None):
+    """Returns: the timings of the fastest of several soak runs, as a dictionary
+
+    The dictionary has the interpreter ('python'), the settings of the runs,
+    and the mean, p50 and p99 time of a frame in seconds.
+
+        :param frames: the number of frames in a run
+        **Precondition**: an int > 0
+
+        :param runs: the number of runs
+        **Precondition**: an int > 0
+
+        :param skill: the autopilot skill level
+        **Precondition**: a key of autopilot.SKILLS
+
+        :param config: the game settings
+        **Precondition**: a GameConfig, or None for DEFAULT_CONFIG"""
+    assert type(runs) == int and runs > 0, repr(runs)+' is not a valid number of runs'
+    config = DEFAULT_CONFIG if config is None else config
+
+    best = None
+    for run in range(runs):
+        stats = soak(frames, skill, BENCHMARK_SEED, config)
+        if best is None or stats['seconds'] < best['seconds']:
+            best = stats
+
+    return {'python': '%s %s' % (platform.python_implementation(), platform.python_version()),
+            'config': config.getName(), 'skill': skill, 'frames': frames, 'runs': runs,
+            'games': best['games'], 'mean': best['seconds']/frames,
+            'p50': best['p50'], 'p99': best['p99']}
+
+
+def report(result, baseline=None):
+    """Returns: a readable summary of a benchmark result
+
+    If there is a baseline, the summary also has the speedup of the result
+    over the baseline.  The speedup only means something if both played the
+    same frames (the same frames, skill and settings).
+
+        :param result: the result of benchmark
+        **Precondition**: a dictionary
+
+        :param baseline: an earlier result to compare to
+        **Precondition**: a dictionary, or None"""
+    lines = ['%(python)s: %(frames)d frames of %(config)s (%(skill)s), '
+             'fastest of %(runs)d runs' % result]
+    lines.append('frame time: mean %.3f ms, p50 %.3f ms, p99 %.3f ms' %
+                 (result['mean']*1000, result['p50']*1000, result['p99']*1000))
+    if baseline is not None:
+        if any(baseline[key] != result[key] for key in ('config', 'skill', 'frames')):
+            lines.append('warning: the baseline played different frames')
+        lines.append('%s: mean %.3f ms, p50 %.3f ms, p99 %.3f ms' %
+                     (baseline['python'], baseline['mean']*1000,
+                      baseline['p50']*1000, baseline['p99']*1000))
+        lines.append('speedup: mean %.2fx, p50 %.2fx, p99 %.2fx' %
+                     tuple(baseline[key]/result[key] for key in ('mean', 'p50', 'p99')))
+    return '\n'.join(lines)
+
+
+# Application code
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the Breakout frame loop.')
+    parser.add_argument('frames', nargs='?', type=int, default=3600,
+                        help='frames in a run (default: 3600)')
+    parser.add_argument('-n', type=int, default=5, dest='runs',
+                        help='number of runs, of which the fastest is kept (default: 5)')
+    parser.add_argument('--skill', default='expert', choices=sorted(SKILLS),
+                        help='autopilot skill (default: expert)')
+    parser.add_argument('--save', help='save the result to this JSON file')
+    parser.add_argument('--compare', help='compare to a result saved with --save')
+    args, settings = parser.parse_known_args()
+
+    result = benchmark(args.frames, args.runs, args.skill, parseArgs(settings))
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print(report(result, baseline))
+    if args.save is not None:
+        with open(args.save, 'w') as file:
+            json.dump(result, file, indent=2, sort_keys=True)
@@ -8,9 +8,19 @@ There should not be any need for additional classes in this module.
 If you need more classes, 99% of the time they belong in either the gameplay
 module or the models module. If you are ensure about where a new class should go,
 post a question on Piazza."""
+import random
+import time
 from constants import *
 from gameplay import *
 from game2d import *
+from levels import LevelFile
+from autopilot import AutoPilot
+from telemetry import Telemetry, EVENT_STATE, EVENT_FRAME, EVENT_QUALITY
+from particles import ParticleSystem
+from governor import FrameGovernor
+from hud import Hud
+from memory import getTracker
+from replay import Recorder
 
 
 # PRIMARY RULE: Breakout can only access attributes in gameplay.py via getters/setters
@@ -39,20 +49,17 @@ class Breakout(GameApp):
     game physics. This class should simply call that method in update().
 
     The primary purpose of this class is managing the game state: when is the
-    game started, paused, completed, etc. It keeps track of that in an attribute
-    called _state.
+    game started, paused, completed, etc. The states are run by a Match object
+    (see gameplay.py), which the server (see server.py) uses as well, so both
+    play the same game.  This class adds the messages shown in each state.
 
     INSTANCE ATTRIBUTES:
         view    [Immutable instance of GView, it is inherited from GameApp]:
             the game view, used in drawing (see examples from class)
-        _state  [one of STATE_INACTIVE, STATE_COUNTDOWN, STATE_PAUSED, STATE_ACTIVE]:
-            the current state of the game represented a value from constants.py
-        _last   [GPoint, or None if mouse button is not pressed]:
-            the last mouse position (if Button was pressed)
-        _game   [GModel, or None if there is no game currently active]:
-            the game controller, which manages the paddle, ball, and bricks
-
-    ADDITIONAL INVARIANTS: Attribute _game is only None if _state is STATE_INACTIVE.
+        _match  [Match]:
+            the state of the game, the balls left, and the game controller
+            (a Gameplay, or None if no game has started), which manages the
+            paddle, ball, and bricks
 
     You may have more attributes if you wish (you might need an attribute to store
     any text messages you display on the screen). If you add new attributes, they
@@ -63,27 +70,93 @@ class Breakout(GameApp):
                      This message is displayed on the welcome screen
                      and instructs user to press the mouse to play.
 
-        _lasttouch  [GPoint, or none if the game is inactive]:
-                     Holds the previous value of touch. This is used in
-                     GamePlay to detect the first time the user clicks
-                     the mouse to move the paddle.
-
-        _timer      [int >= 0 ]:
-                     This is a countdown timer that counts frames. It is
-                     used to count COUNTDOWN_SECONDS seconds in state
-                     countdown.
-
-        _ballcount  [int >= 0]:
-                     The number of balls left (initialized to NUMBER_TURNS).
-
         _pausemssg  [pause message string, or none if the game is not paused]:
                      This message appears when the game is paused between tries.
 
         _finalmssg  [final message string, or none if the game is not complete]:
                      This message appears on the completion screen and tells
                      the user the game's result.
+
+        _config     [GameConfig]:
+                     The settings of the games played.  This is GAME_CONFIG,
+                     or DEFAULT_CONFIG if GAME_CONFIG is None.
+
+        _level      [LevelFile, or None if the config has no LEVEL_FILE]:
+                     The level to play.  It is opened once, so starting a new
+                     game does not read the level file again.
+
+        _pilot      [AutoPilot or ReplayPilot, or None if the player moves
+                     the paddle]:
+                     The autopilot or recorded session that plays in place
+                     of the mouse.
+
+        _touch      [GPoint, or None if mouse button is not pressed]:
+                     The mouse position (or autopilot position) for the
+                     current frame.
+
+        _telemetry  [Telemetry, or None if TELEMETRY_FILE is None]:
+                     Records state changes and frame times, and is passed
+                     on to each Gameplay for the game events.
+
+        _particles  [ParticleSystem]:
+                     The debris of destroyed bricks.  It is passed on to
+                     each Gameplay, which spawns the debris.
+
+        _governor   [FrameGovernor]:
+                     Measures each frame against the budget of the target
+                     fps, and picks how much debris the particles may have.
+
+        _memory     [MemoryTracker, or None if MEMORY_REPORT is None]:
+                     Measures the memory of each frame, and writes a report
+                     at exit.  It is shared by every game of the session.
+
+        _recorder   [Recorder, or None if REPLAY_FILE is None]:
+                     Records the input of every tick, so that the session
+                     can be played again (see replay.py).
+
+        _hud        [Hud]:
+                     The score, lives and time played, drawn above the
+                     bricks while there is a game.
+
+        _lag        [float in 0..1/TICK_RATE]:
+                     The time since the last simulation tick, in seconds.
+                     It is played by the next ticks, and shown by drawing
+                     the moving shapes part way to their next positions.
     """
 
+    # GETTERS AND SETTERS
+
+    def getState(self):
+        """Returns: the current state of the game"""
+        return self._match.getState()
+
+    def snapshot(self):
+        """Returns: the full state of the game as a byte string
+
+        The result has a fixed layout (see Match.snapshot).  It is cheap enough
+        to take every frame, and can be given to restore to return to this
+        frame."""
+        return self._match.snapshot()
+
+    def restore(self, data):
+        """Returns the game to the frame of a snapshot.
+
+        The Gameplay object is reused if there is one, so the paddle, ball and
+        bricks are not created again.  A snapshot taken by another version of
+        the game is rejected with a ValueError (see Match.restore).
+
+            :param data: a snapshot of a game with the same level
+            **Precondition**: a byte string returned by snapshot"""
+        self._match.restore(data)
+        self._showMessages()
+
+    def setPilot(self, pilot):
+        """Sets the autopilot that plays in place of the mouse.
+
+            :param pilot: the autopilot
+            **Precondition**: an AutoPilot or ReplayPilot, or None for mouse input"""
+        self._pilot = pilot
+
     # GAMEAPP METHODS
     def init(self):
         """Initialize the game state.
@@ -93,23 +166,36 @@ class Breakout(GameApp):
         it to initialize any game specific attributes.
 
         This method should initialize any state attributes as necessary
-        to statisfy invariants. When done, set the _state to STATE_INACTIVE
-        and create a message (in attribute _mssg) saying that the user should
+        to statisfy invariants. When done, the Match is in STATE_INACTIVE
+        and there is a message (in attribute _mssg) saying that the user should
         press to play a game."""
 
-        self._state = STATE_INACTIVE
-        self._last = None
-        self._game = None
-
         self._mssg = GLabel(text = 'Press to Play', font_size = 50)
 
-        self._lasttouch = None
-        self._timer = 0
-        self._ballcount = NUMBER_TURNS
+        self._config = DEFAULT_CONFIG if GAME_CONFIG is None else GAME_CONFIG
 
         self._pausemssg = None
         self._finalmssg = None
 
+        level = self._config.LEVEL_FILE
+        self._level = None if level is None else LevelFile(level)
+        self._pilot = None if AUTOPILOT is None else AutoPilot(AUTOPILOT)
+        self._touch = None
+        self._telemetry = None if TELEMETRY_FILE is None else Telemetry(TELEMETRY_FILE)
+        self._memory = None if MEMORY_REPORT is None else getTracker(MEMORY_REPORT)
+        self._recorder = None
+        if REPLAY_FILE is not None:
+            # The serves are random, so a replay needs the seed as well
+            self._recorder = Recorder(REPLAY_FILE, self._config)
+            random.seed(self._recorder.getSeed())
+        self._particles = ParticleSystem()
+        self._match = Match(self._level, self._config)
+        self._match.setTelemetry(self._telemetry)
+        self._match.setParticles(self._particles)
+        self._governor = FrameGovernor(self.fps)
+        self._hud = Hud(self._config)
+        self._lag = 0.0
+
     def update(self,dt):
         """Animate a single frame in the game.
 
@@ -153,29 +239,45 @@ class Breakout(GameApp):
         You are allowed to add more states if you wish. Should you do so,
         you should describe them here.
 
-        Precondition: dt is the time since last update (a float).  This
-        parameter can be safely ignored. It is only relevant for debugging
-        if your game is running really slowly. If dt > 0.5, you have a
-        framerate problem because you are trying to do something too complex."""
-
-        assert type(dt) == float
-
-        # Each state has a helper method
-
-        if self._state == STATE_INACTIVE:
-            self._inactive()
+        The helper methods of the states are in class Match (see gameplay.py).
+        The states are played in fixed simulation ticks (see _tick), TICK_RATE
+        times a second, however often this method is called.  A frame may
+        play no tick, or several if frames come slower than ticks.
 
-        if self._state == STATE_COUNTDOWN:
-            self._countdown()
+        Precondition: dt is the time since last update (a float).  It decides
+        how many ticks this frame plays.  If dt > 0.5, you have a framerate
+        problem because you are trying to do something too complex."""
 
-        if self._state == STATE_ACTIVE:
-            self._active()
-
-        if self._state == STATE_PAUSED:
-            self._paused()
-
-        if self._state == STATE_COMPLETE:
-            self._complete()
+        assert type(dt) == float
+        start = time.time()
+        if self._memory is not None:
+            self._memory.frame()
+            self._memory.begin()
+
+        # Trade optional work for frame rate if the last frames were slow
+        level = self._governor.getLevel()
+        if self._governor.record(self.frametime):
+            self._applyQuality()
+            if self._telemetry is not None:
+                self._telemetry.emit(EVENT_QUALITY, level, self._governor.getLevel())
+
+        # The game moves in fixed ticks, however often the frames come.  The
+        # time left over is drawn by interpolation (see draw).
+        tick = 1.0/TICK_RATE
+        self._lag += dt
+        ticks = 0
+        while self._lag >= tick and ticks < MAX_TICKS_PER_FRAME:
+            self._tick()
+            self._lag -= tick
+            ticks += 1
+        if self._lag >= tick:
+            # Too far behind to catch up, so skip the lost time
+            self._lag %= tick
+
+        if self._telemetry is not None:
+            self._telemetry.emit(EVENT_FRAME, dt, time.time()-start)
+        if self._memory is not None:
+            self._memory.end('update')
 
     def draw(self):
         """Draws the game objects to the view.
@@ -190,85 +292,102 @@ class Breakout(GameApp):
         to class Gameplay.  We suggest the latter.  See the example
         subcontroller.py from class."""
 
+        if self._memory is not None:
+            self._memory.begin()
+
+        # The moving shapes are drawn this far from the last tick to the next
+        self.view.alpha = min(1.0, self._lag*TICK_RATE)
+        self.drawTo(self.view)
+
+        if self._memory is not None:
+            self._memory.end('draw')
+
+    def drawTo(self, view, debris=True):
+        """Draws the game objects to the given view.
+
+        The view may also be a raster.FrameBuffer, which draws the frame
+        without a window (see export.py).  A frame buffer can paint the score,
+        lives and timer, but not the debris, which is a raw Kivy mesh.  Leave
+        the debris out when drawing to one.
+
+            :param view: view to draw to
+            **Precondition**: a GView or FrameBuffer
+
+            :param debris: whether to draw the debris
+            **Precondition**: a bool"""
+
         # Only draw if the object exists (is not None)!
 
         if self._mssg != None:
-            self._mssg.draw(self.view)
+            self._mssg.draw(view)
+
+        game = self._match.getGame()
+        if game != None:
+            game.draw(view)
+            self._hud.setValues(game.getScore(), self._match.getBallCount(),
+                                game.getTick() // TICK_RATE)
+            self._hud.draw(view)
 
-        if self._game != None:
-            self._game.draw(self.view)
+        if debris:
+            self._particles.draw(view)
 
         if self._pausemssg != None:
-            self._pausemssg.draw(self.view)
+            self._pausemssg.draw(view)
 
         if self._finalmssg != None:
-            self._finalmssg.draw(self.view)
+            self._finalmssg.draw(view)
 
     # HELPER METHODS FOR THE STATES GO HERE
 
-    def _inactive(self):
-        """Checks if player clicks the mouse. If so, the game starts,
-        game state is changed to STATE_COUNTDOWN, and the welcome screen is
-        dismissed."""
-
-        if self._last == None and self.view.touch != None:
-            self._state = STATE_COUNTDOWN
-            self._last = self.view.touch
+    def _tick(self):
+        """Plays one simulation tick: reads the input and runs the helper
+        method of the current state."""
+        state = self._match.getState()
+
+        # Read the input once per tick
+        if self._pilot is None:
+            self._touch = self.view.touch
+        else:
+            self._touch = self._pilot.touch(self._match.getGame())
+        if self._recorder is not None:
+            self._recorder.record(self._touch)
+
+        # Each state has a helper method in Match
+        self._match.step(self._touch)
+        self._showMessages()
+
+        # The debris keeps moving in every state
+        self._particles.update()
+
+        if self._telemetry is not None and self._match.getState() != state:
+            self._telemetry.emit(EVENT_STATE, state, self._match.getState())
+
+    def _applyQuality(self):
+        """Applies the settings of the current quality level of the governor."""
+        quality = self._governor.getQuality()
+        self._particles.setBurst(quality['debris'])
+        self._particles.setLimit(min(quality['debris_limit'],
+                                     self._particles.getCapacity()))
+
+    def _showMessages(self):
+        """Shows the message of the current state, and hides the others.
+
+        The welcome message is shown while the game is inactive, the pause
+        message while it is paused, and the result when it is complete."""
+        state = self._match.getState()
+        if state != STATE_INACTIVE:
             self._mssg = None
-            self._game = Gameplay()
+        elif self._mssg is None:
+            self._mssg = GLabel(text = 'Press to Play', font_size = 50)
 
-    def _paused(self):
-        """Checks if player clicks the mouse. If so, the game state is changed
-        to STATE_COUNTDOWN and the pause message disappears."""
-
-        if self.view.touch != None:
+        if state != STATE_PAUSED:
             self._pausemssg = None
-            self._state = STATE_COUNTDOWN
-
-    def _countdown(self):
-        """Updates the paddle movement and counts down seconds until the ball
-        is to be released. When countdown ends, the state switches to
-        STATE_ACTIVE, the ball is served, and the ball count is decremented."""
-        self._game.updatePaddle(self._lasttouch, self.view.touch)
-        self._lasttouch = self.view.touch
-        self._timer += 1
-
-        # Switch state to active after countdown (60 frames per second)
-        if self._timer >= COUNTDOWN_SECONDS*60:
-            self._state = STATE_ACTIVE
-            self._game.serveBall()
-            self._ballcount -= 1
-
-    def _active(self):
-        """Updates the paddle movement and moves the ball. If the ball is lost,
-        pause in STATE_PAUSED or end the game in STATE_COMPLETE based on how
-        many balls are left. Set messages accordingly."""
-
-        self._game.updatePaddle(self._lasttouch, self.view.touch)
-        self._lasttouch = self.view.touch
-
-        # Handle lost ball
-
-        lostball = self._game.moveBall()
-
-        if lostball and self._ballcount == 0:
-            self._finalmssg = GLabel(text = 'You Lost', font_size = 50)
-            self._state = STATE_COMPLETE
-        elif lostball and self._ballcount > 0:
+        elif self._pausemssg is None:
             self._pausemssg = GLabel(text = 'Click! Try again', font_size = 50)
-            self._state = STATE_PAUSED
-
-        # Check for a screen with no bricks
-
-        completed = self._game.checkBricksListEmpty()
-
-        if completed:
-            self._finalmssg = GLabel(text = 'You Win', font_size = 50)
-            self._state = STATE_COMPLETE
-
-    def _complete(self):
-        """The game is over. Display the completion message."""
-
-        # Nothing to do here. Game is over.
-        pass
 
+        if state != STATE_COMPLETE:
+            self._finalmssg = None
+        else:
+            text = 'You Win' if self._match.getGame().checkBricksListEmpty() else 'You Lost'
+            if self._finalmssg is None or self._finalmssg.text != text:
+                self._finalmssg = GLabel(text = text, font_size = 50)
@@ -1,7 +1,8 @@
 # colormodel.py
 # Walker M. White (wmw2), Lillian Lee (LJL2), Steve Marschner (srm2)
 # Feb 25, 2013
-"""Class for RGB color objects, where the channel values are all ints in 0..255.
+"""Classes for RGB color objects, where the channel values are all ints in 0..255,
+and HSV color objects.
 
     In the docstrings below, we use David Gries' range notation: a..b,
     where a and b are integers and b >= a-1, represents the set of integers
@@ -14,6 +15,7 @@
     range(a,b) does NOT include b.
 
 """
+import colorsys
 
 
 class RGB(object):
@@ -84,6 +86,57 @@ class RGB(object):
         return (self.red/255.0, self.green/255.0, self.blue/255.0)
 
 
+class HSV(object):
+    """An instance is a HSV color value."""
+
+    # METHODS
+
+    def __init__(self, h, s, v):
+        """**Constructor**: creates a new HSV object (h,s,v).
+
+            :param h: initial hue value
+            :param s: initial saturation value
+            :param v: initial brightness value
+
+        **Precondition**: h is a number in [0,360), and s and v are numbers
+        in [0,1].
+        """
+        for value in (h,s,v):
+            if type(value) not in (int, float):
+                raise TypeError("value %s is not a number" % repr(value))
+        if h < 0 or h >= 360:
+            raise ValueError("hue %s is outside of range [0,360)" % repr(h))
+        for value in (s,v):
+            if value < 0 or value > 1:
+                raise ValueError("value %s is outside of range [0,1]" % repr(value))
+
+        self.hue = h
+        self.saturation = s
+        self.value = v
+
+    def __eq__(self, other):
+        """Returns: True if self and other are equivalent HSV colors. """
+        return (type(other) == HSV and self.hue == other.hue and
+                self.saturation == other.saturation and self.value == other.value)
+
+    def __ne__(self, other):
+        """Returns: True if self and other are not equivalent HSV colors. """
+        return not self == other
+
+    def __repr__(self):
+        """Returns: Unambiguous string representation of this color. """
+        return "(hue="+str(self.hue)+",saturation="+str(self.saturation)+",value="+str(self.value)+")"
+
+    def glColor(self):
+        """Returns: 4-element list of the equivalent RGBA values, scaled to be
+        between 0 and 1, inclusive
+
+        This is a conversion of this object's values into a format that can be
+        used in openGL graphics"""
+        rgb = colorsys.hsv_to_rgb(self.hue/360.0, self.saturation, self.value)
+        return [float(rgb[0]), float(rgb[1]), float(rgb[2]), 1.0]
+
+
 # Color Constants
 
 
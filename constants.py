@@ -8,7 +8,6 @@ need to be used in the model, the view, and the controller. As these
 are spread across multiple modules, we separate the constants into
 their own module. This allows all modules to access them."""
 import colormodel
-import sys
 
 ### WINDOW CONSTANTS (all coordinates are in pixels) ###
 
@@ -25,6 +24,8 @@ PADDLE_WIDTH  = 58
 PADDLE_HEIGHT = 11
 #: the distance of the (bottom of the) paddle from the bottom
 PADDLE_OFFSET = 30
+#: the most the paddle can steer the ball away from straight up, in degrees
+PADDLE_MAX_ANGLE = 60
 
 ### BRICK CONSTANTS ###
 
@@ -41,11 +42,13 @@ BRICKS_IN_ROW  = 10
 #: the number of rows of bricks, in range 1..10.
 BRICK_ROWS     = 10
 #: the width of a brick
-BRICK_WIDTH    = GAME_WIDTH / BRICKS_IN_ROW - BRICK_SEP_H
+BRICK_WIDTH    = GAME_WIDTH // BRICKS_IN_ROW - BRICK_SEP_H
 #: the brick row colors
 ROW_COLORS = (([colormodel.RED]*2)+([colormodel.ORANGE]*2)+
               ([colormodel.YELLOW]*2)+([colormodel.GREEN]*2)+
               ([colormodel.CYAN]*2))
+#: the brick flag for a brick that can never be destroyed (see levels.py)
+BRICK_UNBREAKABLE = 1
 
 ### BALL CONSTANTS ###
 
@@ -56,6 +59,13 @@ BALL_DIAMETER = 18
 
 #: the number of attempts in a game
 NUMBER_TURNS    = 3
+#: the number of simulation ticks per second.  Every speed is in pixels per tick.
+TICK_RATE       = 60
+#: the most simulation ticks run in one frame, so a stalled frame cannot
+#: make the next frames ever later
+MAX_TICKS_PER_FRAME = 5
+#: the number of frames drawn per second.  Frames between ticks are interpolated.
+FRAME_RATE      = 60
 #: state before the game has started
 STATE_INACTIVE  = 0
 #: state when we are counting down to the ball serve
@@ -69,28 +79,189 @@ STATE_COMPLETE  = 4
 
 #: the number of seconds for countdown
 COUNTDOWN_SECONDS = 3
+#: every this many destroyed bricks drop a multi-ball power-up (0 for none)
+POWERUP_EVERY = 0
 
-### USE COMMAND LINE ARGUMENTS TO CHANGE NUMBER OF BRICKS IN ROW"""
-"""sys.argv is a list of the command line arguments when you run
-python. These arguments are everything after the work python. So
-if you start the game typing
-
-    python breakout.py 3 4
-    
-Python puts ['breakout.py', '3', '4'] into sys.argv. Below, we 
-take advantage of this fact to change the constants BRICKS_IN_ROW
-and BRICK_ROWS"""
-
-try:
-   if (not sys.argv is None and len(sys.argv) == 3):
-        bs_in_row  = int(sys.argv[1])
-        brick_rows = int(sys.argv[2])
-        if (bs_in_row > 0 and brick_rows > 0):
-            # ALTER THE CONSTANTS
-            BRICKS_IN_ROW  = bs_in_row
-            BRICK_ROWS     = brick_rows
-            BRICK_WIDTH    = GAME_WIDTH / BRICKS_IN_ROW - BRICK_SEP_H
-except: # Leave the contants alone
-    pass
+#: the level file to play, or None to use the layout given by the constants
+LEVEL_FILE = None
+#: the configuration played by the Breakout App (see GameConfig), or None for
+#: DEFAULT_CONFIG.  __main__ sets it from the command line.
+GAME_CONFIG = None
+#: the autopilot skill (see autopilot.py), or None if the player moves the paddle
+AUTOPILOT = None
+#: the file to record telemetry events in (see telemetry.py), or None for no
+#: telemetry.  __main__ sets it from the option --telemetry.
+TELEMETRY_FILE = None
+#: the file to write a memory report to at exit (see memory.py), or None to not
+#: track memory.  Tracking needs Python 3 and slows the game down.  __main__
+#: sets it from the option --memory.
+MEMORY_REPORT = None
+#: the file to record the session to (see replay.py), or None to not record.  A
+#: recorded session can be played again, or exported as a video (see export.py).
+#: __main__ sets it from the option --record.
+REPLAY_FILE = None
+#: the number of debris particles spawned when a brick is destroyed (see particles.py)
+DEBRIS_PER_BRICK = 24
+#: the most debris particles alive at once
+DEBRIS_CAPACITY = 16384
+#: the font of the score, lives and timer at the top of the screen (see hud.py)
+HUD_FONT = 'ArialBold.ttf'
+#: the point size of the score, lives and timer
+HUD_FONT_SIZE = 20
+
+### GAME CONFIGURATIONS ###
+
+#: the size of the ball as it is played (Ball does not use BALL_DIAMETER)
+BALL_SIZE = 10
+
+# The names of the constants that a GameConfig can change
+_SETTINGS = ('GAME_WIDTH', 'GAME_HEIGHT', 'PADDLE_WIDTH', 'PADDLE_HEIGHT',
+             'PADDLE_OFFSET', 'PADDLE_MAX_ANGLE', 'BRICK_SEP_H', 'BRICK_SEP_V',
+             'BRICK_HEIGHT', 'BRICK_Y_OFFSET', 'BRICKS_IN_ROW', 'BRICK_ROWS', 'ROW_COLORS',
+             'BALL_SIZE', 'NUMBER_TURNS', 'COUNTDOWN_SECONDS', 'LEVEL_FILE',
+             'POWERUP_EVERY', 'FRAME_RATE')
+
+
+class GameConfig(object):
+    """An instance is the full set of settings for one game.
+
+    The constants above are the defaults.  A GameConfig has an attribute with
+    the same name for each constant that a game can change (see _SETTINGS),
+    plus the values derived from them.  Gameplay, BrickWall and Ball take a
+    GameConfig, so games with different settings can run side by side in the
+    same process.
+
+    A GameConfig is immutable, so it can be shared by any number of games.
+    Use replace to make a changed copy.
+
+    DERIVED ATTRIBUTES:
+        BRICK_WIDTH      [number]: the width of a brick
+        BRICK_COUNT      [int > 0]: the number of bricks in the default layout
+        COUNTDOWN_FRAMES [int >= 0]: the length of the countdown in ticks
+    """
+
+    def getName(self):
+        """Returns: the name of this configuration (usually a key of PROFILES)"""
+        return self._name
+
+    def getSettings(self):
+        """Returns: a dictionary of the settings (not the derived values)"""
+        return dict((key, getattr(self, key)) for key in _SETTINGS)
+
+    def __init__(self, name='classic', **settings):
+        """Initialize a configuration.
+
+        Every setting not given as a keyword keeps the value of the constant
+        with the same name.
+
+            :param name: the name of this configuration
+            **Precondition**: a string
+
+            :param settings: the settings to change
+            **Precondition**: each keyword is in _SETTINGS"""
+        for key in settings:
+            assert key in _SETTINGS, repr(key)+' is not a game setting'
+
+        values = dict((key, globals()[key]) for key in _SETTINGS)
+        values.update(settings)
+        assert values['BRICKS_IN_ROW'] > 0 and values['BRICK_ROWS'] > 0, \
+            'there must be at least one brick'
+
+        values['BRICK_WIDTH'] = values['GAME_WIDTH'] // values['BRICKS_IN_ROW'] - values['BRICK_SEP_H']
+        values['BRICK_COUNT'] = values['BRICKS_IN_ROW'] * values['BRICK_ROWS']
+        values['COUNTDOWN_FRAMES'] = int(values['COUNTDOWN_SECONDS']*TICK_RATE)
+        values['_name'] = name
+        self.__dict__.update(values)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('a GameConfig cannot be changed; use replace')
+
+    def __repr__(self):
+        """Returns: Unambiguous String representation of this configuration."""
+        return 'GameConfig(%r, %d x %d bricks)' % (self._name, self.BRICKS_IN_ROW, self.BRICK_ROWS)
+
+    def replace(self, **settings):
+        """Returns: a copy of this configuration with the given settings changed
+
+            :param settings: the settings to change
+            **Precondition**: each keyword is in _SETTINGS"""
+        values = self.getSettings()
+        values.update(settings)
+        return GameConfig(self._name, **values)
+
+    def getRowColor(self, row):
+        """Returns: the color of the bricks in the given row
+
+        The colors of ROW_COLORS repeat if there are more rows than colors.
+
+            :param row: the row (0 is the top row)
+            **Precondition**: an int >= 0"""
+        return self.ROW_COLORS[row % len(self.ROW_COLORS)]
+
+
+#: the named configurations, as the settings each one changes
+PROFILES = {
+    'classic':  {},
+    'small':    {'BRICKS_IN_ROW': 5, 'BRICK_ROWS': 4},
+    'dense':    {'BRICKS_IN_ROW': 16, 'BRICK_ROWS': 10, 'BRICK_SEP_H': 2},
+    'practice': {'PADDLE_WIDTH': 96, 'NUMBER_TURNS': 10, 'COUNTDOWN_SECONDS': 1},
+    'multiball': {'POWERUP_EVERY': 5},
+    'smooth':   {'FRAME_RATE': 120},
+}
+
+
+def getProfile(name, **settings):
+    """Returns: the GameConfig of a named profile
+
+        :param name: the name of the profile
+        **Precondition**: a key of PROFILES
+
+        :param settings: settings to change on top of the profile
+        **Precondition**: each keyword is in _SETTINGS"""
+    assert name in PROFILES, repr(name)+' is not a profile'
+    values = dict(PROFILES[name])
+    values.update(settings)
+    return GameConfig(name, **values)
+
+
+def parseArgs(argv):
+    """Returns: the GameConfig for the given command line arguments
+
+    argv is the list of arguments after the script name, so if you start the
+    game typing
+
+        python breakout.py 3 4
+
+    then argv is ['3', '4'], and the game has BRICKS_IN_ROW 3 and BRICK_ROWS 4.
+    If you start the game typing
+
+        python breakout.py level.lvl
+
+    the game plays the level file level.lvl (see levels.py) instead, and
+
+        python breakout.py small
+
+    plays the profile 'small' (see PROFILES).  Anything else plays the
+    default configuration.
+
+        :param argv: the command line arguments
+        **Precondition**: a list of strings"""
+    try:
+        if len(argv) == 2:
+            bs_in_row  = int(argv[0])
+            brick_rows = int(argv[1])
+            if (bs_in_row > 0 and brick_rows > 0):
+                return GameConfig(BRICKS_IN_ROW=bs_in_row, BRICK_ROWS=brick_rows)
+        elif len(argv) == 1 and argv[0].endswith('.lvl'):
+            return GameConfig(LEVEL_FILE=argv[0])
+        elif len(argv) == 1 and argv[0] in PROFILES:
+            return getProfile(argv[0])
+    except ValueError: # Leave the contants alone
+        pass
+    return DEFAULT_CONFIG
+
+
+#: the configuration given by the constants
+DEFAULT_CONFIG = GameConfig()
 
 ### ADD MORE CONSTANTS (PROPERLY COMMENTED) AS NECESSARY ###
@@ -0,0 +1,853 @@
+# entities.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Entity module for Breakout
+
+This module holds the things in a game other than the paddle, the main ball
+and the bricks: extra balls, falling power-ups, moving hazards, and whatever
+comes next.  They are not classes.  An entity is just an int, and what it
+is depends on the components it has:
+
+    TRANSFORM   x, y, width, height   where it is (the bottom left corner)
+    VELOCITY    vx, vy                how it moves each frame
+    COLLIDER    mask                  what it bounces off or reacts to
+    RENDERABLE  shape, color          how it is drawn
+    LIFETIME    frames                how long it lasts
+
+Each component is a Store of packed NumPy arrays, with one row for each entity
+that has the component.  The systems (move, expire, bounceWalls, collidePaddle,
+collideBricks, collideBalls) are functions that work on whole stores at once,
+so a new kind of entity costs a few more rows in the same arrays, not a new
+class with its own update method.  For example, a falling power-up is
+
+    world.create(KIND_POWERUP, x=x, y=y, width=20, height=8, vx=0, vy=-2,
+                 mask=CATCH|FALL, shape=SHAPE_RECTANGLE, color=world.getColor(colormodel.GREEN))
+
+The systems only report what happened (which entities were caught, fell, or
+hit which bricks).  Gameplay decides what that means for the game.
+
+A World can be saved into a snapshot of fixed size (see World.snapshotInto).
+Every store is copied whole, so taking a snapshot every tick, as the history
+of a rollback does, only copies arrays into a buffer made in advance."""
+import math
+import struct
+import numpy
+import colormodel
+from constants import *
+from game2d import *
+
+
+#: the most entities alive at once in a World
+ENTITY_CAPACITY = 256
+#: the most colors in the palette of a World
+PALETTE_CAPACITY = 16
+
+#: component: the position and size of an entity
+TRANSFORM  = 0
+#: component: the velocity of an entity, in pixels per frame
+VELOCITY   = 1
+#: component: the collision flags of an entity (see COLLIDE_WALLS, ...)
+COLLIDER   = 2
+#: component: the shape and palette color of an entity
+RENDERABLE = 3
+#: component: the frames left before an entity expires
+LIFETIME   = 4
+
+#: the fields of each component
+COMPONENTS = {
+    TRANSFORM:  ('x', 'y', 'width', 'height'),
+    VELOCITY:   ('vx', 'vy'),
+    COLLIDER:   ('mask',),
+    RENDERABLE: ('shape', 'color'),
+    LIFETIME:   ('frames',),
+}
+
+#: collider flag: bounces off the side and top walls
+COLLIDE_WALLS  = 1
+#: collider flag: bounces off the paddle when moving down
+COLLIDE_PADDLE = 2
+#: collider flag: bounces off bricks, and hits them
+COLLIDE_BRICKS = 4
+#: collider flag: is caught by the paddle
+CATCH          = 8
+#: collider flag: is lost when it falls below the bottom
+FALL           = 16
+#: collider flag: bounces off other balls (the entity must be round)
+COLLIDE_BALLS  = 32
+
+#: renderable shape: a rectangle
+SHAPE_RECTANGLE = 0
+#: renderable shape: an ellipse
+SHAPE_ELLIPSE   = 1
+
+#: entity kind: a ball besides the one served
+KIND_BALL    = 0
+#: entity kind: a power-up that falls towards the paddle
+KIND_POWERUP = 1
+#: entity kind: an obstacle
+KIND_HAZARD  = 2
+
+# The snapshot header of a Store: the number of rows in use
+_STORE = struct.Struct('<I')
+# The snapshot header of a World: the number of free entities, of colors in the
+# palette, and of keys in the order of the broadphase
+_WORLD = struct.Struct('<3I')
+# The types of the arrays in a snapshot
+_FLOAT = numpy.dtype('<f8')
+_INT   = numpy.dtype('<i4')
+
+
+class Store(object):
+    """An instance holds one component for every entity that has it.
+
+    The data is packed: row i of every field belongs to the entity
+    _entities[i], and rows 0.._count-1 are in use.  Removing an entity moves
+    the last row into its place, so the rows stay packed and a system never
+    has to skip over holes.
+
+    INSTANCE ATTRIBUTES:
+        _names    [tuple of str]: the names of the fields
+        _fields   [dict of str to float array (capacity,)]: the data of each field
+        _entities [int array (capacity,)]: the entity of each row
+        _rows     [int array (capacity,)]: the row of each entity, or -1 if the
+                  entity does not have this component
+        _count    [int >= 0]: the number of rows in use
+    """
+
+    # GETTERS AND SETTERS
+
+    def getCount(self):
+        """Returns: the number of entities with this component"""
+        return self._count
+
+    def getEntities(self):
+        """Returns: the entity of each row in use (a view, not a copy)"""
+        return self._entities[:self._count]
+
+    def getField(self, name):
+        """Returns: the values of a field for the rows in use (a view, not a copy)
+
+            :param name: the name of the field
+            **Precondition**: a field of this component"""
+        return self._fields[name][:self._count]
+
+    def __init__(self, names, capacity):
+        """Initialize an empty store.
+
+            :param names: the names of the fields
+            **Precondition**: a tuple of strings
+
+            :param capacity: the most entities in the World
+            **Precondition**: an int > 0"""
+        self._names = names
+        self._fields = dict((name, numpy.zeros(capacity)) for name in names)
+        self._entities = numpy.zeros(capacity, dtype=int)
+        self._rows = numpy.empty(capacity, dtype=int)
+        self._rows.fill(-1)
+        self._count = 0
+
+    def has(self, entity):
+        """Returns: True if the entity has this component
+
+            :param entity: the entity
+            **Precondition**: an int in 0..capacity-1"""
+        return self._rows[entity] >= 0
+
+    def rows(self, entities):
+        """Returns: the row of each of the entities (-1 for those without
+        this component)
+
+            :param entities: the entities
+            **Precondition**: an int array of entities"""
+        return self._rows[entities]
+
+    def get(self, entity, name):
+        """Returns: the value of a field for one entity
+
+            :param entity: the entity
+            **Precondition**: an entity with this component
+
+            :param name: the name of the field
+            **Precondition**: a field of this component"""
+        return self._fields[name][self._rows[entity]]
+
+    def add(self, entity, values):
+        """Gives an entity this component.
+
+            :param entity: the entity
+            **Precondition**: an entity without this component
+
+            :param values: the value of each field
+            **Precondition**: a dictionary with a number for every field"""
+        assert self._rows[entity] < 0, repr(entity)+' already has this component'
+        row = self._count
+        for name in self._names:
+            self._fields[name][row] = values[name]
+        self._entities[row] = entity
+        self._rows[entity] = row
+        self._count += 1
+
+    def remove(self, entity):
+        """Takes this component away from an entity, if it has it.
+
+            :param entity: the entity
+            **Precondition**: an int in 0..capacity-1"""
+        row = self._rows[entity]
+        if row < 0:
+            return
+
+        last = self._count-1
+        if row != last:
+            for name in self._names:
+                field = self._fields[name]
+                field[row] = field[last]
+            moved = self._entities[last]
+            self._entities[row] = moved
+            self._rows[moved] = row
+        self._rows[entity] = -1
+        self._count = last
+
+    def getSnapshotSize(self):
+        """Returns: the number of bytes in a snapshot of this store"""
+        capacity = len(self._entities)
+        return _STORE.size + capacity*(len(self._names)*_FLOAT.itemsize + _INT.itemsize)
+
+    def snapshotInto(self, buffer, offset=0):
+        """Writes the snapshot of this store into a buffer.
+
+        The whole of every array is written, not just the rows in use, so the
+        snapshot has the same size (and the same bytes for the same store)
+        whatever the number of entities.
+
+            :param buffer: the buffer to write to
+            **Precondition**: a bytearray with getSnapshotSize() bytes after offset
+
+            :param offset: the position in buffer to write to
+            **Precondition**: an int >= 0"""
+        capacity = len(self._entities)
+        _STORE.pack_into(buffer, offset, self._count)
+        offset += _STORE.size
+        for name in self._names:
+            _array(buffer, offset, _FLOAT, capacity)[:] = self._fields[name]
+            offset += capacity*_FLOAT.itemsize
+        _array(buffer, offset, _INT, capacity)[:] = self._entities
+
+    def restore(self, data, offset=0):
+        """Restores the rows saved by snapshotInto.
+
+            :param data: a snapshot of a store with the same fields and capacity
+            **Precondition**: a byte string or bytearray from snapshotInto
+
+            :param offset: the position of the snapshot in data
+            **Precondition**: an int >= 0"""
+        capacity = len(self._entities)
+        self._count = _STORE.unpack_from(data, offset)[0]
+        offset += _STORE.size
+        for name in self._names:
+            self._fields[name][:] = _array(data, offset, _FLOAT, capacity)
+            offset += capacity*_FLOAT.itemsize
+        self._entities[:] = _array(data, offset, _INT, capacity)
+        self._rows.fill(-1)
+        self._rows[self._entities[:self._count]] = numpy.arange(self._count)
+
+
+class World(object):
+    """An instance is every entity of one game, and their components.
+
+    INSTANCE ATTRIBUTES:
+        _capacity [int > 0]: the most entities alive at once
+        _kinds    [int array (capacity,)]: the kind of each entity, or -1 if
+                  the entity is not alive
+        _free     [list of int]: the entities that can be created
+        _stores   [dict of component to Store]: the data of each component
+        _colors   [list of 4-element lists]: the palette of RENDERABLE colors,
+                  at most PALETTE_CAPACITY of them
+        _shapes   [dict of int to (GObject, shape)]: the shape drawn for each
+                  renderable entity, and the pool it came from
+        _pools    [dict of shape to GPool]: the shapes not in use
+        _sweep    [SweepAndPrune]: the broadphase for collideBalls
+    """
+
+    # GETTERS AND SETTERS
+
+    def getCount(self):
+        """Returns: the number of entities alive"""
+        return self._capacity-len(self._free)
+
+    def getStore(self, component):
+        """Returns: the Store of a component
+
+            :param component: the component
+            **Precondition**: a key of COMPONENTS"""
+        return self._stores[component]
+
+    def getKind(self, entity):
+        """Returns: the kind of an entity, or -1 if it is not alive
+
+            :param entity: the entity
+            **Precondition**: an int in 0..capacity-1"""
+        return int(self._kinds[entity])
+
+    def getEntities(self, kind):
+        """Returns: an array of the entities of the given kind
+
+            :param kind: the kind
+            **Precondition**: an int >= 0"""
+        return numpy.flatnonzero(self._kinds == kind)
+
+    def getSweep(self):
+        """Returns: the broadphase used to find the balls that may touch"""
+        return self._sweep
+
+    def getColor(self, color):
+        """Returns: the palette index of a color, adding it if necessary
+
+            :param color: the color
+            **Precondition**: a 4-element list of floats between 0 and 1, or
+            an RGB or HSV object from colormodel"""
+        if type(color) in [colormodel.RGB, colormodel.HSV]:
+            color = color.glColor()
+        color = list(color)
+        if not color in self._colors:
+            assert len(self._colors) < PALETTE_CAPACITY, 'the palette is full'
+            self._colors.append(color)
+        return self._colors.index(color)
+
+    def __init__(self, capacity=ENTITY_CAPACITY):
+        """Initialize an empty world.
+
+            :param capacity: the most entities alive at once
+            **Precondition**: an int > 0"""
+        self._capacity = capacity
+        self._kinds = numpy.empty(capacity, dtype=int)
+        self._kinds.fill(-1)
+        self._free = list(range(capacity-1, -1, -1))
+        self._stores = dict((component, Store(names, capacity))
+                            for component, names in COMPONENTS.items())
+        self._colors = []
+        self._shapes = {}
+        self._pools = {SHAPE_RECTANGLE: GPool(GRectangle),
+                       SHAPE_ELLIPSE:   GPool(GEllipse)}
+        self._sweep = SweepAndPrune()
+
+    def create(self, kind, **values):
+        """Returns: a new entity, or None if the world is full
+
+        The entity gets every component whose fields are all given.  An
+        entity with a VELOCITY or COLLIDER must also have a TRANSFORM.
+
+            :param kind: the kind of entity
+            **Precondition**: an int >= 0
+
+            :param values: the value of each field
+            **Precondition**: numbers, with no field of a component missing
+            if another field of that component is given"""
+        if not self._free:
+            return None
+        entity = self._free.pop()
+        self._kinds[entity] = kind
+
+        for component, names in COMPONENTS.items():
+            given = [name in values for name in names]
+            if all(given):
+                self._stores[component].add(entity, values)
+            else:
+                assert not any(given), 'component '+repr(names)+' is missing a field'
+        assert self._stores[TRANSFORM].has(entity) or \
+            not (self._stores[VELOCITY].has(entity) or self._stores[COLLIDER].has(entity)), \
+            'an entity that moves or collides needs a transform'
+        return entity
+
+    def destroy(self, entity):
+        """Removes an entity and all of its components.
+
+            :param entity: the entity
+            **Precondition**: an int in 0..capacity-1"""
+        if self._kinds[entity] < 0:
+            return
+        for store in self._stores.values():
+            store.remove(entity)
+        self._kinds[entity] = -1
+        self._free.append(entity)
+
+        drawn = self._shapes.pop(entity, None)
+        if drawn is not None:
+            self._pools[drawn[1]].release(drawn[0])
+
+    def destroyAll(self, entities):
+        """Removes several entities.
+
+            :param entities: the entities
+            **Precondition**: a sequence or array of ints in 0..capacity-1"""
+        for entity in list(entities):
+            self.destroy(int(entity))
+
+    def clear(self):
+        """Removes every entity."""
+        self.destroyAll(numpy.flatnonzero(self._kinds >= 0))
+
+    def getSnapshotSize(self):
+        """Returns: the number of bytes in a snapshot of this world"""
+        size = _WORLD.size + (3*self._capacity+1)*_INT.itemsize
+        size += PALETTE_CAPACITY*4*_FLOAT.itemsize
+        for component in sorted(self._stores):
+            size += self._stores[component].getSnapshotSize()
+        return size
+
+    def snapshotInto(self, buffer, offset=0):
+        """Writes the snapshot of this world into a buffer.
+
+        The snapshot has the kind of each entity, the order in which free
+        entities are handed out, the order of the broadphase, the palette and
+        every store, as these all decide how the next ticks play out.  Its size
+        is fixed by the capacity of the world.
+
+            :param buffer: the buffer to write to
+            **Precondition**: a bytearray with getSnapshotSize() bytes after offset
+
+            :param offset: the position in buffer to write to
+            **Precondition**: an int >= 0"""
+        capacity = self._capacity
+        order = self._sweep.getOrder()
+        _WORLD.pack_into(buffer, offset, len(self._free), len(self._colors), len(order))
+        offset += _WORLD.size
+        _array(buffer, offset, _INT, capacity)[:] = self._kinds
+        offset += capacity*_INT.itemsize
+
+        # The unused part of each list is zeroed, so equal worlds have equal bytes
+        free = _array(buffer, offset, _INT, capacity)
+        free[:len(self._free)] = self._free
+        free[len(self._free):] = 0
+        offset += capacity*_INT.itemsize
+        keys = _array(buffer, offset, _INT, capacity+1)
+        keys[:len(order)] = order
+        keys[len(order):] = 0
+        offset += (capacity+1)*_INT.itemsize
+        colors = _array(buffer, offset, _FLOAT, PALETTE_CAPACITY*4).reshape(-1, 4)
+        for row, color in enumerate(self._colors):
+            colors[row] = color
+        colors[len(self._colors):] = 0.0
+        offset += PALETTE_CAPACITY*4*_FLOAT.itemsize
+
+        for component in sorted(self._stores):
+            store = self._stores[component]
+            store.snapshotInto(buffer, offset)
+            offset += store.getSnapshotSize()
+
+    def restore(self, data, offset=0):
+        """Restores the entities saved by snapshotInto.
+
+        The arrays are changed in place.  The shapes drawn for the entities are
+        returned to their pools, and taken again when the world is next drawn.
+
+            :param data: a snapshot of a world with the same capacity
+            **Precondition**: a byte string or bytearray from snapshotInto
+
+            :param offset: the position of the snapshot in data
+            **Precondition**: an int >= 0"""
+        capacity = self._capacity
+        free, colors, order = _WORLD.unpack_from(data, offset)
+        offset += _WORLD.size
+        self._kinds[:] = _array(data, offset, _INT, capacity)
+        offset += capacity*_INT.itemsize
+        self._free[:] = _array(data, offset, _INT, free).tolist()
+        offset += capacity*_INT.itemsize
+        self._sweep.setOrder(_array(data, offset, _INT, order).tolist())
+        offset += (capacity+1)*_INT.itemsize
+        self._colors[:] = _array(data, offset, _FLOAT, colors*4).reshape(-1, 4).tolist()
+        offset += PALETTE_CAPACITY*4*_FLOAT.itemsize
+
+        for component in sorted(self._stores):
+            store = self._stores[component]
+            store.restore(data, offset)
+            offset += store.getSnapshotSize()
+
+        for shape, kind in self._shapes.values():
+            self._pools[kind].release(shape)
+        self._shapes.clear()
+
+    def tick(self):
+        """Records where every drawn entity is, at the start of a simulation tick.
+
+        The shapes then move smoothly between ticks, like the ball (see
+        GObject.tick).  An entity that has not been drawn yet has no shape, and
+        is drawn where it is."""
+        for shape, kind in self._shapes.values():
+            shape.tick()
+
+    def draw(self, view):
+        """Draws every renderable entity.
+
+        Each renderable entity has a shape from a GPool, which is moved to the
+        entity (and recolored) in place, so the view can keep its instructions.
+
+            :param view: view to draw to
+            **Precondition**: an *instance of* `GView`"""
+        store = self._stores[RENDERABLE]
+        if store.getCount() == 0:
+            return
+
+        entities = store.getEntities()
+        rows = self._stores[TRANSFORM].rows(entities)
+        transform = self._stores[TRANSFORM]
+        xs = transform.getField('x')[rows].tolist()
+        ys = transform.getField('y')[rows].tolist()
+        widths = transform.getField('width')[rows].tolist()
+        heights = transform.getField('height')[rows].tolist()
+        shapes = store.getField('shape').tolist()
+        colors = store.getField('color').tolist()
+
+        for i, entity in enumerate(entities.tolist()):
+            drawn = self._shapes.get(entity)
+            if drawn is None:
+                color = self._colors[int(colors[i])]
+                kind = int(shapes[i])
+                shape = self._pools[kind].acquire(x=xs[i], y=ys[i], width=widths[i],
+                                                  height=heights[i], fillcolor=color,
+                                                  linecolor=color)
+                self._shapes[entity] = (shape, kind)
+            else:
+                shape = drawn[0]
+                shape.x = xs[i]
+                shape.y = ys[i]
+            shape.draw(view)
+
+
+class SweepAndPrune(object):
+    """An instance finds the pairs of bodies whose x extents overlap.
+
+    Testing every pair of balls is quadratic.  Instead, the bodies are kept
+    sorted by their left edge, and one sweep from left to right keeps a list
+    of the bodies whose right edge has not been passed yet.  Only a body in
+    that list can touch the next one, so the only pairs reported are those
+    that overlap in x.  The caller tests these candidates exactly.
+
+    The bodies barely move between frames, so the order of the last frame is
+    almost sorted.  It is sorted again with insertion sort, which is linear
+    for an almost sorted list.
+
+    INSTANCE ATTRIBUTES:
+        _order [list of int]: the keys of the bodies, sorted by left edge at
+               the last update
+        _swaps [int >= 0]: the number of swaps made by the last sort
+    """
+
+    # GETTERS AND SETTERS
+
+    def getOrder(self):
+        """Returns: the keys of the bodies, sorted by left edge at the last update"""
+        return self._order
+
+    def setOrder(self, order):
+        """Sets the order of the bodies, as restored from a snapshot.
+
+            :param order: the keys of the bodies, sorted by left edge
+            **Precondition**: a list of ints"""
+        self._order = order
+
+    def getSwaps(self):
+        """Returns: the number of swaps made by the insertion sort of the last update"""
+        return self._swaps
+
+    def __init__(self):
+        """Initialize a broadphase with no bodies."""
+        self._order = []
+        self._swaps = 0
+
+    def update(self, keys, lefts, rights):
+        """Returns: a list of the pairs (a, b) of keys whose x extents overlap
+
+        The bodies given replace those of the last update.  Bodies that were
+        in the last update keep their place in the order, new ones are put at
+        the end, and then the order is sorted again.
+
+            :param keys: a unique key for each body (such as an entity)
+            **Precondition**: a list of ints
+
+            :param lefts: the left edge of each body
+            **Precondition**: a list of numbers, the same length as keys
+
+            :param rights: the right edge of each body
+            **Precondition**: a list of numbers, the same length as keys"""
+        left = dict(zip(keys, lefts))
+        right = dict(zip(keys, rights))
+        known = set(self._order)
+        order = [key for key in self._order if key in left]
+        order.extend([key for key in keys if not key in known])
+
+        # Insertion sort, from the order of the last frame
+        swaps = 0
+        for i in range(1, len(order)):
+            key = order[i]
+            edge = left[key]
+            j = i-1
+            while j >= 0 and left[order[j]] > edge:
+                order[j+1] = order[j]
+                j -= 1
+            if j+1 != i:
+                order[j+1] = key
+                swaps += i-j-1
+        self._order = order
+        self._swaps = swaps
+
+        # Sweep, dropping the bodies that end before the next one starts
+        pairs = []
+        active = []
+        for key in order:
+            edge = left[key]
+            active = [other for other in active if right[other] >= edge]
+            for other in active:
+                pairs.append((other, key))
+            active.append(key)
+        return pairs
+
+
+# SYSTEMS
+
+def move(world):
+    """Moves every entity with a VELOCITY by one frame.
+
+        :param world: the entities
+        **Precondition**: a World"""
+    velocity = world.getStore(VELOCITY)
+    if velocity.getCount() == 0:
+        return
+    transform = world.getStore(TRANSFORM)
+    rows = transform.rows(velocity.getEntities())
+    transform.getField('x')[rows] += velocity.getField('vx')
+    transform.getField('y')[rows] += velocity.getField('vy')
+
+
+def expire(world):
+    """Returns: an array of the entities whose LIFETIME ran out this frame
+
+    The lifetime of every entity that has one goes down by one frame.  The
+    entities that expire are destroyed.
+
+        :param world: the entities
+        **Precondition**: a World"""
+    lifetime = world.getStore(LIFETIME)
+    frames = lifetime.getField('frames')
+    frames -= 1
+    expired = lifetime.getEntities()[frames <= 0]
+    world.destroyAll(expired)
+    return expired
+
+
+def bounceWalls(world, config):
+    """Returns: an array of the entities that fell below the bottom this frame
+
+    Entities with COLLIDE_WALLS bounce off the side and top walls, like
+    Ball.handleWallCollision.  Entities with FALL that are moving down and
+    are below the bottom are reported.  They are not destroyed; the caller
+    decides what that means.
+
+        :param world: the entities
+        **Precondition**: a World
+
+        :param config: the game settings (the size of the walls)
+        **Precondition**: a GameConfig"""
+    collider = world.getStore(COLLIDER)
+    if collider.getCount() == 0:
+        return numpy.zeros(0, dtype=int)
+
+    entities = collider.getEntities()
+    mask = collider.getField('mask').astype(int)
+    transform = world.getStore(TRANSFORM)
+    velocity = world.getStore(VELOCITY)
+    rows = transform.rows(entities)
+    moving = velocity.rows(entities)
+    x = transform.getField('x')[rows]
+    y = transform.getField('y')[rows]
+    right = x + transform.getField('width')[rows]
+    top = y + transform.getField('height')[rows]
+    vy = numpy.where(moving >= 0, velocity.getField('vy')[moving], 0.0)
+
+    walls = ((mask & COLLIDE_WALLS) != 0) & (moving >= 0)
+    side = walls & ((x < 0.0) | (right > config.GAME_WIDTH))
+    roof = walls & ~side & (top > config.GAME_HEIGHT)
+    velocity.getField('vx')[moving[side]] *= -1
+    velocity.getField('vy')[moving[roof]] *= -1
+
+    fell = ((mask & FALL) != 0) & (top < 0.0) & (vy <= 0.0)
+    return entities[fell]
+
+
+def collidePaddle(world, paddle):
+    """Returns: an array of the entities with CATCH that touch the paddle
+
+    Entities with COLLIDE_PADDLE that touch the paddle while moving down
+    bounce straight up.  Unlike Ball.handlePaddleCollision, they are boxes
+    and the paddle does not steer them.
+
+        :param world: the entities
+        **Precondition**: a World
+
+        :param paddle: the paddle
+        **Precondition**: a GRectangle"""
+    collider = world.getStore(COLLIDER)
+    if collider.getCount() == 0:
+        return numpy.zeros(0, dtype=int)
+
+    entities = collider.getEntities()
+    mask = collider.getField('mask').astype(int)
+    touch = _overlaps(world, entities, numpy.array([[paddle.left, paddle.bottom,
+                                                     paddle.right, paddle.top]]))[:, 0]
+
+    velocity = world.getStore(VELOCITY)
+    moving = velocity.rows(entities)
+    bounce = touch & ((mask & COLLIDE_PADDLE) != 0) & (moving >= 0)
+    vy = velocity.getField('vy')
+    rows = moving[bounce]
+    vy[rows] = numpy.abs(vy[rows])
+    return entities[touch & ((mask & CATCH) != 0)]
+
+
+def collideBricks(world, bounds):
+    """Returns: a tuple (entities, bricks) of the brick hits this frame
+
+    Every entity with COLLIDE_BRICKS is tested against every brick at once.
+    An entity that touches bricks reverses vy (a box, unlike the circle of
+    Ball.handleBrickCollision), and is reported once, with the first brick it
+    touches.  The bricks are not hit; the caller does that, as it owns the
+    BrickWall.
+
+        :param world: the entities
+        **Precondition**: a World
+
+        :param bounds: the left, bottom, right and top of each brick
+        **Precondition**: a float array of shape (bricks, 4)"""
+    collider = world.getStore(COLLIDER)
+    none = numpy.zeros(0, dtype=int)
+    if collider.getCount() == 0 or len(bounds) == 0:
+        return (none, none)
+
+    entities = collider.getEntities()
+    mask = collider.getField('mask').astype(int)
+    entities = entities[(mask & COLLIDE_BRICKS) != 0]
+    if len(entities) == 0:
+        return (none, none)
+
+    touch = _overlaps(world, entities, bounds)
+    hit = touch.any(axis=1)
+    entities = entities[hit]
+    bricks = touch[hit].argmax(axis=1)
+
+    velocity = world.getStore(VELOCITY)
+    rows = velocity.rows(entities)
+    rows = rows[rows >= 0]
+    velocity.getField('vy')[rows] *= -1
+    return (entities, bricks)
+
+
+def collideBalls(world, ball=None):
+    """Returns: the number of pairs of balls that bounced off each other
+
+    The balls are the entities with COLLIDE_BALLS (and a VELOCITY), plus the
+    ball in play if it is given.  The world's SweepAndPrune finds the pairs
+    that overlap in x, and each of those is tested as two circles.  Two balls
+    that touch and are moving towards each other bounce elastically: as they
+    have the same mass, they swap the parts of their velocities along the line
+    between their centers.  They are also pushed apart so they do not stick.
+
+        :param world: the entities
+        **Precondition**: a World
+
+        :param ball: the ball in play
+        **Precondition**: a Ball, or None"""
+    collider = world.getStore(COLLIDER)
+    transform = world.getStore(TRANSFORM)
+    velocity = world.getStore(VELOCITY)
+
+    entities = collider.getEntities()
+    mask = collider.getField('mask').astype(int)
+    entities = entities[((mask & COLLIDE_BALLS) != 0) & (velocity.rows(entities) >= 0)]
+    count = len(entities) + (ball is not None)
+    if count < 2:
+        world.getSweep().update([], [], [])
+        return 0
+
+    # The bodies as lists: the ball in play has the key -1
+    rows = transform.rows(entities)
+    moving = velocity.rows(entities)
+    keys = entities.tolist()
+    xs = transform.getField('x')[rows].tolist()
+    ys = transform.getField('y')[rows].tolist()
+    sizes = transform.getField('width')[rows].tolist()
+    vxs = velocity.getField('vx')[moving].tolist()
+    vys = velocity.getField('vy')[moving].tolist()
+    if ball is not None:
+        keys.append(-1)
+        xs.append(ball.x)
+        ys.append(ball.y)
+        sizes.append(ball.width)
+        vxs.append(ball.getVX())
+        vys.append(ball.getVY())
+
+    index = dict((key, i) for i, key in enumerate(keys))
+    rights = [x+size for x, size in zip(xs, sizes)]
+    bounced = 0
+    touched = False
+    for a, b in world.getSweep().update(keys, xs, rights):
+        i = index[a]
+        j = index[b]
+        ra = sizes[i]/2.0
+        rb = sizes[j]/2.0
+        dx = (xs[j]+rb) - (xs[i]+ra)
+        dy = (ys[j]+rb) - (ys[i]+ra)
+        distance = math.sqrt(dx*dx+dy*dy)
+        if distance >= ra+rb or distance == 0.0:
+            continue
+        touched = True
+
+        # Only bounce if they are moving towards each other
+        nx = dx/distance
+        ny = dy/distance
+        closing = (vxs[i]-vxs[j])*nx + (vys[i]-vys[j])*ny
+        if closing > 0.0:
+            vxs[i] -= closing*nx
+            vys[i] -= closing*ny
+            vxs[j] += closing*nx
+            vys[j] += closing*ny
+            bounced += 1
+
+        # Push them apart, half each
+        push = (ra+rb-distance)/2.0
+        xs[i] -= push*nx
+        ys[i] -= push*ny
+        xs[j] += push*nx
+        ys[j] += push*ny
+
+    if touched:
+        n = len(entities)
+        transform.getField('x')[rows] = xs[:n]
+        transform.getField('y')[rows] = ys[:n]
+        velocity.getField('vx')[moving] = vxs[:n]
+        velocity.getField('vy')[moving] = vys[:n]
+        if ball is not None:
+            ball.x = xs[n]
+            ball.y = ys[n]
+            ball.setVelocity(vxs[n], vys[n])
+    return bounced
+
+
+def _array(data, offset, dtype, count):
+    """Returns: a NumPy view of count values of type dtype in data at offset
+
+    The view is writable if data is a bytearray."""
+    return numpy.frombuffer(data, dtype, count, offset)
+
+
+def _overlaps(world, entities, bounds):
+    """Returns: a bool array (entities, boxes) of which entities touch which boxes
+
+        :param bounds: the left, bottom, right and top of each box
+        **Precondition**: a float array of shape (boxes, 4)"""
+    transform = world.getStore(TRANSFORM)
+    rows = transform.rows(entities)
+    x = transform.getField('x')[rows][:, None]
+    y = transform.getField('y')[rows][:, None]
+    right = x + transform.getField('width')[rows][:, None]
+    top = y + transform.getField('height')[rows][:, None]
+    return ((x <= bounds[:, 2]) & (right >= bounds[:, 0]) &
+            (y <= bounds[:, 3]) & (top >= bounds[:, 1]))
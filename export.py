@@ -0,0 +1,296 @@
+# export.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Replay exporter for Breakout
+
+This module turns a recorded session (see replay.py) into a video, without a
+window.  The session is played again headless, one simulation tick per frame,
+and every frame is drawn into a raster.FrameBuffer.  The frame buffer is
+reused between frames and only repaints what changed, so drawing is cheap,
+and the export runs much faster than the game did.
+
+The frames are written by a FrameWriter, in one of two formats:
+
+    png: a directory of numbered PNG images (frame_000000.png, ...)
+    raw: a single file of raw 24-bit RGB frames, top row first
+
+A raw file has no header.  It is the rawvideo format of ffmpeg, so it can be
+encoded with, for example,
+
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s 480x620 -r 60 -i clip.rgb clip.mp4
+
+The writer encodes and writes the frames on a background thread.  It owns a
+fixed pool of frame buffers, so the export never holds more than that many
+frames in memory, however long the session.  If the disk falls behind, the
+game waits for a free buffer instead of queueing more frames.
+
+The frames have the score, lives and timer, which the frame buffer paints
+from the glyph atlas of the HUD.  The debris is a raw Kivy mesh, which the
+frame buffer cannot draw, so it is not in the exported frames.
+
+To export a session, run
+
+    python export.py session output [--start tick] [--stop tick] [--scale scale]
+
+where output is a directory for png, or a file ending in .rgb or .raw."""
+import argparse
+import os
+import random
+import threading
+import time
+import numpy
+import pygame
+from constants import *
+from replay import Session, ReplayPilot
+from raster import FrameBuffer
+
+try:
+    import queue
+except ImportError: # Python 2
+    import Queue as queue
+
+
+#: the export formats
+FORMATS = ('png', 'raw')
+#: the name of each image of a png export, given the frame number
+PNG_NAME = 'frame_%06d.png'
+#: the number of frame buffers of a writer, which is the most frames in memory
+WRITER_CAPACITY = 8
+
+
+class FrameWriter(object):
+    """An instance writes frames to disk on a background thread.
+
+    The frames are copied into a fixed pool of buffers.  The method write
+    takes a free buffer (waiting for one if they are all queued), and the
+    writer thread returns each buffer to the pool once its frame is written.
+
+    INSTANCE ATTRIBUTES:
+        _path    [str]: the directory (png) or file (raw) to write to
+        _format  [str]: the format, one of FORMATS
+        _shape   [tuple]: the shape (height, width, 3) of a frame
+        _free    [queue.Queue]: the buffers not holding a frame
+        _full    [queue.Queue]: the frames to write, as (number, buffer), and
+                 None when there are no more frames
+        _frames  [int >= 0]: the number of frames given to write
+        _written [int >= 0]: the number of frames written
+        _stalls  [int >= 0]: the number of frames that waited for a free buffer
+        _error   [Exception, or None]: the error that stopped the writer thread
+        _file    [file, or None]: the raw file (only used by the writer thread)
+        _thread  [threading.Thread, or None if closed]: the writer thread
+    """
+
+    # GETTERS AND SETTERS
+
+    def getFrames(self):
+        """Returns: the number of frames given to write"""
+        return self._frames
+
+    def getWritten(self):
+        """Returns: the number of frames written to disk"""
+        return self._written
+
+    def getStalls(self):
+        """Returns: the number of frames that waited for the writer thread"""
+        return self._stalls
+
+    def __init__(self, path, shape, format=None, capacity=WRITER_CAPACITY):
+        """Initialize a writer and start the writer thread.
+
+            :param path: the directory (png) or file (raw) to write to
+            **Precondition**: a string
+
+            :param shape: the shape of a frame
+            **Precondition**: a tuple (height, width, 3) of ints > 0
+
+            :param format: the format
+            **Precondition**: one of FORMATS, or None to use raw if path ends
+            in .rgb or .raw and png otherwise
+
+            :param capacity: the number of frame buffers
+            **Precondition**: an int > 0"""
+        if format is None:
+            format = 'raw' if os.path.splitext(path)[1] in ('.rgb', '.raw') else 'png'
+        assert format in FORMATS, repr(format)+' is not an export format'
+        assert type(capacity) == int and capacity > 0, repr(capacity)+' is not a valid capacity'
+        self._path = path
+        self._format = format
+        self._shape = tuple(shape)
+
+        if format == 'png' and not os.path.isdir(path):
+            os.makedirs(path)
+
+        self._free = queue.Queue()
+        for index in range(capacity):
+            self._free.put(numpy.empty(self._shape, dtype=numpy.uint8))
+        self._full = queue.Queue()
+        self._frames = 0
+        self._written = 0
+        self._stalls = 0
+        self._error = None
+        self._file = None
+
+        self._thread = threading.Thread(target=self._run, name='export')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, pixels):
+        """Queues a copy of a frame to be written.
+
+        This waits for a free buffer if every buffer holds a frame.
+
+            :param pixels: the frame, top row first
+            **Precondition**: a uint8 array of the shape of this writer"""
+        assert pixels.shape == self._shape, repr(pixels.shape)+' is not the frame shape'
+        self._check()
+        try:
+            buffer = self._free.get_nowait()
+        except queue.Empty:
+            self._stalls += 1
+            buffer = self._free.get()
+            self._check()
+        numpy.copyto(buffer, pixels)
+        self._full.put((self._frames, buffer))
+        self._frames += 1
+
+    def close(self):
+        """Writes the queued frames and stops the writer thread.
+
+        This raises the error of the writer thread, if it had one."""
+        if self._thread is not None:
+            self._full.put(None)
+            self._thread.join()
+            self._thread = None
+        self._check()
+
+    # HELPER METHODS
+
+    def _check(self):
+        """Raises the error of the writer thread, if it had one."""
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        """The body of the writer thread."""
+        try:
+            while True:
+                item = self._full.get()
+                if item is None:
+                    break
+                number, buffer = item
+                if self._error is None:
+                    try:
+                        self._save(number, buffer)
+                        self._written += 1
+                    except Exception as e:
+                        self._error = e
+                # Return the buffer even after an error, so write never hangs
+                self._free.put(buffer)
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _save(self, number, buffer):
+        """Writes one frame to disk (writer thread only)."""
+        if self._format == 'raw':
+            if self._file is None:
+                self._file = open(self._path, 'wb')
+            self._file.write(buffer.data)
+        else:
+            height, width = self._shape[:2]
+            surface = pygame.image.frombuffer(buffer.tobytes(), (width, height), 'RGB')
+            pygame.image.save(surface, os.path.join(self._path, PNG_NAME % number))
+
+
+def export(session, path, format=None, scale=1.0, start=0, stop=None,
+           capacity=WRITER_CAPACITY):
+    """Returns: a dictionary of statistics for the export of a session
+
+    The session is played headless from its first tick, and the ticks
+    start..stop-1 are written as frames, one frame per tick.  The statistics
+    include the frames written, the time taken, and the speed of the export
+    compared to playing the session in real time.
+
+        :param session: the session to export
+        **Precondition**: a replay.Session
+
+        :param path: the directory (png) or file (raw) to write to
+        **Precondition**: a string
+
+        :param format: the format
+        **Precondition**: one of FORMATS, or None to choose from path
+
+        :param scale: the number of pixels per game unit (1 for native size)
+        **Precondition**: a number > 0
+
+        :param start: the first tick to write
+        **Precondition**: an int >= 0
+
+        :param stop: the tick to stop at
+        **Precondition**: an int in start..session.getTicks(), or None for
+        the end of the session
+
+        :param capacity: the number of frames the writer can hold
+        **Precondition**: an int > 0"""
+    import breakout # local to prevent circular import
+
+    stop = session.getTicks() if stop is None else stop
+    assert 0 <= start <= stop <= session.getTicks(), \
+        repr((start, stop))+' is not a range of ticks of the session'
+    config = session.getConfig()
+
+    # Breakout.init reads the settings from GAME_CONFIG, and must not record
+    saved = (breakout.GAME_CONFIG, breakout.REPLAY_FILE)
+    breakout.GAME_CONFIG = config
+    breakout.REPLAY_FILE = None
+    try:
+        random.seed(session.getSeed())
+        app = breakout.Breakout(width=config.GAME_WIDTH, height=config.GAME_HEIGHT)
+        app.init()
+        app.setPilot(ReplayPilot(session))
+
+        frame = FrameBuffer(config.GAME_WIDTH, config.GAME_HEIGHT, scale)
+        writer = FrameWriter(path, frame.getPixels().shape, format, capacity)
+        dt = 1.0/TICK_RATE
+        begin = time.time()
+        try:
+            for tick in range(stop):
+                app.update(dt)
+                if tick >= start:
+                    app.drawTo(frame, debris=False)
+                    frame.flush()
+                    writer.write(frame.getPixels())
+        finally:
+            writer.close()
+        total = time.time()-begin
+    finally:
+        breakout.GAME_CONFIG, breakout.REPLAY_FILE = saved
+
+    frames = writer.getWritten()
+    height, width = frame.getPixels().shape[:2]
+    return {'frames': frames, 'width': width, 'height': height,
+            'seconds': total, 'fps': frames/total if total > 0 else float('inf'),
+            'speed': stop/float(TICK_RATE)/total if total > 0 else float('inf'),
+            'stalls': writer.getStalls()}
+
+
+# Application code
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export a recorded Breakout session.')
+    parser.add_argument('session', help='the session file (recorded with --record)')
+    parser.add_argument('output', help='a directory for png, or a file ending in .rgb or .raw')
+    parser.add_argument('--format', choices=FORMATS,
+                        help='the export format (default: chosen from output)')
+    parser.add_argument('--start', type=int, default=0, help='the first tick to export')
+    parser.add_argument('--stop', type=int, help='the tick to stop at (default: the end)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='pixels per game unit (default: 1)')
+    args = parser.parse_args()
+
+    stats = export(Session(args.session), args.output, args.format, args.scale,
+                   args.start, args.stop)
+    print('%(frames)d frames of %(width)dx%(height)d in %(seconds).1f seconds '
+          '(%(fps).0f fps, %(speed).1fx real time)' % stats)
+    if stats['stalls'] > 0:
+        print('%(stalls)d frames waited for the disk' % stats)
@@ -18,6 +18,7 @@ from kivy.config import *
 from kivy.clock import Clock
 from kivy.graphics import *
 from kivy.graphics.instructions import *
+from kivy.graphics.texture import Texture
 from kivy.config import Config
 
 # Widgets necessary for some technical workarounds
@@ -31,7 +32,11 @@ import numpy
 import random
 import colormodel
 import pygame.mixer
+import pygame.image
+import pygame.surfarray
 import sys
+import time
+import json
 
 # User-defined resources
 FONT_PATH  = str(os.path.join(os.path.dirname(__file__), 'Fonts'))
@@ -62,6 +67,18 @@ CACHE_SOURCE = 4
 # LINE SIZE
 LINE_SIZE = 1
 
+# Size of the grid cells used to find the shapes in a damaged region
+DAMAGE_CELL = 64
+
+# The atlas file that a game loads at startup, if it is in the Images folder
+ATLAS_FILE = 'images.atlas'
+
+# The file extensions that GAtlas packs
+_IMAGE_TYPES = ('.png','.jpg','.jpeg','.gif','.bmp')
+
+# The atlas that GImage draws from (see GAtlas.use), or None
+_atlas = None
+
 #### HIDDEN HELPER FUNCTIONS ####
 def  _same_side(p1, p2, a, b):
     """Return: True is p1, p2 are on the same side of segment ba.
@@ -83,11 +100,6 @@ def _in_triangle(p, t):
             _same_side(p, t[4:6], t[0:2], t[2:4]))
 
 
-def _and(x,y):
-    """Return: x and y (used for reduce)"""
-    return x and y
-
-
 def _is_num(x):
     """Return: True if x is an int or float"""
     return type(x) in [int,float]
@@ -99,7 +111,7 @@ def _is_color(x):
         return True
     
     if type(x) in [tuple, list] and 3 <= len(x) <= 4:
-        return reduce(_and, map(lambda x: type(x) in [int, float] and 0 <= x <= 1, x)) 
+        return all(type(c) in [int, float] and 0 <= c <= 1 for c in x)
     
     return False
 
@@ -112,6 +124,21 @@ def _is_image_file(name):
     return os.path.exists(IMAGE_PATH+'/'+name)
 
 
+def _load_image(path):
+    """Return: the pixels of an image file, as a uint8 array (height,width,4)
+    with the top row first.
+    
+    Images without transparency get an alpha of 255."""
+    surface = pygame.image.load(path)
+    pixels = numpy.empty((surface.get_height(),surface.get_width(),4),dtype=numpy.uint8)
+    pixels[:,:,:3] = pygame.surfarray.array3d(surface).transpose(1,0,2)
+    try:
+        pixels[:,:,3] = pygame.surfarray.array_alpha(surface).T
+    except ValueError:
+        pixels[:,:,3] = 255
+    return pixels
+
+
 def _is_font_file(name):
     """Return: True if name is the name of an font file"""
     if type(name) != str:
@@ -128,6 +155,24 @@ def _is_sound_file(name):
     return os.path.exists(SOUND_PATH+'/'+name)
 
 
+def _grid_cells(box):
+    """Return: the tuple of damage grid cells covered by box
+    
+    Precondition: box is a (left,bottom,right,top) tuple of int or float."""
+    x0 = int(box[0]//DAMAGE_CELL)
+    y0 = int(box[1]//DAMAGE_CELL)
+    x1 = int(box[2]//DAMAGE_CELL)
+    y1 = int(box[3]//DAMAGE_CELL)
+    return tuple((x,y) for x in range(x0,x1+1) for y in range(y0,y1+1))
+
+
+def _intersects(a, b):
+    """Return: True if the boxes a and b overlap
+    
+    Precondition: a, b are (left,bottom,right,top) tuples of int or float."""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
 #### FUNCTIONS ####
 
 def Sound(filename):
@@ -141,7 +186,7 @@ def Sound(filename):
         :param filename: string providing the name of a sound file
     
     See the online documentation for more information."""
-    assert _is_sound_file(filename), `filename`+' is not a sound file'
+    assert _is_sound_file(filename), repr(filename)+' is not a sound file'
     absname = filename if os.path.isabs(filename) else str(os.path.join(SOUND_PATH, filename))
     return pygame.mixer.Sound(absname)
 
@@ -192,7 +237,7 @@ class SoundLibrary(object):
             **Precondition**:: filename is the name of a valid sound file.
         
         """
-        assert is_sound_file(filename), `filename`+' is not a sound file'
+        assert _is_sound_file(filename), repr(filename)+' is not a sound file'
         self._data[key] = Sound(filename)
     
     def __delitem__(self, key):
@@ -205,11 +250,11 @@ class SoundLibrary(object):
     
     def __iter__(self):
         """**Returns**: The iterator for this sound dictionary."""
-        return self._data.iterkeys()
+        return iter(self._data)
     
     def iterkeys(self):
         """**Returns**: The key iterator for this sound dictionary."""
-        return self._data.iterkeys()
+        return iter(self._data)
 
 
 #### GEOMETRY CLASSES ####
@@ -229,7 +274,7 @@ class GPoint(object):
     
     @x.setter
     def x(self,value):
-        assert type(value) in [int, float], `value`+' is not a number'
+        assert type(value) in [int, float], repr(value)+' is not a number'
         self._x = float(value)
     
     @property
@@ -241,7 +286,7 @@ class GPoint(object):
     
     @y.setter
     def y(self,value):
-        assert type(value) in [int, float], `value`+' is not a number'
+        assert type(value) in [int, float], repr(value)+' is not a number'
         self._y = float(value)
     
     # METHODS
@@ -298,7 +343,7 @@ class GPoint(object):
             :param other: tuple value to add
             **Precondition**: value has the same type as self.
         """
-        assert (type(other) == type(self)), "value %(value)s is not a of type %(type)s" % {'value': `other`, 'type':`type(self)`}
+        assert (type(other) == type(self)), "value %(value)s is not a of type %(type)s" % {'value': repr(other), 'type':repr(type(self))}
         result = copy.copy(self)
         result.x += other.x
         result.y += other.y
@@ -312,7 +357,7 @@ class GPoint(object):
             :param other: the tail value for the new Vector
             **Precondition**: value is a Point object.
         """
-        assert (type(other) == type(self)), "value %(value)s is not a of type %(type)s" % {'value': `other`, 'type':`type(self)`}
+        assert (type(other) == type(self)), "value %(value)s is not a of type %(type)s" % {'value': repr(other), 'type':repr(type(self))}
         result = copy.copy(self)
         result.x -= other.x
         result.y -= other.y
@@ -327,7 +372,7 @@ class GPoint(object):
             :param scalar: scalar to multiply by
             **Precondition**: value is an int or float.
         """
-        assert (type(scalar) in [int,float]), "value %s is not a number" % `scalar`
+        assert (type(scalar) in [int,float]), "value %s is not a number" % repr(scalar)
         result = copy.copy(self)
         result.x *= scalar
         result.y *= scalar
@@ -362,8 +407,8 @@ class GPoint(object):
             :param alpha: scalar to interpolate by
             **Precondition**: value is an int or float.
         """
-        assert (type(other) == type(self)), "value %(value)s is not a of type %(type)s" % {'value': `other`, 'type':`type(self)`}
-        assert (type(alpha) in [int,float]), "value %s is not a number" % `alpha`
+        assert (type(other) == type(self)), "value %(value)s is not a of type %(type)s" % {'value': repr(other), 'type':repr(type(self))}
+        assert (type(alpha) in [int,float]), "value %s is not a number" % repr(alpha)
         return alpha*self+(1-alpha)*other
     
     def distanceTo(self, other):
@@ -393,7 +438,7 @@ class GObject(object):
     
     @x.setter
     def x(self,value):
-        assert type(value) in [int, float], `value`+' is not a number'
+        assert type(value) in [int, float], repr(value)+' is not a number'
         self._x = float(value)
         if self._cache_on:
             self._cache(CACHE_POS)
@@ -407,7 +452,7 @@ class GObject(object):
     
     @y.setter
     def y(self,value):
-        assert type(value) in [int, float], `value`+' is not a number'
+        assert type(value) in [int, float], repr(value)+' is not a number'
         self._y = float(value)  
         if self._cache_on:
             self._cache(CACHE_POS)
@@ -421,7 +466,7 @@ class GObject(object):
     
     @width.setter
     def width(self,value):
-        assert type(value) in [int, float], `value`+' is not a number'
+        assert type(value) in [int, float], repr(value)+' is not a number'
         self._width = float(value)
         if self._cache_on:
             self._cache(CACHE_SIZE)
@@ -435,7 +480,7 @@ class GObject(object):
     
     @height.setter
     def height(self,value):
-        assert type(value) in [int, float], `value`+' is not a number'
+        assert type(value) in [int, float], repr(value)+' is not a number'
         self._height = float(value)
         if self._cache_on:
             self._cache(CACHE_SIZE)
@@ -508,6 +553,25 @@ class GObject(object):
     def top(self,value):
         self.y = value - self._height
     
+    @property
+    def previous(self):
+        """The position of this shape at the start of the current simulation tick.
+        
+        This is the bottom left corner recorded by the last call to `tick`.
+        When a view draws this shape with an `alpha` below 1, the shape appears
+        at the position
+        
+            GPoint(x,y).interpolate(previous,alpha)
+        
+        instead of at (x,y).  Only the drawing moves; the attributes of the
+        shape are not changed.
+        
+        **Invariant**: Immutable GPoint, or None if `tick` was not called since
+        the shape was made or reset."""
+        if self._px is None:
+            return None
+        return GPoint(self._px,self._py)
+    
     @property
     def fillcolor(self):
         """The object fill color.
@@ -522,13 +586,17 @@ class GObject(object):
     
     @fillcolor.setter
     def fillcolor(self,value):
-        assert _is_color(value), `value`+' is not a valid color'
+        assert _is_color(value), repr(value)+' is not a valid color'
         if type(value) in [tuple, list] and len(value) == 3:
             value = list(value)+[1.0]
         elif type(value) in [colormodel.RGB, colormodel.HSV]:
             value = value.glColor()
         
-        self._fillcolor = Color(value[0],value[1],value[2],value[3])
+        # Recolor the existing instruction so that the view can keep it
+        if getattr(self,'_fillcolor',None) is None:
+            self._fillcolor = Color(value[0],value[1],value[2],value[3])
+        else:
+            self._fillcolor.rgba = (value[0],value[1],value[2],value[3])
         if self._cache_on:
             self._cache(CACHE_COLOR)
         
@@ -546,13 +614,17 @@ class GObject(object):
     
     @linecolor.setter
     def linecolor(self,value):
-        assert _is_color(value), `value`+' is not a valid color'
+        assert _is_color(value), repr(value)+' is not a valid color'
         if type(value) in [tuple, list] and len(value) == 3:
             value = list(value)+[1.0]
         elif type(value) in [colormodel.RGB, colormodel.HSV]:
             value = value.glColor()
         
-        self._linecolor = Color(value[0],value[1],value[2],value[3])
+        # Recolor the existing instruction so that the view can keep it
+        if getattr(self,'_linecolor',None) is None:
+            self._linecolor = Color(value[0],value[1],value[2],value[3])
+        else:
+            self._linecolor.rgba = (value[0],value[1],value[2],value[3])
         if self._cache_on:
             self._cache(CACHE_COLOR)
     
@@ -578,6 +650,22 @@ class GObject(object):
         # Set the properties.
         # Set cache check to correct value
         self._cache_on = False
+        self._x = 0.0
+        self._y = 0.0
+        GObject.reset(self,**keywords)
+    
+    def reset(self,**keywords):
+        """Reinitializes this shape as if it were newly constructed.
+        
+            :param keywords: dictionary of keyword arguments 
+            **Precondition**: the same keywords as the constructor.
+        
+        Unlike the constructor, this method keeps the Kivy instructions of 
+        the shape.  They are moved, resized and recolored in place, so a
+        shape can be reused (see `GPool`) without allocating anything."""
+        # A reset shape has no previous position
+        self._px = None
+        self._py = None
         
         # Have to initialize size first
         self.width  = keywords['width']  if  'width' in keywords else 0.0
@@ -593,7 +681,7 @@ class GObject(object):
         elif 'right' in keywords:
             self.right = keywords['right']
         else:
-            self._x = 0.0
+            self.x = 0.0
         
         if 'y' in keywords:
             self.y = keywords['y']
@@ -604,7 +692,7 @@ class GObject(object):
         elif 'top' in keywords:
             self.top = keywords['top']
         else:
-            self._y = 0.0
+            self.y = 0.0
         
         self.fillcolor = keywords['fillcolor'] if 'fillcolor' in keywords else (1.0,1.0,1.0,1.0)
         self.linecolor = keywords['linecolor'] if 'linecolor' in keywords else (0,0,0,1)
@@ -621,10 +709,21 @@ class GObject(object):
         This method always returns `False` for a `GObject`."""
         return False
     
+    def tick(self):
+        """Records the current position as the start of a new simulation tick.
+        
+        Call this on a moving shape at the start of every simulation tick,
+        before it moves.  The view then draws the shape between this position
+        and the position it moves to (see `previous` and `GView.alpha`), so
+        that it moves smoothly even when frames are drawn more often than the
+        simulation ticks.  Shapes that never call this are drawn where they are."""
+        self._px = self._x
+        self._py = self._y
+    
     def _cache(self,style=CACHE_ALL):
         """Helper method to cache data to speed drawing. This method should be  
         overridden for specific drawing instructions."""
-        pass
+        self._damaged = True
     
     def draw(self,view):
         """Draw this shape in the provide view.
@@ -633,10 +732,18 @@ class GObject(object):
             **Precondition**: an *instance of* `GView`
         
         Ideally view should be the one provided by `Game`."""
-        # No drawing, but turn on the cache
+        # Turn on the cache, and let the view decide what to rebuild
         if not self._cache_on:
             self._cache()
             self._cache_on = True
+        view.drawObject(self)
+    
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape.
+        
+        This method should be overridden for specific drawing instructions.
+        The view only calls it when this shape has to be rebuilt."""
+        return ()
 
 
 class GLine(GObject):
@@ -732,9 +839,9 @@ class GLine(GObject):
     
     @points.setter
     def points(self,value):
-        assert type(value) in [tuple,list], `value`+' is not a tuple or list'
-        assert len(value) % 2 == 0 and len(value) > 2, 'length '+`len(value)`+' is not the correct size'
-        assert reduce(_and, map(_is_num,value)), `value`+' is not a tuple of numbers'
+        assert type(value) in [tuple,list], repr(value)+' is not a tuple or list'
+        assert len(value) % 2 == 0 and len(value) > 2, 'length '+repr(len(value))+' is not the correct size'
+        assert all(map(_is_num,value)), repr(value)+' is not a tuple of numbers'
         self._points = tuple(value)
         if self._cache_on:
             self._cache(CACHE_ALL)
@@ -758,6 +865,18 @@ class GLine(GObject):
         Therefore `point` and `linecolor` are the two primary keywords
         used by this constructor."""
         self._cache_on = False
+        GLine.reset(self,**keywords)
+    
+    def reset(self,**keywords):
+        """Reinitializes this shape as if it were newly constructed.
+        
+            :param keywords: dictionary of keyword arguments 
+            **Precondition**: the same keywords as the constructor.
+        
+        The colors are changed in place.  The line itself is rebuilt, as
+        its points may have changed."""
+        self._px = None
+        self._py = None
         self.points = keywords['points'] if 'points' in keywords else ()
         self.fillcolor = keywords['fillcolor'] if 'fillcolor' in keywords else (1,1,1,1)
         self.linecolor = keywords['linecolor'] if 'linecolor' in keywords else (0,0,0,1)
@@ -765,6 +884,7 @@ class GLine(GObject):
     def _cache(self,style=CACHE_ALL):
         """Helper method to cache data to speed drawing. This method should be  
         overridden for specific drawing instructions."""
+        self._damaged = True
         mxx = None
         mxy = None
         mnx = None
@@ -802,17 +922,9 @@ class GLine(GObject):
         This method always returns `False` as a `GLine` has no interior."""
         return False
     
-    def draw(self,view):
-        """Draw this shape in the provide view.
-        
-            :param view: view to draw to
-            **Precondition**: an *instance of* `GView`
-        
-        Ideally view should be the one provided by `Game`."""
-        # Invoke the cache
-        GObject.draw(self,view)
-        view.draw(self._linecolor)
-        view.draw(self._lcache)
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape."""
+        return (self._linecolor, self._lcache)
 
 
 class GTriangle(GLine):
@@ -835,9 +947,9 @@ class GTriangle(GLine):
     
     @points.setter
     def points(self,value):
-        assert type(value) in [tuple,list], `value`+' is not a tuple or list'
-        assert len(value) == 6, 'length '+`len(value)`+' does not have 6 elements'
-        assert reduce(lambda x, y: x and y, map(_is_num,value)), `value`+' is not a tuple of numbers'
+        assert type(value) in [tuple,list], repr(value)+' is not a tuple or list'
+        assert len(value) == 6, 'length '+repr(len(value))+' does not have 6 elements'
+        assert all(map(_is_num,value)), repr(value)+' is not a tuple of numbers'
         self._points = tuple(value)
         if self._cache_on:
             self._cache(CACHE_ALL)
@@ -862,12 +974,13 @@ class GTriangle(GLine):
     def _cache(self,style=CACHE_ALL):
         """Helper method to cache data to speed drawing. This method should be  
         overridden for specific drawing instructions."""
+        self._damaged = True
         GLine._cache(self)
         size = 3
         vertices = ()
         for x in range(3):
             vertices += self.points[2*x:2*x+2]+(0,0)
-        self._mcache = Mesh(vertices=vertices, indices=range(size), mode='triangle_strip')
+        self._mcache = Mesh(vertices=vertices, indices=list(range(size)), mode='triangle_strip')
     
     def contains(self,x,y):
         """Return: True if this shape contains the point (x,y), False otherwise.
@@ -881,18 +994,9 @@ class GTriangle(GLine):
         This method uses a standard test for triangle inclusion."""
         return _in_triangle((x,y),self._points)
     
-    def draw(self,view):
-        """Draw this shape in the provide view.
-        
-            :param view: view to draw to
-            **Precondition**: an *instance of* `GView`
-        
-        Ideally view should be the one provided by `Game`."""
-        GObject.draw(self,view)
-        view.draw(self._fillcolor)
-        view.draw(self._mcache)
-        view.draw(self._linecolor)
-        view.draw(self._lcache)
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape."""
+        return (self._fillcolor, self._mcache, self._linecolor, self._lcache)
 
 
 class GPolygon(GLine):
@@ -920,9 +1024,9 @@ class GPolygon(GLine):
 
     @centroid.setter
     def centroid(self,value):
-        assert type(value) in [tuple,list], `value`+' is not a tuple or list'
-        assert len(value) == 2, `value`+' does not have 2 elements'
-        assert reduce(lambda x, y: x and y, map(_is_num,value)), `value`+' is not a list of numbers'
+        assert type(value) in [tuple,list], repr(value)+' is not a tuple or list'
+        assert len(value) == 2, repr(value)+' does not have 2 elements'
+        assert all(map(_is_num,value)), repr(value)+' is not a list of numbers'
         self._centroid = tuple(value)
         self._cache()
         
@@ -954,19 +1058,20 @@ class GPolygon(GLine):
                     xpos += self.points[i]
                 else:
                     ypos += self.points[i]
-            size = float(len(self.points)/2)
+            size = float(len(self.points)//2)
             self.centroid = (xpos/size, ypos/size)
     
     def _cache(self,style=CACHE_ALL):
         """Helper method to cache data to speed drawing. This method should be  
         overridden for specific drawing instructions."""
+        self._damaged = True
         GLine._cache(self)
-        size = len(self.points)/2
+        size = len(self.points)//2
         vertices = self.centroid+(0,0)
         for x in range(size):
             vertices += self.points[2*x:2*x+2]+(0,0)
         vertices += self.points[0:2]+(0,0)
-        self._mcache = Mesh(vertices=vertices, indices=range(size+2), mode='triangle_fan')
+        self._mcache = Mesh(vertices=vertices, indices=list(range(size+2)), mode='triangle_fan')
     
     def contains(self,x,y):
         """Return: True if this shape contains the point (x,y), False otherwise.
@@ -980,24 +1085,15 @@ class GPolygon(GLine):
         This method cycles through each triangle in the triangle fan and
         tests each triangle for inclusion."""
         found = False
-        for i in xrange(4,len(self._points),2):
+        for i in range(4,len(self._points),2):
             t = self.centroid+self.points[i-4:i]
             found = found or _in_triangle((x,y),t)
         
         return found
     
-    def draw(self,view):
-        """Draw this shape in the provide view.
-        
-            :param view: view to draw to
-            **Precondition**: an *instance of* `GView`
-        
-        Ideally view should be the one provided by `Game`."""
-        GObject.draw(self,view)
-        view.draw(self._fillcolor)
-        view.draw(self._mcache)
-        view.draw(self._linecolor)
-        view.draw(self._lcache)
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape."""
+        return (self._fillcolor, self._mcache, self._linecolor, self._lcache)
 
 
 class GRectangle(GObject):
@@ -1032,6 +1128,7 @@ class GRectangle(GObject):
     def _cache(self,style=CACHE_ALL):
         """Helper method to cache data to speed drawing. This method should be  
         overridden for specific drawing instructions."""
+        self._damaged = True
         if self._scache is None:
             self._scache = Rectangle(pos=(self.x, self.y), size=(self.width, self.height))
             self._lcache = Rectangle(pos=(self.x-LINE_SIZE,self.y-LINE_SIZE),size=(self.width+2*LINE_SIZE,self.height+2*LINE_SIZE))        
@@ -1041,6 +1138,8 @@ class GRectangle(GObject):
         elif style == CACHE_SIZE:
             self._scache.size=(self.width, self.height)
             self._lcache.size=(self.width+2*LINE_SIZE, self.height+2*LINE_SIZE)
+        elif style == CACHE_COLOR:
+            pass # The colors are separate instructions, changed in place
         else:
             self._scache = Rectangle(pos=(self.x, self.y), size=(self.width, self.height))
             self._lcache = Rectangle(pos=(self.x-LINE_SIZE,self.y-LINE_SIZE),size=(self.width+2*LINE_SIZE,self.height+2*LINE_SIZE))
@@ -1057,19 +1156,9 @@ class GRectangle(GObject):
         This method uses a standard test for rectangle inclusion."""
         return (self.left <= x and x <= self.right and self.bottom <= y and y <= self.top)
     
-    def draw(self,view):
-        """Draw this shape in the provide view.
-        
-            :param view: view to draw to
-            **Precondition**: an *instance of* `GView`
-        
-        Ideally view should be the one provided by `Game`."""
-        # Invoke the cache
-        GObject.draw(self,view)
-        view.draw(self._linecolor)
-        view.draw(self._lcache)
-        view.draw(self._fillcolor)
-        view.draw(self._scache)
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape."""
+        return (self._linecolor, self._lcache, self._fillcolor, self._scache)
 
 
 class GEllipse(GRectangle):
@@ -1102,6 +1191,7 @@ class GEllipse(GRectangle):
     def _cache(self,style=CACHE_ALL):
         """Helper method to cache data to speed drawing. This method should be  
         overridden for specific drawing instructions."""
+        self._damaged = True
         if self._scache is None:
             self._scache = Ellipse(pos=(self.x, self.y), size=(self.width, self.height))
             self._lcache = Ellipse(pos=(self.x-LINE_SIZE,self.y-LINE_SIZE),size=(self.width+2*LINE_SIZE,self.height+2*LINE_SIZE))
@@ -1111,6 +1201,8 @@ class GEllipse(GRectangle):
         elif style == CACHE_SIZE:
             self._scache.size=(self.width, self.height)
             self._lcache.size=(self.width+2*LINE_SIZE, self.height+2*LINE_SIZE)
+        elif style == CACHE_COLOR:
+            pass # The colors are separate instructions, changed in place
         else:
             self._scache = Ellipse(pos=(self.x, self.y), size=(self.width, self.height))
             self._lcache = Ellipse(pos=(self.x-LINE_SIZE,self.y-LINE_SIZE),size=(self.width+2*LINE_SIZE,self.height+2*LINE_SIZE))
@@ -1167,7 +1259,7 @@ class GImage(GRectangle):
 
     @source.setter
     def source(self,value):
-        assert value is None or _is_image_file(value), `value`+' is not an image file'
+        assert value is None or _is_image_file(value), repr(value)+' is not an image file'
         self._source = value
         self._cache()
         
@@ -1188,37 +1280,61 @@ class GImage(GRectangle):
         GRectangle.__init__(self,**keywords)
         if 'source' in keywords:
             value =  keywords['source']
-            assert value is None or _is_image_file(value), `value`+' is not an image file'
+            assert value is None or _is_image_file(value), repr(value)+' is not an image file'
             self._source = value
         else:
             self._source = None
         self._scache = None
     
+    def reset(self,**keywords):
+        """Reinitializes this image as if it were newly constructed.
+        
+            :param keywords: dictionary of keyword arguments 
+            **Precondition**: the same keywords as the constructor.
+        
+        The rectangle of the image is kept, and only its source is changed."""
+        GRectangle.reset(self,**keywords)
+        value = keywords['source'] if 'source' in keywords else None
+        assert value is None or _is_image_file(value), repr(value)+' is not an image file'
+        if value != self._source:
+            self._source = value
+            if self._cache_on:
+                self._cache(CACHE_SOURCE)
+    
     def _cache(self,style=CACHE_ALL):
         """Helper method to cache data to speed drawing. This method should be  
-        overridden for specific drawing instructions."""
+        overridden for specific drawing instructions.
+        
+        If the source is in the active atlas (see `GAtlas`), the rectangle
+        draws its region of the atlas instead of loading the file."""
+        self._damaged = True
         if self._scache is None:
-            self._scache = Rectangle(pos=(self.x, self.y), size=(self.width, self.height), source=self._source)        
+            self._scache = self._rectangle()
         elif style == CACHE_POS:
             self._scache.pos=(self.x, self.y)
         elif style == CACHE_SIZE:
             self._scache.size=(self.width, self.height)
         elif style == CACHE_SOURCE:
-            self._scache.source = self._source
+            region = None if _atlas is None or self._source is None else _atlas.region(self._source)
+            if region is None:
+                self._scache.source = self._source
+            else:
+                self._scache.texture = region
+        elif style == CACHE_COLOR:
+            pass # The color is a separate instruction, changed in place
         else:
-            self._scache = Rectangle(pos=(self.x, self.y), size=(self.width, self.height), source=self._source)        
+            self._scache = self._rectangle()
     
-    def draw(self,view):
-        """Draw this shape in the provide view.
-        
-            :param view: view to draw to
-            **Precondition**: an *instance of* `GView`
-        
-        Ideally view should be the one provided by `Game`."""
-        # Invoke the cache
-        GObject.draw(self,view)
-        view.draw(self._fillcolor)
-        view.draw(self._scache)
+    def _rectangle(self):
+        """Returns: a new Rectangle instruction for this image"""
+        region = None if _atlas is None or self._source is None else _atlas.region(self._source)
+        if region is None:
+            return Rectangle(pos=(self.x, self.y), size=(self.width, self.height), source=self._source)
+        return Rectangle(pos=(self.x, self.y), size=(self.width, self.height), texture=region)
+    
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape."""
+        return (self._fillcolor, self._scache)
 
 
 class GLabel(GRectangle):
@@ -1254,7 +1370,7 @@ class GLabel(GRectangle):
 
     @font_size.setter
     def font_size(self,value):
-        assert type(value) in (int,float), `value`+' is not a number'
+        assert type(value) in (int,float), repr(value)+' is not a number'
         self._label.font_size = value
         self._label.texture_update()
 
@@ -1267,7 +1383,7 @@ class GLabel(GRectangle):
 
     @font_name.setter
     def font_name(self,value):
-        assert _is_font_file(value), `value`+' is not a font name'
+        assert _is_font_file(value), repr(value)+' is not a font name'
         self._label.font_name = value
         self._label.texture_update()
 
@@ -1285,7 +1401,7 @@ class GLabel(GRectangle):
 
     @bold.setter
     def bold(self,value):
-        assert type(value) == bool, `value`+' is not a bool'
+        assert type(value) == bool, repr(value)+' is not a bool'
         self._label.bold = value
         self._label.texture_update()
 
@@ -1303,7 +1419,7 @@ class GLabel(GRectangle):
     
     @text.setter
     def text(self,value):
-        assert type(value) == str, `value`+' is not a string'
+        assert type(value) == str, repr(value)+' is not a string'
         self._label.text = value
         self._label.texture_update()
 
@@ -1321,7 +1437,7 @@ class GLabel(GRectangle):
     
     @halign.setter
     def halign(self,value):
-        assert value in ('left','right','center'), `value`+' is not a valid horizontal alignment'
+        assert value in ('left','right','center'), repr(value)+' is not a valid horizontal alignment'
         self._halign = value
         self._label.halign = value
         self._cache(CACHE_POS)
@@ -1340,7 +1456,7 @@ class GLabel(GRectangle):
     
     @valign.setter
     def valign(self,value):
-        assert value in ('top','middle','bottom'), `value`+' is not a valid vertical alignment'
+        assert value in ('top','middle','bottom'), repr(value)+' is not a valid vertical alignment'
         self._valign = value
         self._label.valign = value
         self._cache(CACHE_POS)
@@ -1389,6 +1505,7 @@ class GLabel(GRectangle):
     def _cache(self,style=CACHE_ALL):
         """Helper method to cache data to speed drawing. This method should be  
         overridden for specific drawing instructions."""
+        self._damaged = True
         if style == CACHE_POS and not self._scache is None:
             self._label.pos=(self.x, self.y)
             self._scache.pos = (self.x, self.y)
@@ -1444,18 +1561,362 @@ class GLabel(GRectangle):
         
         self._scache = Rectangle(pos=(self.x, self.y), size=(self.width, self.height))
     
-    def draw(self,view):
-        """Draw this shape in the provide view.
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape."""
+        return (self._fillcolor, self._scache, self._label.canvas)
+
+
+class GPool(object):
+    """Instances keep shapes that are no longer in use, so they can be reused.
+    
+    Creating a shape creates its Kivy instructions the first time it is drawn,
+    and a shape that is thrown away leaves them for the garbage collector.
+    Games that spawn and despawn many shapes (balls, debris, power-ups) can
+    take them from a pool instead:
+    
+        pool  = GPool(GEllipse)
+        shape = pool.acquire(x=0,y=0,width=10,height=10)
+        ...
+        pool.release(shape)
+    
+    A shape that is acquired again is reinitialized by its `reset` method, 
+    which moves, resizes and recolors the instructions it already has.  A
+    different reset hook may be given for subclasses with more state (such
+    as a velocity).  The arguments of `acquire` are passed to the factory
+    when a new shape is needed, and to the reset hook otherwise.
+    
+    A released shape must not be drawn again until it is acquired."""
+    
+    @property
+    def live(self):
+        """The number of shapes acquired and not yet released.
         
-            :param view: view to draw to
-            **Precondition**: an *instance of* `GView`
+        **Invariant**: Immutable int >= 0."""
+        return self._live
+    
+    @property
+    def free(self):
+        """The number of shapes waiting in this pool to be reused.
         
-        Ideally view should be the one provided by `Game`."""
-        # Invoke the cache
-        GObject.draw(self,view)
-        view.draw(self._fillcolor)
-        view.draw(self._scache)
-        view.draw(self._label.canvas)
+        **Invariant**: Immutable int >= 0."""
+        return len(self._free)
+    
+    @property
+    def peak(self):
+        """The largest number of shapes that were ever live at once.
+        
+        This is the high-water mark of the pool.  If the pool is warmed 
+        with this many shapes, it never has to create a new one.
+        
+        **Invariant**: Immutable int >= 0."""
+        return self._peak
+    
+    @property
+    def created(self):
+        """The number of shapes this pool had to create.
+        
+        **Invariant**: Immutable int >= 0."""
+        return self._created
+    
+    def __init__(self,factory,reset=None,capacity=None):
+        """**Constructor**: creates a new, empty pool
+        
+            :param factory: the function to create a new shape
+            **Precondition**: a callable (such as a GObject subclass)
+            
+            :param reset: the function to reinitialize a shape, called as 
+            reset(shape,...) with the arguments of `acquire`
+            **Precondition**: a callable, or None to use the `reset` method
+            
+            :param capacity: the most shapes kept for reuse
+            **Precondition**: an int >= 0, or None for no limit"""
+        assert callable(factory), repr(factory)+' is not callable'
+        assert reset is None or callable(reset), repr(reset)+' is not callable'
+        assert capacity is None or (type(capacity) == int and capacity >= 0), repr(capacity)+' is not a valid capacity'
+        self._factory  = factory
+        self._reset    = reset
+        self._capacity = capacity
+        self._free     = []
+        self._live     = 0
+        self._peak     = 0
+        self._created  = 0
+    
+    def acquire(self,*args,**keywords):
+        """Returns: a shape, reused if possible and created otherwise.
+        
+            :param args: the arguments for the factory or the reset hook
+            **Precondition**: valid arguments for both"""
+        if self._free:
+            shape = self._free.pop()
+            if self._reset is None:
+                shape.reset(*args,**keywords)
+            else:
+                self._reset(shape,*args,**keywords)
+        else:
+            shape = self._factory(*args,**keywords)
+            self._created += 1
+        
+        self._live += 1
+        if self._live > self._peak:
+            self._peak = self._live
+        return shape
+    
+    def release(self,shape):
+        """Returns a shape to this pool for reuse.
+        
+            :param shape: the shape to release
+            **Precondition**: a shape acquired from this pool and not yet released"""
+        assert self._live > 0, 'there are no shapes to release'
+        assert not shape in self._free, repr(shape)+' was already released'
+        self._live -= 1
+        if self._capacity is None or len(self._free) < self._capacity:
+            self._free.append(shape)
+    
+    def reserve(self,count,*args,**keywords):
+        """Creates shapes until this pool has at least count free shapes.
+        
+        This moves the cost of creating shapes to a time of your choosing, 
+        such as the start of a level.
+        
+            :param count: the number of free shapes to have
+            **Precondition**: an int >= 0
+            
+            :param args: the arguments for the factory
+            **Precondition**: valid arguments for the factory"""
+        while len(self._free) < count:
+            self._free.append(self._factory(*args,**keywords))
+            self._created += 1
+
+
+class GAtlas(object):
+    """Instances pack many images into a few large textures.
+    
+    Every `GImage` draws a `Rectangle` with its own source, so it binds its
+    own texture.  A scene with many images (themed bricks, power-up icons)
+    binds a texture for every one of them.  An atlas packs the images into
+    a few square pages instead, and a `GImage` whose source is in the active
+    atlas draws its region of a page.  Images on the same page share one
+    texture, so a screen full of them draws with a single texture bind.
+    
+    An atlas is either packed from the image files at startup:
+    
+        atlas = GAtlas()
+        atlas.build()
+        atlas.use()
+    
+    or packed once offline and saved, and then loaded at startup:
+    
+        atlas.save('images.atlas')
+        ...
+        atlas = GAtlas.load('images.atlas')
+    
+    The file is in the Kivy atlas format: a JSON index of the regions, plus
+    one PNG file per page next to it.  The pixels are kept until the first
+    call to `region`, which makes the textures, so an atlas can be built and
+    saved without a window.
+    
+    Images that are not in the active atlas (or are too big for a page) are
+    still drawn from their own files."""
+    
+    @property
+    def size(self):
+        """The width and height of a page in pixels.
+        
+        **Invariant**: Immutable int > 0."""
+        return self._size
+    
+    @property
+    def padding(self):
+        """The empty pixels around each image, so that filtering does not
+        bleed the neighbors of an image into it.
+        
+        **Invariant**: Immutable int >= 0."""
+        return self._padding
+    
+    @property
+    def pages(self):
+        """The number of pages (textures) in this atlas.
+        
+        **Invariant**: Immutable int >= 0."""
+        if self._textures is not None:
+            return len(self._textures)
+        return len(self._pages)
+    
+    @property
+    def names(self):
+        """The names of the images in this atlas, in sorted order.
+        
+        **Invariant**: Immutable list of str."""
+        return sorted(self._regions.keys())
+    
+    def __init__(self,size=1024,padding=2):
+        """**Constructor**: creates a new, empty atlas
+        
+            :param size: the width and height of a page in pixels
+            **Precondition**: an int > 0 (a power of two works best)
+            
+            :param padding: the empty pixels around each image
+            **Precondition**: an int >= 0"""
+        assert type(size) == int and size > 0, repr(size)+' is not a valid page size'
+        assert type(padding) == int and padding >= 0, repr(padding)+' is not a valid padding'
+        self._size     = size
+        self._padding  = padding
+        self._extra    = {}
+        self._pages    = []
+        self._regions  = {}
+        self._textures = None
+        self._slices   = {}
+    
+    def register(self,name,pixels=None):
+        """Adds an image to pack with the files of the **Images** folder.
+        
+        Use this for images the folder scan does not find, such as images in
+        a subfolder ('themes/brick.png'), or images made by the game itself.
+        It must be called before `build`.
+        
+            :param name: the name of the image, relative to the **Images** folder
+            **Precondition**: a string
+            
+            :param pixels: the pixels of the image, with the top row first, or
+            None to read the file name
+            **Precondition**: a uint8 array of shape (height,width,4), or None"""
+        assert type(name) == str, repr(name)+' is not a string'
+        assert pixels is None or (pixels.ndim == 3 and pixels.shape[2] == 4), 'pixels is not an RGBA array'
+        self._extra[name] = pixels
+    
+    def build(self):
+        """Packs every image of the **Images** folder, and every registered image.
+        
+        The images are packed tallest first, in rows (shelves) across each
+        page, which wastes little space for sprites of similar heights.  A new
+        page is started when a page is full.  An image bigger than a page is
+        left out, and is drawn from its own file.  The pages of atlas files
+        saved in the folder are not images to pack."""
+        # The pages of saved atlases are not packed again
+        files = sorted(os.listdir(IMAGE_PATH))
+        pages = set()
+        for name in files:
+            if name.endswith('.atlas'):
+                with open(os.path.join(IMAGE_PATH,name)) as file:
+                    pages.update(json.load(file).keys())
+        
+        images = {}
+        for name in files:
+            if os.path.splitext(name)[1].lower() in _IMAGE_TYPES and not name in pages:
+                images[name] = None
+        images.update(self._extra)
+        
+        entries = []
+        for name in images:
+            pixels = images[name]
+            if pixels is None:
+                pixels = _load_image(os.path.join(IMAGE_PATH,name))
+            entries.append((-pixels.shape[0],-pixels.shape[1],name,pixels))
+        entries.sort()
+        
+        self._pages = []
+        self._regions = {}
+        self._textures = None
+        self._slices = {}
+        pad = self._padding
+        page = None
+        for _, _, name, pixels in entries:
+            h, w = pixels.shape[:2]
+            if w+2*pad > self._size or h+2*pad > self._size:
+                continue
+            if page is None or x+w+2*pad > self._size:
+                # A new shelf, and maybe a new page
+                if page is not None:
+                    y += shelf
+                if page is None or y+h+2*pad > self._size:
+                    page = numpy.zeros((self._size,self._size,4),dtype=numpy.uint8)
+                    self._pages.append(page)
+                    y = 0
+                x = 0
+                shelf = h+2*pad
+            
+            # Pages are stored bottom row first, like a Kivy texture
+            page[y+pad:y+pad+h,x+pad:x+pad+w] = pixels[::-1]
+            self._regions[name] = (len(self._pages)-1,x+pad,y+pad,w,h)
+            x += w+2*pad
+    
+    def save(self,filename):
+        """Saves this atlas to a file, to be loaded with `load`.
+        
+        The pages are saved as PNG files next to it, named after the file
+        ('images.atlas' has pages 'images-0.png', 'images-1.png', ...).
+        
+            :param filename: the atlas file, relative to the **Images** folder
+            **Precondition**: a string ending in '.atlas'"""
+        assert self._pages, 'there are no pixels to save'
+        path = os.path.join(IMAGE_PATH,filename)
+        base = os.path.splitext(os.path.basename(path))[0]
+        index = {}
+        for number in range(len(self._pages)):
+            page = self._pages[number]
+            name = '%s-%d.png' % (base,number)
+            surface = pygame.image.frombuffer(page[::-1].tobytes(),(self._size,self._size),'RGBA')
+            pygame.image.save(surface,os.path.join(os.path.dirname(path),name))
+            index[name] = {}
+            for key in self._regions:
+                region = self._regions[key]
+                if region[0] == number:
+                    index[name][key] = list(region[1:])
+        
+        with open(path,'w') as file:
+            json.dump(index,file,indent=1,sort_keys=True)
+    
+    @classmethod
+    def load(cls,filename):
+        """**Returns**: the atlas saved in a file
+        
+            :param filename: the atlas file, relative to the **Images** folder
+            **Precondition**: a string naming a file written by `save` (or by
+            the Kivy atlas tool)"""
+        path = os.path.join(IMAGE_PATH,filename)
+        with open(path) as file:
+            index = json.load(file)
+        
+        atlas = None
+        for number, name in enumerate(sorted(index.keys())):
+            page = _load_image(os.path.join(os.path.dirname(path),name))[::-1]
+            if atlas is None:
+                atlas = cls(page.shape[0],0)
+            atlas._pages.append(numpy.ascontiguousarray(page))
+            for key in index[name]:
+                x, y, w, h = index[name][key]
+                atlas._regions[str(key)] = (number,x,y,w,h)
+        return cls() if atlas is None else atlas
+    
+    def use(self):
+        """Makes this the atlas that every `GImage` draws from.
+        
+        It only affects images whose instructions are made afterwards, so
+        call it before the first image is drawn."""
+        global _atlas
+        _atlas = self
+    
+    def region(self,name):
+        """**Returns**: the texture region of an image, or None if it is not
+        in this atlas.
+        
+        The first call makes the textures of the pages, so it needs a window.
+        
+            :param name: the name of the image
+            **Precondition**: a string"""
+        if not name in self._regions:
+            return None
+        if not name in self._slices:
+            if self._textures is None:
+                self._textures = []
+                for page in self._pages:
+                    texture = Texture.create(size=(page.shape[1],page.shape[0]),colorfmt='rgba')
+                    texture.blit_buffer(page.tobytes(),colorfmt='rgba',bufferfmt='ubyte')
+                    self._textures.append(texture)
+                self._pages = []
+            number, x, y, w, h = self._regions[name]
+            self._slices[name] = self._textures[number].get_region(x,y,w,h)
+        return self._slices[name]
 
 
 #### APPLICATION CLASSES ####
@@ -1485,15 +1946,71 @@ class GView(FloatLayout):
         
         return GPoint(self._touch.x,self._touch.y)
     
+    @property
+    def rebuilt(self):
+        """The number of shapes whose instructions were rebuilt in the last frame.
+        
+        **Invariant**: Immutable int >= 0."""
+        return self._rebuilt
+    
+    @property
+    def repainted(self):
+        """The fraction of the view that was repainted in the last frame.
+        
+        This is the area of all damaged regions divided by the area of the
+        view.  Overlapping regions are counted twice, so it is an upper bound.
+        
+        **Invariant**: Immutable float in 0..1."""
+        return self._repainted
+    
+    @property
+    def alpha(self):
+        """How far the current frame is between the last two simulation ticks.
+        
+        A shape that records its position every tick (see `GObject.tick`) is
+        drawn at `GPoint(x,y).interpolate(previous,alpha)`, so 1 draws it
+        where it is now and 0 draws it where it was a tick ago.  Set this
+        before drawing a frame.
+        
+        **Invariant**: Must be a float in 0..1."""
+        return self._alpha
+    
+    @alpha.setter
+    def alpha(self,value):
+        assert type(value) in [int,float] and 0 <= value <= 1, repr(value)+' is not a number in 0..1'
+        self._alpha = float(value)
+    
     def __init__(self):
         """**Initializer**: creates a new GView"""
         FloatLayout.__init__(self)
         self.bind(on_touch_down=self._capture_touch)
         self.bind(on_touch_move=self._capture_touch)
         self.bind(on_touch_up=self._release_touch)
+        self._touch = None
+        
+        # The background, the retained shapes, and the per-frame instructions
+        self._backrect = Rectangle(pos=self.pos,size=self.size)
+        self._background = InstructionGroup()
+        self._background.add(Color(1,1,1))
+        self._background.add(self._backrect)
+        self._layer = InstructionGroup()
         self._frame = InstructionGroup()
+        self.canvas.add(self._background)
+        self.canvas.add(self._layer)
         self.canvas.add(self._frame)
-        self._touch = None
+        
+        # Damage tracking
+        self._retained = {}
+        self._grid = {}
+        self._changed = []
+        self._damage  = []
+        self._frameno = 0
+        self._order   = 0
+        self._drawn   = 0
+        self._reorder = False
+        self._rebuilt = 0
+        self._repainted = 0.0
+        self._alpha = 1.0
     
     def _capture_touch(self,view,touch):
         """Helper method to respond (and grap) a mouse press"""
@@ -1507,19 +2024,192 @@ class GView(FloatLayout):
     def draw(self,cmd):
         """Adds the giving drawing command to this canvas for drawing.
         
+        Commands added this way are not retained.  They are drawn on top of
+        all shapes, and they are discarded at the start of the next frame.
+        
             :param cmd: The drawing command
             **Invariant**: cmd is a Kivy drawing instruction.
         """
         self._frame.add(cmd)
     
+    def drawObject(self,shape):
+        """Draws the given shape in this frame.
+        
+        The view keeps the instructions of a shape between frames.  They are
+        only rebuilt when they intersect a damaged region: a region where a
+        shape appeared, disappeared, moved, resized, or changed color.  Shapes
+        are layered in the order that they are drawn.
+        
+        You should never need to call this method.  Call the `draw` method
+        of the shape instead.
+        
+            :param shape: The shape to draw
+            **Invariant**: shape is a GObject.
+        """
+        entry = self._retained.get(id(shape))
+        changed = entry is None or shape._damaged
+        if entry is None:
+            entry = _Retained(shape)
+            self._retained[id(shape)] = entry
+        
+        # A shape with a previous position is drawn in between, by a translation
+        # that is changed in place every frame
+        if shape._px is not None:
+            if entry.translate is None:
+                entry.push = PushMatrix()
+                entry.translate = Translate(0,0)
+                entry.pop = PopMatrix()
+                changed = True
+            back = self._alpha-1.0
+            entry.translate.x = back*(shape._x-shape._px)
+            entry.translate.y = back*(shape._y-shape._py)
+        elif entry.translate is not None:
+            entry.translate.x = 0.0
+            entry.translate.y = 0.0
+        
+        if changed:
+            self._changed.append(entry)
+        
+        if entry.order != self._order:
+            entry.order = self._order
+            self._reorder = True
+        # A shape may be drawn more than once a frame, so count it only once
+        if entry.frame != self._frameno:
+            entry.frame = self._frameno
+            self._drawn += 1
+        self._order += 1
+    
     def _redraw(self):
-        """Helper called to refresh the screen each animation frame"""
-        self.canvas.remove(self._frame)
+        """Helper called to start each animation frame"""
         self._frame.clear()
-        self._frame = InstructionGroup()
-        self.canvas.add(self._frame)
-        self._frame.add(Color(1,1,1))
-        self._frame.add(Rectangle(pos=self.pos,size=self.size))
+        self._frameno += 1
+        self._order = 0
+        self._drawn = 0
+        
+        # Resizing the window damages everything
+        if tuple(self._backrect.pos) != tuple(self.pos) or tuple(self._backrect.size) != tuple(self.size):
+            self._backrect.pos  = self.pos
+            self._backrect.size = self.size
+            self._damage.append((self.x,self.y,self.x+self.width,self.y+self.height))
+    
+    def _flush(self):
+        """Helper called to finish each animation frame.
+        
+        This is where damaged shapes are rebuilt, and shapes that were not
+        drawn this frame are removed."""
+        damage = self._damage
+        
+        # Shapes that were added, moved, resized, or recolored
+        for entry in self._changed:
+            shape = entry.shape
+            shape._damaged = False
+            bounds = (shape.x-LINE_SIZE,shape.y-LINE_SIZE,
+                      shape.x+shape.width+LINE_SIZE,shape.y+shape.height+LINE_SIZE)
+            if bounds != entry.bounds:
+                if not entry.bounds is None:
+                    damage.append(entry.bounds)
+                self._place(entry,bounds)
+            damage.append(bounds)
+        
+        # Shapes that were not drawn this frame
+        if len(self._retained) > self._drawn:
+            for key in list(self._retained.keys()):
+                entry = self._retained[key]
+                if entry.frame != self._frameno:
+                    del self._retained[key]
+                    self._place(entry,None)
+                    entry.group.clear()
+                    damage.append(entry.bounds)
+                    self._reorder = True
+        
+        # Rebuild all shapes intersecting the damage
+        rebuild = set()
+        for box in damage:
+            for cell in _grid_cells(box):
+                for key in self._grid.get(cell,()):
+                    if _intersects(self._retained[key].bounds,box):
+                        rebuild.add(key)
+        for key in rebuild:
+            entry = self._retained[key]
+            entry.group.clear()
+            if entry.translate is not None:
+                entry.group.add(entry.push)
+                entry.group.add(entry.translate)
+            for cmd in entry.shape._instructions():
+                entry.group.add(cmd)
+            if entry.translate is not None:
+                entry.group.add(entry.pop)
+        
+        # Restore the layering if shapes were added, removed, or drawn out of order
+        if self._reorder:
+            self._layer.clear()
+            for entry in sorted(self._retained.values(),key=lambda e: e.order):
+                self._layer.add(entry.group)
+            self._reorder = False
+        
+        # Statistics
+        area = 0.0
+        for box in damage:
+            w = min(box[2],self.x+self.width)-max(box[0],self.x)
+            h = min(box[3],self.y+self.height)-max(box[1],self.y)
+            if w > 0 and h > 0:
+                area += w*h
+        total = float(self.width*self.height)
+        self._repainted = min(1.0,area/total) if total > 0 else 0.0
+        self._rebuilt = len(rebuild)
+        
+        del self._changed[:]
+        del damage[:]
+    
+    def _place(self,entry,bounds):
+        """Helper to move a retained shape in the damage grid.
+        
+        If bounds is None, the shape is removed from the grid."""
+        key = id(entry.shape)
+        for cell in entry.cells:
+            bucket = self._grid[cell]
+            bucket.discard(key)
+            if not bucket:
+                del self._grid[cell]
+        
+        if bounds is None:
+            entry.cells = ()
+            return
+        
+        entry.bounds = bounds
+        entry.cells = _grid_cells(bounds)
+        for cell in entry.cells:
+            self._grid.setdefault(cell,set()).add(key)
+
+
+class _Retained(object):
+    """Instances record a shape that a `GView` keeps between frames.
+    
+    Attributes:
+        shape:  the GObject drawn
+        group:  the InstructionGroup holding the instructions of the shape
+        bounds: the (left,bottom,right,top) of the shape when last drawn, or None
+        cells:  the tuple of damage grid cells covered by bounds
+        order:  the layer of the shape when last drawn
+        frame:  the frame number in which the shape was last drawn
+        translate: the Translate that draws the shape between its previous
+                and current positions, or None if the shape never had a
+                previous position
+        push:   the PushMatrix before translate, or None
+        pop:    the PopMatrix after the shape, or None
+    """
+    
+    def __init__(self,shape):
+        """**Initializer**: creates a new record for the given shape"""
+        self.shape  = shape
+        self.group  = InstructionGroup()
+        self.bounds = None
+        self.cells  = ()
+        self.order  = -1
+        self.frame  = -1
+        self.translate = None
+        self.push   = None
+        self.pop    = None
 
 
 class GameApp(kivy.app.App):
@@ -1549,6 +2239,29 @@ class GameApp(kivy.app.App):
         **Invariant**: Immutable float > 0."""
         return self._fps
     
+    @property
+    def frametime(self):
+        """The seconds spent on the last animation frame.
+        
+        This is the time taken by `update`, `draw` and the rebuilding of the
+        damaged shapes, measured on the wall clock.  The frame fits its budget
+        if this is less than 1/`fps`.  It is 0 before the first frame.
+        
+        **Invariant**: Immutable float >= 0."""
+        return self._frametime
+    
+    @property
+    def atlas(self):
+        """The atlas that the images of this game are drawn from.
+        
+        It is made when the game starts (see `GAtlas`).  If the file
+        `ATLAS_FILE` is in the **Images** folder, it is loaded from there.
+        Otherwise every image in the folder is packed at startup.
+        
+        **Invariant**: Immutable GAtlas, or None if the game has not started
+        or was made with atlas=False."""
+        return self._atlas
+    
     @property
     def view(self):
         """The Game view.
@@ -1574,18 +2287,24 @@ class GameApp(kivy.app.App):
             Game(width=400,height=400)
         
         The game window will not show until you start the game.
-        To start the game, use the method `run()`."""
+        To start the game, use the method `run()`.
+        
+        The keyword `atlas` may be False to draw every image from its own
+        file instead of from an atlas."""
         w = keywords['width']  if  'width' in keywords else 0.0
         h = keywords['height'] if 'height' in keywords else 0.0
         f = keywords['fps']    if 'fps'    in keywords else 60.0
 
-        assert type(w) in [int, float], `w`+' is not a number'
-        assert type(h) in [int, float], `h`+' is not a number'
-        assert type(f) in [int, float], `f`+' is not a number'
-        assert f > 0.0, `f`+' is not positive'
+        assert type(w) in [int, float], repr(w)+' is not a number'
+        assert type(h) in [int, float], repr(h)+' is not a number'
+        assert type(f) in [int, float], repr(f)+' is not a number'
+        assert f > 0.0, repr(f)+' is not positive'
         self._wwidth = w
         self._wheight = h
         self._fps = f
+        self._frametime = 0.0
+        self._packed = keywords['atlas'] if 'atlas' in keywords else True
+        self._atlas = None
         Config.set('graphics', 'width', str(self.width))
         Config.set('graphics', 'height', str(self.height))
         
@@ -1603,6 +2322,13 @@ class GameApp(kivy.app.App):
         
         This is a callback-proxy for method init().  It handles
         important issues behind the scenes."""
+        if self._packed:
+            if os.path.exists(os.path.join(IMAGE_PATH,ATLAS_FILE)):
+                self._atlas = GAtlas.load(ATLAS_FILE)
+            else:
+                self._atlas = GAtlas()
+                self._atlas.build()
+            self._atlas.use()
         Clock.schedule_interval(self._refresh,1.0/self._fps)
         self.init()
     
@@ -1614,9 +2340,12 @@ class GameApp(kivy.app.App):
         
         This is a callback-proxy for method update().  It handles
         important issues behind the scenes."""
+        start = time.time()
         self.view._redraw()
         self.update(dt)
         self.draw()
+        self.view._flush()
+        self._frametime = time.time()-start
     
     def run(self):
         """Display the game window and start the game"""
@@ -15,9 +15,45 @@ of GRectangle provided by game2d.py.
 Most of your work on this assignment will be in either this module or models.py.
 Whether a helper method belongs in this module or models.py is often a complicated
 issue.  If you do not know, ask on Piazza and we will answer."""
+import struct
+import zlib
+import numpy
+from array import array
 from constants import *
 from game2d import *
 from models import *
+from telemetry import EVENT_SERVE, EVENT_PADDLE, EVENT_BRICK, EVENT_LOST
+import entities
+
+
+# The snapshot of the paddle and ball: a flag (1 if there is a ball), then the
+# paddle x, the initial touch x, the initial paddle x, and the ball x, y, vx, vy
+_DYNAMICS = struct.Struct('<B7d')
+
+# The input of a tick in the history: flags (see below), the last touch x, the
+# touch x, and the velocity of the ball served in the tick
+_INPUT = struct.Struct('<B4d')
+_INPUT_LAST  = 1
+_INPUT_TOUCH = 2
+_INPUT_MOVE  = 4
+_INPUT_SERVE = 8
+_INPUT_LOST  = 16
+
+#: the first bytes of a snapshot of a Match
+SNAPSHOT_MAGIC = b'BKSN'
+#: the version of the snapshot layout, changed whenever the layout changes
+SNAPSHOT_VERSION = 2
+
+# The snapshot header of a Match: the magic and version, the state, the balls
+# left, the countdown timer, flags (1 if there is a game, 2 if _last is set, 4
+# if _lasttouch is set), and the x positions of _last and _lasttouch
+_MATCH = struct.Struct('<4sHBBHB2d')
+
+try:
+    _window = buffer
+except NameError:
+    def _window(data, offset, size):
+        return memoryview(data)[offset:offset+size]
 
 
 # PRIMARY RULE: Gameplay can only access attributes in models.py via getters/setters
@@ -61,26 +97,141 @@ class Gameplay(object):
                          initial touch x position when first clicking mouse
         _initialpaddlex [int]:
                          initial paddle x position when first clicking mouse
+        _balls  [GPool of Ball]:
+                         the balls taken out of play, kept so that a later
+                         serve or restore does not have to create a new one
+        _tick   [int >= 0]:
+                         the number of calls to step so far
+        _history [bytearray, or None if the history is off]:
+                         a ring buffer with the state at the start of each of
+                         the last _capacity ticks (see snapshotInto)
+        _inputs [bytearray, or None if the history is off]:
+                         a ring buffer with the input of each of the last
+                         _capacity ticks (see _INPUT)
+        _checks [array of int, or None if the history is off]:
+                         a ring buffer with the checksum of each state in
+                         _history
+        _capacity [int >= 0]:
+                         the number of ticks in the history
+        _points [list of two GPoint]:
+                         scratch touches used when re-simulating
+        _telemetry [Telemetry, or None if events are not recorded]:
+                         where to send serve, paddle, brick and lost events
+        _particles [ParticleSystem, or None if there is no debris]:
+                         where to spawn the debris of destroyed bricks
+        _world  [World]:
+                         the extra balls and power-ups (see entities.py)
+        _bounds [float array (bricks, 4), or None]:
+                         the left, bottom, right and top of each brick in
+                         the wall, for the entities to collide with
+        _boundsVersion [int, or None]:
+                         the version of the wall when _bounds was made
+        _config [GameConfig]:
+                         the settings of this game
     """
 
     # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
 
-    def __init__(self):
+    def getPaddle(self):
+        """Returns: the paddle"""
+        return self._paddle
+
+    def getBall(self):
+        """Returns: the ball in play, or None if waiting for a serve"""
+        return self._ball
+
+    def getWall(self):
+        """Returns: the wall of bricks still remaining"""
+        return self._wall
+
+    def getScore(self):
+        """Returns: the score of this game, one point for each brick destroyed"""
+        return self._wall.getDestroyed()
+
+    def getConfig(self):
+        """Returns: the settings of this game"""
+        return self._config
+
+    def getTick(self):
+        """Returns: the number of ticks played with step"""
+        return self._tick
+
+    def getOldestTick(self):
+        """Returns: the oldest tick that rollback can return to"""
+        return max(0, self._tick - self._capacity)
+
+    def getChecksum(self, tick):
+        """Returns: the checksum of the state at the start of the given tick
+
+        Two games with the same checksum for a tick are (almost certainly) in
+        the same state.  Comparing checksums detects when a re-simulated game,
+        or a copy of the game on another machine, has diverged.
+
+            :param tick: the tick to check
+            **Precondition**: an int with getOldestTick() <= tick < getTick()"""
+        assert self._history is not None, 'the history is off'
+        assert self.getOldestTick() <= tick < self._tick, repr(tick)+' is not in the history'
+        return self._checks[tick % self._capacity]
+
+    def getWorld(self):
+        """Returns: the extra balls and power-ups of this game"""
+        return self._world
+
+    def getBallPool(self):
+        """Returns: the pool of balls of this game (for its statistics)"""
+        return self._balls
+
+    def setTelemetry(self, telemetry):
+        """Sets where to send the events of this game.
+
+            :param telemetry: the event recorder
+            **Precondition**: a Telemetry, or None to record no events"""
+        self._telemetry = telemetry
+
+    def setParticles(self, particles):
+        """Sets where to spawn the debris of destroyed bricks.
+
+            :param particles: the particle system
+            **Precondition**: a ParticleSystem, or None for no debris"""
+        self._particles = particles
+
+    def __init__(self, level=None, config=None):
         """Initialize the game state. Create the brick wall and the
-        paddle"""
+        paddle
+
+            :param level: the level to play, or None for the default layout
+            **Precondition**: a levels.LevelFile, or None
+
+            :param config: the game settings
+            **Precondition**: a GameConfig, or None for DEFAULT_CONFIG"""
 
-        self._wall = BrickWall()
+        self._config = DEFAULT_CONFIG if config is None else config
+        self._wall = BrickWall(level, self._config)
         self._paddle = GRectangle(
                             x = 0,
-                            y = PADDLE_OFFSET,
-                            width = PADDLE_WIDTH,
-                            height = PADDLE_HEIGHT,
+                            y = self._config.PADDLE_OFFSET,
+                            width = self._config.PADDLE_WIDTH,
+                            height = self._config.PADDLE_HEIGHT,
                             fillcolor = colormodel.BLACK,
                             linecolor = colormodel.BLACK
                         )
         self._initialtouchx = 0
         self._initialpaddlex = 0
         self._ball = None
+        config = self._config
+        self._balls = GPool(lambda vx, vy: Ball(vx, vy, config), Ball.serve)
+
+        self._tick = 0
+        self._history = None
+        self._inputs = None
+        self._checks = None
+        self._capacity = 0
+        self._points = [GPoint(0, 0), GPoint(0, 0)]
+        self._telemetry = None
+        self._particles = None
+        self._world = entities.World()
+        self._bounds = None
+        self._boundsVersion = None
 
     def draw(self, view):
         """DRAW METHOD TO DRAW THE PADDLES, BALL, AND BRICKS
@@ -100,6 +251,11 @@ class Gameplay(object):
         if self._ball != None:
             self._ball.draw(view)
 
+        # Draw extra balls and power-ups
+
+        if self._world != None:
+            self._world.draw(view)
+
         # Draw bricks
 
         if self._wall != None:
@@ -122,32 +278,90 @@ class Gameplay(object):
         self._ball.x += self._ball._vx
         self._ball.y += self._ball._vy
 
-        # Get a colliding object
+        # Get a colliding object, and how the ball touches it
 
-        colliding_object = self._getCollidingObject()
+        colliding = self._getContact()
 
         # If it is a paddle collision, call helper method
 
-        if colliding_object == self._paddle:
-            self._ball.handlePaddleCollision()
+        if colliding is not None and colliding[0] == self._paddle:
+            self._ball.handlePaddleCollision(self._paddle)
+            if self._telemetry is not None:
+                self._telemetry.emit(EVENT_PADDLE, self._ball.center_x, self._paddle.x)
 
         # If it is a brick collision, call helper method
 
-        elif colliding_object:
-            self._ball.handleBrickCollision()
-            self._wall.removeBrick(colliding_object)
+        elif colliding is not None:
+            brick, contact = colliding
+            self._ball.handleBrickCollision(*contact)
+            self._hitBrick(brick)
 
         # Otherwise, it is not a collision or it is a wall collision, so
         # use the helper method to return whether the ball collides with
         # the bottom wall or not.
 
-        return self._ball.handleWallCollision()
+        lost = self._ball.handleWallCollision()
+        if lost and self._telemetry is not None:
+            self._telemetry.emit(EVENT_LOST, self._ball.center_x, self._paddle.x)
+
+        # The other entities move with the ball
+        self._moveEntities()
+        return lost
 
-    def serveBall(self):
-        """Serves the ball. This just creates a new ball!"""
+    def spawnBall(self, x, y, vx, vy):
+        """Returns: an extra ball, or None if there is no room for one
 
-        # Create ball
-        self._ball = Ball()
+        An extra ball bounces off the walls, the paddle and the bricks like
+        the ball in play, and breaks bricks.  The balls also bounce off each
+        other (and off the ball in play).  It is simply removed when it
+        falls off the bottom; only the ball in play costs a turn.
+
+            :param x: the left edge of the ball
+            **Precondition**: a number
+
+            :param y: the bottom edge of the ball
+            **Precondition**: a number
+
+            :param vx: the velocity in the x direction
+            **Precondition**: a number
+
+            :param vy: the velocity in the y direction
+            **Precondition**: a number"""
+        size = self._config.BALL_SIZE
+        return self._world.create(entities.KIND_BALL, x=x, y=y, width=size, height=size,
+                                  vx=vx, vy=vy, shape=entities.SHAPE_ELLIPSE,
+                                  color=self._world.getColor(colormodel.BLACK),
+                                  mask=entities.COLLIDE_WALLS | entities.COLLIDE_PADDLE |
+                                       entities.COLLIDE_BRICKS | entities.COLLIDE_BALLS |
+                                       entities.FALL)
+
+    def spawnPowerUp(self, x, y):
+        """Returns: a falling multi-ball power-up, or None if there is no room
+
+        If the paddle catches the power-up, an extra ball is launched from the
+        paddle.
+
+            :param x: the center of the power-up
+            **Precondition**: a number
+
+            :param y: the bottom edge of the power-up
+            **Precondition**: a number"""
+        return self._world.create(entities.KIND_POWERUP, x=x-10, y=y, width=20, height=8,
+                                  vx=0.0, vy=-2.0, shape=entities.SHAPE_RECTANGLE,
+                                  color=self._world.getColor(colormodel.MAGENTA),
+                                  mask=entities.CATCH | entities.FALL)
+
+    def serveBall(self, vx=None, vy=None):
+        """Serves the ball. This puts a ball from the pool in the center.
+
+        The velocity is random, unless vx and vy are given."""
+
+        # Reuse the ball that was lost
+        if self._ball is not None:
+            self._balls.release(self._ball)
+        self._ball = self._balls.acquire(vx, vy)
+        if self._telemetry is not None:
+            self._telemetry.emit(EVENT_SERVE, self._ball.getVX(), self._ball.getVY())
 
     def updatePaddle(self, lasttouch, touch):
         """Update paddle position. This method tracks the initial mouse
@@ -170,8 +384,9 @@ class Gameplay(object):
                 self._initialpaddlex + (touch.x - self._initialtouchx)
 
         # Make sure paddle stays within the right bound
-        if self._paddle.x > (GAME_WIDTH - PADDLE_WIDTH):
-            self._paddle.x = (GAME_WIDTH - PADDLE_WIDTH)
+        right = self._config.GAME_WIDTH - self._config.PADDLE_WIDTH
+        if self._paddle.x > right:
+            self._paddle.x = right
 
         # Make sure paddle stays within the left bound
         if self._paddle.x < 0:
@@ -180,55 +395,541 @@ class Gameplay(object):
 
     # HELPER METHODS FOR PHYSICS AND COLLISION DETECTION
 
-    def _getCollidingObject(self):
-        """Returns: GObject that has collided with the ball
-
-        This method checks the four corners of the ball, one at a
-        time. If one of these points collides with either the paddle
-        or a brick, it stops the checking immediately and returns the
-        object involved in the collision. It returns None if no
-        collision occurred."""
-
-        # Here is a list of the four points to check for ball collisions
-
-        ball_points = [ [self._ball.left, self._ball.bottom],
-                        [self._ball.left, self._ball.top],
-                        [self._ball.right, self._ball.bottom],
-                        [self._ball.right, self._ball.top],
-                        ]
-
-        # Check each point for collisions
-        for point in ball_points:
-
-            x_pos = point[0]
-            y_pos = point[1]
-
-            # Check paddle collision
-
-            if self._paddle.contains(x_pos, y_pos):
-                return self._paddle
-
-            # Loop over bricks to check collisions
-
-            bricks = self._wall.getBricks()
-
-            for brick in bricks:
-                if brick.contains(x_pos, y_pos):
-                    return brick
-
-        # No collision
-        return None
+    def _getContact(self):
+        """Returns: the tuple (obj, contact) for the object the ball touches,
+        or None if it touches nothing
+
+        The ball is tested once against each object, as a circle against a box
+        (see Ball.getContact), and contact is the tuple (nx, ny, depth) of that
+        test.  The paddle comes first.  Otherwise, if the ball touches several
+        bricks, this is the brick it has sunk deepest into."""
+        contact = self._ball.getContact(self._paddle)
+        if contact is not None:
+            return (self._paddle, contact)
+
+        ball = self._ball
+        left = ball.left
+        right = ball.right
+        bottom = ball.bottom
+        top = ball.top
+
+        best = None
+        for brick in self._wall.getBricks():
+            # Skip the bricks that are nowhere near the ball
+            if brick.right < left or brick.left > right or brick.top < bottom or brick.bottom > top:
+                continue
+            contact = ball.getContact(brick)
+            if contact is not None and (best is None or contact[2] > best[1][2]):
+                best = (brick, contact)
+        return best
+
+    def _hitBrick(self, brick):
+        """Hits a brick, and if it is destroyed, records it, spawns its debris
+        and maybe drops a power-up."""
+        if not self._wall.hitBrick(brick):
+            return
+
+        if self._telemetry is not None:
+            self._telemetry.emit(EVENT_BRICK, brick.getRow(), brick.getCol())
+        if self._particles is not None:
+            self._particles.spawn(brick.x, brick.y, brick.width, brick.height,
+                                  brick.fillcolor)
+
+        # The count is part of the wall, so a rollback does not count again
+        every = self._config.POWERUP_EVERY
+        if every > 0 and self._wall.getDestroyed() % every == 0:
+            self.spawnPowerUp(brick.center_x, brick.y)
+
+    def _moveEntities(self):
+        """Moves the extra balls and power-ups by one frame, and applies what
+        they hit.
+
+        The systems in entities.py do the work on all of the entities at once.
+        This method only decides what their results mean for this game."""
+        world = self._world
+        if world.getCount() == 0:
+            return
+
+        entities.move(world)
+        entities.expire(world)
+        world.destroyAll(entities.bounceWalls(world, self._config))
+        entities.collideBalls(world, self._ball)
+
+        caught = entities.collidePaddle(world, self._paddle)
+        for entity in caught.tolist():
+            if world.getKind(entity) == entities.KIND_POWERUP:
+                size = self._config.BALL_SIZE
+                vx = 3.0 if self._wall.getDestroyed() % 2 else -3.0
+                self.spawnBall(self._paddle.center_x - size/2.0, self._paddle.top, vx, 4.0)
+        world.destroyAll(caught)
+
+        bricks = self._getBrickBounds()
+        hits, indices = entities.collideBricks(world, self._bounds)
+        if len(hits):
+            # Two entities can hit the same brick, but it only takes one hit.
+            # Look the bricks up first, as hitting one changes the list.
+            for brick in [bricks[index] for index in sorted(set(indices.tolist()))]:
+                self._hitBrick(brick)
+
+    def _getBrickBounds(self):
+        """Returns: the list of bricks in the wall, whose bounds are in _bounds
+
+        The bounds are only made again when the wall has changed."""
+        bricks = self._wall.getBricks()
+        if self._boundsVersion != self._wall.getVersion():
+            self._bounds = numpy.array([(brick.left, brick.bottom, brick.right, brick.top)
+                                        for brick in bricks]).reshape(-1, 4)
+            self._boundsVersion = self._wall.getVersion()
+        return bricks
 
     # ADD ANY ADDITIONAL METHODS (FULLY SPECIFIED) HERE
 
     def checkBricksListEmpty(self):
-        """Returns: True if there are no bricks left and False
+        """Returns: True if there are no breakable bricks left and False
         otherwise. This is used to check whether the game is over or
         not."""
 
-        # Check the number of bricks left in the list of bricks
-        return ( len(self._wall.getBricks()) == 0 )
-
-
+        # Unbreakable bricks do not count
+        return self._wall.isCleared()
+
+    def getSnapshotSize(self):
+        """Returns: the number of bytes in a snapshot of this game"""
+        return _DYNAMICS.size + self._wall.getSnapshotSize() + self._world.getSnapshotSize()
+
+    def snapshot(self):
+        """Returns: the state of this game as a byte string
+
+        The result has a fixed layout: the paddle and ball as packed doubles,
+        followed by the snapshot of the brick wall (see BrickWall.snapshot) and
+        of the extra balls and power-ups (see World.snapshotInto).  Doubles are
+        used so that a restored game plays out exactly like the original."""
+        data = bytearray(self.getSnapshotSize())
+        self.snapshotInto(data)
+        return bytes(data)
+
+    def snapshotInto(self, buffer, offset=0):
+        """Writes the snapshot of this game into a buffer.
+
+        This is the same as snapshot, except that no new string is made.
+
+            :param buffer: the buffer to write to
+            **Precondition**: a bytearray with getSnapshotSize() bytes after offset
+
+            :param offset: the position in buffer to write to
+            **Precondition**: an int >= 0"""
+        if self._ball is None:
+            _DYNAMICS.pack_into(buffer, offset, 0, self._paddle.x, self._initialtouchx,
+                                self._initialpaddlex, 0.0, 0.0, 0.0, 0.0)
+        else:
+            _DYNAMICS.pack_into(buffer, offset, 1, self._paddle.x, self._initialtouchx,
+                                self._initialpaddlex, self._ball.x, self._ball.y,
+                                self._ball.getVX(), self._ball.getVY())
+        offset += _DYNAMICS.size
+        self._wall.snapshotInto(buffer, offset)
+        self._world.snapshotInto(buffer, offset+self._wall.getSnapshotSize())
+
+    def restore(self, data, offset=0):
+        """Restores the state saved by snapshot.
+
+        The paddle, ball, bricks and entities are changed in place.  No new
+        objects are created, except for the ball if the pool of balls is empty.
+
+            :param data: a snapshot of a game with the same layout
+            **Precondition**: a byte string or bytearray from snapshot or snapshotInto
+
+            :param offset: the position of the snapshot in data
+            **Precondition**: an int >= 0"""
+        fields = _DYNAMICS.unpack_from(data, offset)
+        self._paddle.x = fields[1]
+        self._initialtouchx = fields[2]
+        self._initialpaddlex = fields[3]
+
+        if not fields[0]:
+            if self._ball is not None:
+                self._balls.release(self._ball)
+            self._ball = None
+        else:
+            if self._ball is None:
+                self._ball = self._balls.acquire(fields[6], fields[7])
+            self._ball.x = fields[4]
+            self._ball.y = fields[5]
+            self._ball.setVelocity(fields[6], fields[7])
+
+        offset += _DYNAMICS.size
+        self._wall.restore(data, offset)
+        self._world.restore(data, offset+self._wall.getSnapshotSize())
+
+    # METHODS FOR ROLLBACK
+
+    def startHistory(self, capacity):
+        """Starts recording the state and input of every tick.
+
+        The history is a ring buffer of the last capacity ticks.  It is
+        allocated once, here, so recording a tick does not allocate anything.
+        Only ticks played with step are recorded.
+
+            :param capacity: the number of ticks to keep
+            **Precondition**: an int > 0"""
+        self._capacity = capacity
+        self._history = bytearray(capacity*self.getSnapshotSize())
+        self._inputs = bytearray(capacity*_INPUT.size)
+        self._checks = array('L', [0]*capacity)
+
+    def step(self, lasttouch, touch, move=False, serve=False):
+        """Returns: True if the ball was lost in this tick, False otherwise
+
+        This plays one tick of the game: it moves the paddle (see updatePaddle),
+        and then either moves the ball (see moveBall) or serves a new one.  If
+        the history is on, the tick is recorded so that it can be rolled back.
+
+            :param lasttouch: the touch of the previous tick
+            **Precondition**: a GPoint, or None if the mouse was not pressed
+
+            :param touch: the touch of this tick
+            **Precondition**: a GPoint, or None if the mouse is not pressed
+
+            :param move: True if the ball should be moved
+            **Precondition**: a bool
+
+            :param serve: True if the ball should be served after the paddle moves
+            **Precondition**: a bool, not True if move is True"""
+        # The view draws the moving shapes between where they are now and
+        # where this tick moves them (see GObject.tick)
+        self._paddle.tick()
+        if self._ball is not None:
+            self._ball.tick()
+        self._world.tick()
+
+        if self._history is None:
+            self._tick += 1
+            return self._advance(lasttouch, touch, move, serve, None, None)
+
+        slot = self._tick % self._capacity
+        size = self.getSnapshotSize()
+        self.snapshotInto(self._history, slot*size)
+        self._checks[slot] = zlib.crc32(_window(self._history, slot*size, size)) & 0xffffffff
+
+        lost = self._advance(lasttouch, touch, move, serve, None, None)
+        self._record(slot, lasttouch, touch, move, serve, lost)
+        self._tick += 1
+        return lost
+
+    def rollback(self, tick, touch):
+        """Returns: True if the corrected game lost the ball in a different tick
+        than before, False otherwise
+
+        This returns the game to the start of the given tick, replaces the touch
+        of that tick, and plays the game forward to the present again with the
+        recorded inputs.  The history is updated with the new states.  If the
+        result is True, whoever tracks lost balls (Breakout) must be told.
+
+            :param tick: the tick with the late (or corrected) input
+            **Precondition**: an int with getOldestTick() <= tick < getTick()
+
+            :param touch: the corrected touch for that tick
+            **Precondition**: a GPoint, or None if the mouse was not pressed"""
+        assert self._history is not None, 'the history is off'
+        assert self.getOldestTick() <= tick < self._tick, repr(tick)+' is not in the history'
+
+        size = self.getSnapshotSize()
+        self.restore(self._history, (tick % self._capacity)*size)
+
+        # The events (and debris) of these ticks were already recorded.  The
+        # entities are in the snapshot, so they are played again with the rest.
+        telemetry = self._telemetry
+        particles = self._particles
+        self._telemetry = None
+        self._particles = None
+
+        changed = False
+        flags, lastx, x, vx, vy = _INPUT.unpack_from(self._inputs, (tick % self._capacity)*_INPUT.size)
+        last = self._point(0, lastx) if flags & _INPUT_LAST else None
+        for now in range(tick, self._tick):
+            slot = now % self._capacity
+            if now > tick:
+                flags, lastx, x, vx, vy = _INPUT.unpack_from(self._inputs, slot*_INPUT.size)
+                self.snapshotInto(self._history, slot*size)
+                self._checks[slot] = zlib.crc32(_window(self._history, slot*size, size)) & 0xffffffff
+                current = self._point(now, x) if flags & _INPUT_TOUCH else None
+            else:
+                current = touch
+
+            move = bool(flags & _INPUT_MOVE)
+            serve = bool(flags & _INPUT_SERVE)
+            lost = self._advance(last, current, move, serve, vx, vy)
+            changed = changed or lost != bool(flags & _INPUT_LOST)
+            self._record(slot, last, current, move, serve, lost)
+            last = current
+
+        self._telemetry = telemetry
+        self._particles = particles
+        return changed
+
+    # HELPER METHODS FOR ROLLBACK
+
+    def _advance(self, lasttouch, touch, move, serve, vx, vy):
+        """Returns: True if the ball was lost, False otherwise
+
+        This plays one tick with the given input.  See step for the parameters.
+        If serve is True and vx, vy are not None, the ball is served with that
+        velocity."""
+        self.updatePaddle(lasttouch, touch)
+        if move:
+            return self.moveBall()
+        if serve:
+            self.serveBall(vx, vy)
+        return False
+
+    def _record(self, slot, lasttouch, touch, move, serve, lost):
+        """Records the input of a tick in the given slot of the history."""
+        flags = 0
+        if lasttouch is not None:
+            flags |= _INPUT_LAST
+        if touch is not None:
+            flags |= _INPUT_TOUCH
+        if move:
+            flags |= _INPUT_MOVE
+        if lost:
+            flags |= _INPUT_LOST
+        vx = vy = 0.0
+        if serve:
+            flags |= _INPUT_SERVE
+            vx = self._ball.getVX()
+            vy = self._ball.getVY()
+        _INPUT.pack_into(self._inputs, slot*_INPUT.size, flags,
+                         0.0 if lasttouch is None else lasttouch.x,
+                         0.0 if touch is None else touch.x, vx, vy)
+
+    def _point(self, tick, x):
+        """Returns: a scratch GPoint at x for the given tick
+
+        Two points are used, alternating by tick, so that the touch of one tick
+        can be the last touch of the next."""
+        point = self._points[tick % 2]
+        point.x = x
+        return point
+
+
+class Match(object):
+    """An instance runs the states of a session of Breakout.
+
+    A match starts inactive.  A click starts a game and the countdown, the
+    countdown serves the ball, and a lost ball pauses the game until the next
+    click.  The game is complete when the last ball is lost or the wall is
+    cleared.  The Breakout App and the server both step a Match once per tick,
+    so they play the same game; the App only adds the messages on screen.
 
+    INSTANCE ATTRIBUTES:
+        _level     [LevelFile, or None for the default layout]: the level to play
+        _config    [GameConfig]: the game settings
+        _restart   [bool]: True if a click after a complete game starts a new one
+        _state     [one of STATE_INACTIVE, ... STATE_COMPLETE]: the game state
+        _game      [Gameplay, or None if _state is STATE_INACTIVE]: the game
+        _last      [GPoint, or None]: the touch that started the game, or None
+                   if there is no game or the mouse was released after it ended
+        _lasttouch [GPoint, or None]: the last touch given to Gameplay.step
+        _timer     [int >= 0]: the countdown frame counter
+        _ballcount [int >= 0]: the number of balls left
+        _telemetry [Telemetry, or None]: passed on to each Gameplay
+        _particles [ParticleSystem, or None]: passed on to each Gameplay
+    """
 
+    # GETTERS AND SETTERS
+
+    def getState(self):
+        """Returns: the current state of the game"""
+        return self._state
+
+    def getGame(self):
+        """Returns: the game being played, or None if the match is inactive"""
+        return self._game
+
+    def getBallCount(self):
+        """Returns: the number of balls left"""
+        return self._ballcount
+
+    def setTelemetry(self, telemetry):
+        """Sets where each game sends its events.
+
+            :param telemetry: the event recorder
+            **Precondition**: a Telemetry, or None to record no events"""
+        self._telemetry = telemetry
+        if self._game is not None:
+            self._game.setTelemetry(telemetry)
+
+    def setParticles(self, particles):
+        """Sets where each game spawns the debris of destroyed bricks.
+
+            :param particles: the particle system
+            **Precondition**: a ParticleSystem, or None for no debris"""
+        self._particles = particles
+        if self._game is not None:
+            self._game.setParticles(particles)
+
+    def __init__(self, level=None, config=None, restart=False):
+        """Initialize an inactive match.
+
+            :param level: the level to play, or None for the default layout
+            **Precondition**: a levels.LevelFile, or None
+
+            :param config: the game settings
+            **Precondition**: a GameConfig, or None for DEFAULT_CONFIG
+
+            :param restart: whether a click after a complete game starts a new one
+            **Precondition**: a bool"""
+        self._level = level
+        self._config = DEFAULT_CONFIG if config is None else config
+        self._restart = restart
+        self._state = STATE_INACTIVE
+        self._game = None
+        self._last = None
+        self._lasttouch = None
+        self._timer = 0
+        self._ballcount = self._config.NUMBER_TURNS
+        self._telemetry = None
+        self._particles = None
+
+    def step(self, touch):
+        """Plays one tick: runs the helper method of the current state.
+
+        A tick may pass through several states, such as from STATE_INACTIVE
+        to STATE_COUNTDOWN on a click.
+
+            :param touch: the mouse position for this tick
+            **Precondition**: a GPoint, or None if the mouse is not pressed"""
+        if self._state == STATE_INACTIVE:
+            self._inactive(touch)
+
+        if self._state == STATE_COUNTDOWN:
+            self._countdown(touch)
+
+        if self._state == STATE_ACTIVE:
+            self._active(touch)
+
+        if self._state == STATE_PAUSED:
+            self._paused(touch)
+
+        if self._state == STATE_COMPLETE:
+            self._complete(touch)
+
+    def getSnapshotSize(self):
+        """Returns: the number of bytes in a snapshot of this match"""
+        if self._game is None:
+            return _MATCH.size
+        return _MATCH.size + self._game.getSnapshotSize()
+
+    def snapshot(self):
+        """Returns: the state of this match as a byte string
+
+        The result has a fixed layout: a small header with SNAPSHOT_MAGIC and
+        SNAPSHOT_VERSION, the state, the balls left and the countdown timer,
+        followed by the snapshot of the Gameplay object (see Gameplay.snapshot)."""
+        flags = 0
+        if self._game is not None:
+            flags |= 1
+        if self._last is not None:
+            flags |= 2
+        if self._lasttouch is not None:
+            flags |= 4
+        data = bytearray(self.getSnapshotSize())
+        _MATCH.pack_into(data, 0, SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                         self._state, self._ballcount, self._timer, flags,
+                         0.0 if self._last is None else self._last.x,
+                         0.0 if self._lasttouch is None else self._lasttouch.x)
+        if self._game is not None:
+            self._game.snapshotInto(data, _MATCH.size)
+        return bytes(data)
+
+    def restore(self, data):
+        """Returns the match to the tick of a snapshot.
+
+        The Gameplay object is reused if there is one, so the paddle, ball and
+        bricks are not created again.  A snapshot of another version of the
+        layout is rejected with a ValueError.
+
+            :param data: a snapshot of a match with the same level
+            **Precondition**: a byte string returned by snapshot"""
+        if len(data) < _MATCH.size:
+            raise ValueError('snapshot is too short for a header')
+        magic, version, state, balls, timer, flags, last, lasttouch = _MATCH.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError('snapshot has the wrong magic number')
+        if version != SNAPSHOT_VERSION:
+            raise ValueError('snapshot version %d is not supported' % version)
+        if flags & 1 and self._game is None:
+            self._newGame()
+        if flags & 1 and len(data) != _MATCH.size+self._game.getSnapshotSize():
+            raise ValueError('snapshot size does not match its game')
+
+        self._state = state
+        self._ballcount = balls
+        self._timer = timer
+        offset = self._config.PADDLE_OFFSET
+        self._last = GPoint(last, offset) if flags & 2 else None
+        self._lasttouch = GPoint(lasttouch, offset) if flags & 4 else None
+
+        if flags & 1:
+            self._game.restore(data, _MATCH.size)
+        else:
+            self._game = None
+
+    # HELPER METHODS FOR THE STATES
+
+    def _newGame(self):
+        """Creates the Gameplay object of a new game."""
+        self._game = Gameplay(self._level, self._config)
+        self._game.setTelemetry(self._telemetry)
+        self._game.setParticles(self._particles)
+
+    def _inactive(self, touch):
+        """Starts a game and the countdown when the player clicks the mouse."""
+        if self._last is None and touch is not None:
+            self._state = STATE_COUNTDOWN
+            self._last = touch
+            self._lasttouch = None
+            self._timer = 0
+            self._ballcount = self._config.NUMBER_TURNS
+            self._newGame()
+
+    def _paused(self, touch):
+        """Resumes the countdown when the player clicks the mouse."""
+        if touch is not None:
+            self._state = STATE_COUNTDOWN
+
+    def _countdown(self, touch):
+        """Moves the paddle, and serves the ball at the end of the countdown.
+
+        The timer is not reset by the serve, so after a pause the ball is
+        served as soon as a click resumes the game."""
+        self._timer += 1
+        serve = self._timer >= self._config.COUNTDOWN_FRAMES
+        self._game.step(self._lasttouch, touch, serve=serve)
+        self._lasttouch = touch
+
+        if serve:
+            self._state = STATE_ACTIVE
+            self._ballcount -= 1
+
+    def _active(self, touch):
+        """Moves the paddle and the ball.  A lost ball pauses the game, or
+        completes it if there are no balls left, as does clearing the wall."""
+        lostball = self._game.step(self._lasttouch, touch, move=True)
+        self._lasttouch = touch
+        if lostball and self._ballcount == 0:
+            self._state = STATE_COMPLETE
+        elif lostball and self._ballcount > 0:
+            self._state = STATE_PAUSED
+
+        if self._game.checkBricksListEmpty():
+            self._state = STATE_COMPLETE
+
+    def _complete(self, touch):
+        """The game is over.  If the match restarts, a new click (after the
+        mouse is released) starts a new game."""
+        if not self._restart:
+            return
+        if touch is None:
+            self._last = None
+        elif self._last is None:
+            self._state = STATE_INACTIVE
+            self._inactive(touch)
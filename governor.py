@@ -0,0 +1,152 @@
+# governor.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Frame governor module for Breakout
+
+This module keeps the frame rate steady on slow machines.  Every frame has a
+budget of 1/fps seconds.  The governor is told how long each frame took (the
+update, the draw and the rebuilding of shapes, see GameApp.frametime), and
+when the frames keep going over budget it steps down to a lower quality level,
+which does less optional work.  When the frames are well under budget for a
+while, it steps back up.
+
+The quality levels are in QUALITY_LEVELS, from the best to the worst.  A level
+is a dictionary of settings for the optional work, such as the number of
+debris particles.  The governor does not know what the settings mean; the
+application reads them from getQuality whenever the level changes.
+
+The governor uses hysteresis, so that it does not flicker between two levels.
+It steps down quickly, after GOVERNOR_DOWN_FRAMES frames over GOVERNOR_HIGH of
+the budget, but it only steps up after GOVERNOR_UP_FRAMES frames under
+GOVERNOR_LOW of the budget.  The frame times are smoothed first, so that a
+single slow frame (such as a garbage collection) changes nothing.
+
+Only optional work depends on the level.  The game itself plays the same at
+every level, so a snapshot does not record it."""
+from constants import *
+
+
+#: the quality levels, from the best to the worst.  Each has the debris
+#: particles spawned for a brick, and the most debris particles alive at once.
+QUALITY_LEVELS = (
+    {'debris': DEBRIS_PER_BRICK,    'debris_limit': DEBRIS_CAPACITY},
+    {'debris': DEBRIS_PER_BRICK//2, 'debris_limit': DEBRIS_CAPACITY//4},
+    {'debris': DEBRIS_PER_BRICK//4, 'debris_limit': DEBRIS_CAPACITY//16},
+    {'debris': 0,                   'debris_limit': 0},
+)
+
+#: the fraction of the budget above which a frame is too slow
+GOVERNOR_HIGH = 0.9
+#: the fraction of the budget below which a frame has room to spare
+GOVERNOR_LOW  = 0.5
+#: the number of slow frames in a row before stepping down a level
+GOVERNOR_DOWN_FRAMES = 15
+#: the number of fast frames in a row before stepping up a level
+GOVERNOR_UP_FRAMES   = 180
+#: the weight of the newest frame in the smoothed frame time
+GOVERNOR_SMOOTHING   = 0.1
+
+
+class FrameGovernor(object):
+    """An instance picks the quality level that keeps frames within budget.
+
+    INSTANCE ATTRIBUTES:
+        _budget  [float > 0]: the seconds available for a frame
+        _levels  [nonempty tuple of dict]: the quality levels, best first
+        _level   [int in 0..len(_levels)-1]: the current level
+        _average [float >= 0, or None before the first frame]: the smoothed
+                 frame time, in seconds
+        _slow    [int >= 0]: the number of slow frames in a row
+        _fast    [int >= 0]: the number of fast frames in a row
+        _changes [int >= 0]: the number of times the level changed
+    """
+
+    # GETTERS AND SETTERS
+
+    def getLevel(self):
+        """Returns: the current quality level (0 is the best)"""
+        return self._level
+
+    def getQuality(self):
+        """Returns: the settings of the current quality level
+
+        The dictionary is shared, so do not modify it."""
+        return self._levels[self._level]
+
+    def getAverage(self):
+        """Returns: the smoothed frame time in seconds (0 before the first frame)"""
+        return 0.0 if self._average is None else self._average
+
+    def getBudget(self):
+        """Returns: the seconds available for a frame"""
+        return self._budget
+
+    def getChanges(self):
+        """Returns: the number of times the level changed"""
+        return self._changes
+
+    def __init__(self, fps=60.0, levels=QUALITY_LEVELS, level=0):
+        """Initialize a governor for the given frame rate.
+
+            :param fps: the target frame rate
+            **Precondition**: a number > 0
+
+            :param levels: the quality levels, best first
+            **Precondition**: a nonempty sequence of dictionaries
+
+            :param level: the level to start at
+            **Precondition**: an int in 0..len(levels)-1"""
+        assert fps > 0, repr(fps)+' is not a valid frame rate'
+        assert 0 <= level < len(levels), repr(level)+' is not a valid level'
+        self._budget = 1.0/fps
+        self._levels = tuple(levels)
+        self._level = level
+        self._average = None
+        self._slow = 0
+        self._fast = 0
+        self._changes = 0
+
+    def record(self, seconds):
+        """Returns: True if the quality level changed, False otherwise
+
+        This adds the time of a frame.  It should be called once per frame.
+        A time of 0 (a frame that was not timed) is ignored.
+
+            :param seconds: the time the last frame took
+            **Precondition**: a number >= 0"""
+        if seconds <= 0:
+            return False
+        if self._average is None:
+            self._average = seconds
+        else:
+            self._average += GOVERNOR_SMOOTHING*(seconds-self._average)
+
+        if self._average > GOVERNOR_HIGH*self._budget:
+            self._slow += 1
+            self._fast = 0
+        elif self._average < GOVERNOR_LOW*self._budget:
+            self._fast += 1
+            self._slow = 0
+        else:
+            self._slow = 0
+            self._fast = 0
+
+        if self._slow >= GOVERNOR_DOWN_FRAMES and self._level < len(self._levels)-1:
+            return self._change(self._level+1)
+        if self._fast >= GOVERNOR_UP_FRAMES and self._level > 0:
+            return self._change(self._level-1)
+        return False
+
+    # HELPER METHODS
+
+    def _change(self, level):
+        """Returns: True, after switching to the given level
+
+        The counts and the smoothed frame time start again, so the new level
+        is judged only by its own frames."""
+        self._level = level
+        self._average = None
+        self._slow = 0
+        self._fast = 0
+        self._changes += 1
+        return True
@@ -0,0 +1,518 @@
+# hud.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Heads-up display module for Breakout
+
+This module draws the score, the lives left and the time played at the top of
+the screen.  These change all the time, so they are not GLabels.  A GLabel has
+Kivy render its whole text into a new texture whenever the text changes, and
+uploading that texture every second (or every brick) is slow.
+
+Instead, every character of a font is drawn once, with pygame, into a glyph
+atlas: a single texture holding a small image of each character.  A GlyphText
+lays out a string by looking up each of its characters in the atlas, and writes
+one textured quad per character into a Kivy Mesh.  When the text changes, only
+the vertices of the mesh are rewritten.  The texture never changes.
+
+An atlas is made for each font and point size the first time it is asked for
+(see getGlyphAtlas), and shared after that.  The glyphs are white, so that the
+text can be drawn in any color.  Only the printable ASCII characters are in an
+atlas; any other character is drawn as a question mark.
+
+Like the particles, the HUD is only for show.  It reads the game through
+getters, and it makes its atlas and Kivy instructions on the first draw, so a
+game that is never drawn needs no fonts.  A GlyphText can also be drawn to a
+raster.FrameBuffer, which paints the glyphs from the pixels of the atlas, so
+the HUD is in frames made without a window (see export.py)."""
+import os.path
+import numpy
+import pygame
+import pygame.font
+import pygame.surfarray
+from kivy.graphics import Color, Mesh, InstructionGroup
+from kivy.graphics.texture import Texture
+from constants import *
+from game2d import FONT_PATH
+import colormodel
+
+
+#: the characters drawn into an atlas (the printable ASCII characters)
+GLYPH_CHARS = ''.join(chr(code) for code in range(32, 127))
+#: the character drawn in place of one that is not in an atlas
+GLYPH_MISSING = '?'
+#: the width of an atlas texture in pixels
+GLYPH_PAGE_WIDTH = 512
+#: the empty pixels around each glyph, so that glyphs do not bleed into each other
+GLYPH_PADDING = 1
+
+# The columns of the glyph metrics
+_U0, _V0, _U1, _V1, _W, _H = range(6)
+
+# The offsets of the four corners of a quad, and its two triangles
+_CORNER_X = numpy.array([0, 1, 1, 0], dtype=numpy.float32)
+_CORNER_Y = numpy.array([0, 0, 1, 1], dtype=numpy.float32)
+_QUAD = numpy.array([0, 1, 2, 2, 3, 0], dtype=numpy.uint16)
+
+# The atlases made so far, by (font, size)
+_atlases = {}
+
+
+def getGlyphAtlas(font, size):
+    """Returns: the glyph atlas of a font at a point size
+
+    The atlas is made the first time it is asked for, and shared after that.
+
+        :param font: the file name of a font in the Fonts folder
+        **Precondition**: a string
+
+        :param size: the point size of the font
+        **Precondition**: an int > 0"""
+    key = (font, size)
+    if not key in _atlases:
+        _atlases[key] = GlyphAtlas(font, size)
+    return _atlases[key]
+
+
+class GlyphAtlas(object):
+    """An instance is an image of every character of a font, in one texture.
+
+    The glyphs are packed left to right in rows, and the rows go down from the
+    top of the texture.  The texture is made on the first call to getTexture,
+    so an atlas can be measured without a window.
+
+    INSTANCE ATTRIBUTES:
+        _font    [str]: the file name of the font
+        _size    [int > 0]: the point size of the font
+        _height  [int > 0]: the height of a line of text, in pixels
+        _table   [int array (256,)]: the glyph of each character code
+        _metrics [float32 array (glyphs, 6)]: the texture coordinates (u0, v0,
+                 u1, v1) of the bottom left and top right corners of each
+                 glyph, and its width and height in pixels
+        _pixels  [uint8 array (height, width, 4)]: the RGBA pixels of the
+                 texture, bottom row first
+        _texture [Texture, or None before the first getTexture]: the glyphs
+    """
+
+    # GETTERS AND SETTERS
+
+    def getFont(self):
+        """Returns: the file name of the font"""
+        return self._font
+
+    def getSize(self):
+        """Returns: the point size of the font"""
+        return self._size
+
+    def getHeight(self):
+        """Returns: the height of a line of text, in pixels"""
+        return self._height
+
+    def getPixels(self):
+        """Returns: the RGBA pixels of the texture, bottom row first
+
+        The glyphs are white, and their shapes are in the alpha channel.  The
+        array is shared, so do not modify it."""
+        return self._pixels
+
+    def getMetrics(self):
+        """Returns: the texture coordinates and size of each glyph
+
+        Row i is the u0, v0, u1, v1, width and height of glyph i.  The array
+        is shared, so do not modify it."""
+        return self._metrics
+
+    def getTexture(self):
+        """Returns: the texture with the glyphs, making it if necessary"""
+        if self._texture is None:
+            height, width = self._pixels.shape[:2]
+            self._texture = Texture.create(size=(width, height), colorfmt='rgba')
+            self._texture.mag_filter = 'nearest'
+            self._texture.min_filter = 'nearest'
+            self._texture.blit_buffer(self._pixels.tobytes(), colorfmt='rgba',
+                                      bufferfmt='ubyte')
+        return self._texture
+
+    def __init__(self, font, size):
+        """Initialize the atlas of a font at a point size.
+
+        Every character in GLYPH_CHARS is drawn with pygame and packed into
+        the pixels of the texture.
+
+            :param font: the file name of a font in the Fonts folder
+            **Precondition**: a string
+
+            :param size: the point size of the font
+            **Precondition**: an int > 0"""
+        assert type(size) == int and size > 0, repr(size)+' is not a valid size'
+        self._font = font
+        self._size = size
+        self._texture = None
+
+        if not pygame.font.get_init():
+            pygame.font.init()
+        path = os.path.join(FONT_PATH, font)
+        face = pygame.font.Font(path if os.path.exists(path) else None, size)
+        self._height = face.get_height()
+
+        images = []
+        for char in GLYPH_CHARS:
+            surface = face.render(char, True, (255, 255, 255))
+            images.append(pygame.surfarray.array_alpha(surface).T)
+        self._pack(images)
+
+        self._table = numpy.empty(256, dtype=numpy.intp)
+        self._table.fill(GLYPH_CHARS.index(GLYPH_MISSING))
+        for i, char in enumerate(GLYPH_CHARS):
+            self._table[ord(char)] = i
+
+    def lookup(self, text):
+        """Returns: the glyph of each character of the text, as an int array
+
+            :param text: the text to look up
+            **Precondition**: a string"""
+        codes = numpy.fromiter((ord(char) for char in text), dtype=numpy.intp,
+                               count=len(text))
+        numpy.minimum(codes, 255, out=codes)
+        return self._table[codes]
+
+    def measure(self, text):
+        """Returns: the width of the text in pixels
+
+            :param text: the text to measure
+            **Precondition**: a string"""
+        return float(self._metrics[self.lookup(text), _W].sum())
+
+    # HELPER METHODS
+
+    def _pack(self, images):
+        """Packs the glyph images into the pixels of the texture, and sets the
+        texture coordinates of each glyph.
+
+        The texture is GLYPH_PAGE_WIDTH wide, and as many rows high as the
+        glyphs need, rounded up to a power of two.
+
+            :param images: the alpha of each glyph, top row first
+            **Precondition**: a list of 2d uint8 arrays, one per GLYPH_CHARS"""
+        pad = GLYPH_PADDING
+        places = []
+        x = y = pad
+        shelf = 0
+        for image in images:
+            h, w = image.shape
+            assert w+2*pad <= GLYPH_PAGE_WIDTH, 'the font is too large for an atlas'
+            if x+w+pad > GLYPH_PAGE_WIDTH:
+                x = pad
+                y += shelf+pad
+                shelf = 0
+            places.append((x, y))
+            x += w+pad
+            shelf = max(shelf, h)
+
+        height = 1
+        while height < y+shelf+pad:
+            height *= 2
+        width = GLYPH_PAGE_WIDTH
+
+        # The glyphs are placed top row first, and the rows flipped at the end
+        pixels = numpy.zeros((height, width, 4), dtype=numpy.uint8)
+        pixels[:, :, :3] = 255
+        self._metrics = numpy.zeros((len(images), 6), dtype=numpy.float32)
+        for i, (image, (x, y)) in enumerate(zip(images, places)):
+            h, w = image.shape
+            pixels[y:y+h, x:x+w, 3] = image
+            self._metrics[i] = (float(x)/width, float(height-y-h)/height,
+                                float(x+w)/width, float(height-y)/height, w, h)
+        self._pixels = numpy.ascontiguousarray(pixels[::-1])
+
+
+class GlyphText(object):
+    """An instance is a line of text drawn from a glyph atlas as one mesh.
+
+    The text sits on the point (x, y).  The point is the bottom left corner of
+    the text if it is aligned left, the bottom middle if it is centered, and
+    the bottom right corner if it is aligned right.
+
+    The text has a fixed capacity, and the arrays of the mesh are allocated
+    once for that many characters.
+
+    INSTANCE ATTRIBUTES:
+        _atlas    [GlyphAtlas]: the glyphs of the font
+        _x        [int]: the horizontal position of the text
+        _y        [int]: the bottom of the text
+        _halign   [one of 'left', 'center', 'right']: the side of the text at _x
+        _color    [4-element list of floats between 0 and 1]: the color of the text
+        _capacity [int > 0]: the most characters in the text
+        _text     [str, at most _capacity characters]: the text
+        _width    [float >= 0]: the width of the text in pixels
+        _left     [int]: the left edge of the text
+        _vertices [float32 array (capacity, 4, 4)]: the x, y, u, v of the
+                  corners of the quad of each character
+        _indices  [uint16 array (capacity*6,)]: the two triangles of each quad
+        _dirty    [bool]: True if the vertices changed since they were last
+                  given to the mesh
+        _mesh     [Mesh, or None before the first draw]: the quads
+        _group    [InstructionGroup, or None before the first draw]: the
+                  instructions given to the view every frame
+        _drawn    [int >= 0]: the number of quads in the mesh indices
+    """
+
+    # GETTERS AND SETTERS
+
+    def getText(self):
+        """Returns: the text"""
+        return self._text
+
+    def setText(self, text):
+        """Sets the text, and rewrites the vertices of its quads.
+
+        Nothing is done if the text is the same as before.
+
+            :param text: the new text
+            **Precondition**: a string of at most getCapacity() characters"""
+        assert len(text) <= self._capacity, repr(text)+' is too long'
+        if text != self._text:
+            self._text = text
+            self._layout()
+
+    def getWidth(self):
+        """Returns: the width of the text in pixels"""
+        return self._width
+
+    def getBounds(self):
+        """Returns: the (left, bottom, right, top) of the text"""
+        return (self._left, self._y, self._left+self._width,
+                self._y+self._atlas.getHeight())
+
+    def getAtlas(self):
+        """Returns: the glyphs of the font"""
+        return self._atlas
+
+    def getColor(self):
+        """Returns: the color of the text, as 4 floats between 0 and 1"""
+        return self._color
+
+    def getQuads(self):
+        """Returns: the x, y, u, v of the corners of the quad of each character
+
+        The result has shape (len(getText()), 4, 4).  The corners go around
+        from the bottom left.  The array is shared, so do not modify it."""
+        return self._vertices[:len(self._text)]
+
+    def getCapacity(self):
+        """Returns: the most characters in the text"""
+        return self._capacity
+
+    def setPosition(self, x, y):
+        """Moves the text so that it sits on the point (x, y).
+
+            :param x: the horizontal position of the text (see halign)
+            **Precondition**: a number
+
+            :param y: the bottom of the text
+            **Precondition**: a number"""
+        self._x = int(round(x))
+        self._y = int(round(y))
+        self._layout()
+
+    def __init__(self, atlas, x=0, y=0, halign='left', color=colormodel.BLACK,
+                 capacity=32, text=''):
+        """Initialize a line of text.
+
+            :param atlas: the glyphs of the font
+            **Precondition**: a GlyphAtlas
+
+            :param x: the horizontal position of the text (see halign)
+            **Precondition**: a number
+
+            :param y: the bottom of the text
+            **Precondition**: a number
+
+            :param halign: the side of the text at x
+            **Precondition**: one of 'left', 'center' or 'right'
+
+            :param color: the color of the text
+            **Precondition**: an RGB or HSV object, or a 3- or 4-element list
+            of floats between 0 and 1
+
+            :param capacity: the most characters in the text
+            **Precondition**: an int in 1..16384 (the vertices of the mesh
+            are numbered with unsigned shorts)
+
+            :param text: the text
+            **Precondition**: a string of at most capacity characters"""
+        assert halign in ('left', 'center', 'right'), repr(halign)+' is not a valid alignment'
+        assert 0 < capacity <= 16384, repr(capacity)+' is not a valid capacity'
+        self._atlas = atlas
+        self._x = int(round(x))
+        self._y = int(round(y))
+        self._halign = halign
+        if type(color) in [colormodel.RGB, colormodel.HSV]:
+            color = color.glColor()
+        self._color = list(color)+[1.0]*(4-len(color))
+        self._capacity = capacity
+        self._text = ''
+        self._width = 0.0
+        self._left = self._x
+        self._vertices = numpy.zeros((capacity, 4, 4), dtype=numpy.float32)
+        self._indices = (numpy.arange(capacity, dtype=numpy.uint16)[:, None]*4 +
+                         _QUAD).reshape(-1)
+
+        self._dirty = True
+        self._mesh = None
+        self._group = None
+        self._drawn = -1
+        self.setText(text)
+
+    def draw(self, view):
+        """Draws the text in the view.
+
+        The mesh is only given new vertices when the text has changed since
+        the last draw.  A frame buffer has no meshes, so it is given the text
+        to paint instead.
+
+            :param view: view to draw to
+            **Precondition**: an *instance of* `GView`, or a raster.FrameBuffer"""
+        n = len(self._text)
+        if n == 0:
+            return
+        if hasattr(view, 'drawGlyphs'):
+            view.drawGlyphs(self)
+            return
+        if self._group is None:
+            self._build()
+
+        if self._dirty:
+            self._mesh.vertices = self._vertices.reshape(-1)[:n*16]
+            self._dirty = False
+        if self._drawn != n:
+            self._mesh.indices = self._indices[:n*6]
+            self._drawn = n
+        view.draw(self._group)
+
+    # HELPER METHODS
+
+    def _layout(self):
+        """Writes the quads of the text into the vertex array.
+
+        The characters are placed side by side, each as wide as its glyph."""
+        n = len(self._text)
+        metrics = self._atlas.getMetrics()[self._atlas.lookup(self._text)]
+        widths = metrics[:, _W]
+        right = numpy.cumsum(widths)
+        self._width = float(right[-1]) if n else 0.0
+
+        left = self._x
+        if self._halign == 'center':
+            left -= int(self._width//2)
+        elif self._halign == 'right':
+            left -= int(self._width)
+        self._left = left
+
+        vertices = self._vertices[:n]
+        numpy.multiply(widths[:, None], _CORNER_X, out=vertices[:, :, 0])
+        vertices[:, :, 0] += (right-widths+left)[:, None]
+        numpy.multiply(metrics[:, _H, None], _CORNER_Y, out=vertices[:, :, 1])
+        vertices[:, :, 1] += self._y
+        numpy.multiply((metrics[:, _U1]-metrics[:, _U0])[:, None], _CORNER_X,
+                       out=vertices[:, :, 2])
+        vertices[:, :, 2] += metrics[:, _U0, None]
+        numpy.multiply((metrics[:, _V1]-metrics[:, _V0])[:, None], _CORNER_Y,
+                       out=vertices[:, :, 3])
+        vertices[:, :, 3] += metrics[:, _V0, None]
+        self._dirty = True
+
+    def _build(self):
+        """Makes the mesh and the instruction group."""
+        self._mesh = Mesh(vertices=[], indices=[], mode='triangles',
+                          texture=self._atlas.getTexture())
+        self._group = InstructionGroup()
+        self._group.add(Color(*self._color))
+        self._group.add(self._mesh)
+        self._drawn = -1
+
+
+class Hud(object):
+    """An instance is the score, lives and timer at the top of the screen.
+
+    The score is on the left, the lives in the middle and the time played on
+    the right.  The values are given with setValues, usually every frame, and
+    a text is only laid out again when its value changes.
+
+    INSTANCE ATTRIBUTES:
+        _config  [GameConfig]: the settings of the screen size
+        _font    [str]: the file name of the font
+        _size    [int > 0]: the point size of the font
+        _values  [tuple of three ints >= 0]: the score, lives and seconds played
+        _score   [GlyphText, or None before the first draw]: the score
+        _lives   [GlyphText, or None before the first draw]: the lives left
+        _clock   [GlyphText, or None before the first draw]: the time played
+    """
+
+    # GETTERS AND SETTERS
+
+    def getValues(self):
+        """Returns: the score, lives and seconds played, as a tuple"""
+        return self._values
+
+    def setValues(self, score, lives, seconds):
+        """Sets the values shown.
+
+            :param score: the score
+            **Precondition**: an int >= 0
+
+            :param lives: the balls left
+            **Precondition**: an int >= 0
+
+            :param seconds: the whole seconds played
+            **Precondition**: an int >= 0"""
+        self._values = (score, lives, seconds)
+
+    def __init__(self, config=None, font=HUD_FONT, size=HUD_FONT_SIZE):
+        """Initialize a HUD showing zeros.
+
+        The atlas and texts are made on the first draw.
+
+            :param config: the settings of the screen size
+            **Precondition**: a GameConfig, or None for DEFAULT_CONFIG
+
+            :param font: the file name of a font in the Fonts folder
+            **Precondition**: a string
+
+            :param size: the point size of the font
+            **Precondition**: an int > 0"""
+        self._config = DEFAULT_CONFIG if config is None else config
+        self._font = font
+        self._size = size
+        self._values = (0, 0, 0)
+        self._score = None
+        self._lives = None
+        self._clock = None
+
+    def draw(self, view):
+        """Draws the score, lives and timer in the view.
+
+            :param view: view to draw to
+            **Precondition**: an *instance of* `GView`, or a raster.FrameBuffer"""
+        if self._score is None:
+            self._build()
+
+        score, lives, seconds = self._values
+        self._score.setText('SCORE %d' % score)
+        self._lives.setText('LIVES %d' % lives)
+        self._clock.setText('%d:%02d' % (seconds // 60, seconds % 60))
+        self._score.draw(view)
+        self._lives.draw(view)
+        self._clock.draw(view)
+
+    # HELPER METHODS
+
+    def _build(self):
+        """Makes the three texts, in the band above the bricks."""
+        atlas = getGlyphAtlas(self._font, self._size)
+        width = self._config.GAME_WIDTH
+        margin = self._config.BRICK_SEP_H*2
+        band = self._config.BRICK_Y_OFFSET-self._config.BRICK_HEIGHT
+        y = self._config.GAME_HEIGHT - (band+atlas.getHeight())//2
+        self._score = GlyphText(atlas, margin, y, 'left')
+        self._lives = GlyphText(atlas, width/2.0, y, 'center')
+        self._clock = GlyphText(atlas, width-margin, y, 'right')
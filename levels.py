@@ -0,0 +1,233 @@
+# levels.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Level file module for Breakout
+
+This module reads and writes binary level files.  A level file holds a brick
+layout so that levels do not have to be expressed through the constants in
+constants.py.  The file is laid out as follows (all values little endian):
+
+    header   [16 bytes]:  magic 'BKLV', version, columns, rows, palette size,
+                          and brick count
+    palette  [4 bytes per entry]:  RGBA colors, each channel in 0..255
+    records  [8 bytes per brick]:  column, row, color index, hit points, flags
+
+The only brick flag so far is BRICK_UNBREAKABLE (see constants.py).
+
+Because every record has the same size, a level file can be memory mapped
+and viewed as a NumPy structured array.  Nothing is parsed brick by brick,
+so large level packs load without stalling the game.
+
+To convert the default layout (given by the constants) to a level file, run
+
+    python levels.py level.lvl
+
+which writes a file that BrickWall will lay out exactly like the default wall."""
+import mmap
+import struct
+import sys
+import numpy
+import colormodel
+from constants import *
+
+
+#: the first four bytes of every level file
+LEVEL_MAGIC   = b'BKLV'
+#: the current version of the level file format
+LEVEL_VERSION = 1
+
+#: the header: magic, version, columns, rows, palette size, brick count
+LEVEL_HEADER = struct.Struct('<4sHHHHI')
+
+#: a single palette entry (red, green, blue, alpha)
+PALETTE_DTYPE = numpy.dtype([('red','u1'),('green','u1'),('blue','u1'),('alpha','u1')])
+
+#: a single brick record
+BRICK_DTYPE = numpy.dtype([('col','<u2'),('row','<u2'),('color','u1'),
+                           ('hits','u1'),('flags','u1'),('pad','u1')])
+
+
+class LevelFile(object):
+    """An instance is a level file opened through a memory map.
+
+    The palette and the brick records are NumPy views into the memory map.
+    They are read-only, and they are only valid until the level is closed.
+
+    INSTANCE ATTRIBUTES:
+        _file    [file]:   the open level file
+        _map     [mmap]:   the memory map of the level file
+        _columns [int > 0]: the number of bricks in a row
+        _rows    [int > 0]: the number of brick rows
+        _palette [NumPy array of PALETTE_DTYPE]: the level colors
+        _records [NumPy array of BRICK_DTYPE]:   the bricks in the level
+    """
+
+    # GETTERS AND SETTERS
+
+    def getColumns(self):
+        """Returns: the number of bricks in a row of this level"""
+        return self._columns
+
+    def getRows(self):
+        """Returns: the number of brick rows in this level"""
+        return self._rows
+
+    def getPalette(self):
+        """Returns: the palette as an array of PALETTE_DTYPE"""
+        return self._palette
+
+    def getRecords(self):
+        """Returns: the bricks as an array of BRICK_DTYPE"""
+        return self._records
+
+    def getColor(self, index):
+        """Returns: palette entry index as a colormodel.RGB object
+
+            :param index: the palette index
+            **Precondition**: an int in 0..palette size-1"""
+        entry = self._palette[index]
+        return colormodel.RGB(int(entry['red']),int(entry['green']),
+                              int(entry['blue']),int(entry['alpha']))
+
+    def __init__(self, filename):
+        """Opens and memory maps the level file filename.
+
+        Raises ValueError if the file is not a valid level file.
+
+            :param filename: the name of the level file
+            **Precondition**: a string"""
+        self._file = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except:
+            self._file.close()
+            raise
+
+        try:
+            self._layout()
+        except:
+            self.close()
+            raise
+
+    def close(self):
+        """Closes the level file.  The palette and records are no longer valid."""
+        self._palette = None
+        self._records = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # HELPER METHODS
+
+    def _layout(self):
+        """Reads the header and creates the views for the palette and records."""
+        size = len(self._map)
+        if size < LEVEL_HEADER.size:
+            raise ValueError('level file is too short for a header')
+
+        magic, version, columns, rows, colors, count = \
+            LEVEL_HEADER.unpack_from(self._map, 0)
+        if magic != LEVEL_MAGIC:
+            raise ValueError('level file has the wrong magic number')
+        if version != LEVEL_VERSION:
+            raise ValueError('level file version %d is not supported' % version)
+        if columns == 0 or rows == 0:
+            raise ValueError('level file has no brick grid')
+
+        offset = LEVEL_HEADER.size + colors*PALETTE_DTYPE.itemsize
+        if size != offset + count*BRICK_DTYPE.itemsize:
+            raise ValueError('level file size does not match its header')
+
+        self._columns = columns
+        self._rows = rows
+        self._palette = numpy.frombuffer(self._map, dtype=PALETTE_DTYPE,
+                                         count=colors, offset=LEVEL_HEADER.size)
+        self._records = numpy.frombuffer(self._map, dtype=BRICK_DTYPE,
+                                         count=count, offset=offset)
+
+        if count > 0:
+            if self._records['col'].max() >= columns or self._records['row'].max() >= rows:
+                raise ValueError('level file has a brick outside of its grid')
+            if self._records['color'].max() >= colors:
+                raise ValueError('level file has a brick color outside of its palette')
+
+
+def writeLevel(filename, columns, rows, palette, records):
+    """Writes a brick layout to the level file filename.
+
+        :param filename: the name of the level file
+        **Precondition**: a string
+
+        :param columns: the number of bricks in a row
+        **Precondition**: an int in 1..65535
+
+        :param rows: the number of brick rows
+        **Precondition**: an int in 1..65535
+
+        :param palette: the level colors
+        **Precondition**: a list of colormodel.RGB objects
+
+        :param records: the bricks in the level
+        **Precondition**: an array of BRICK_DTYPE, or a sequence of
+        (col, row, color, hits, flags) tuples"""
+    if not isinstance(records, numpy.ndarray):
+        records = numpy.array([tuple(r)+(0,) for r in records], dtype=BRICK_DTYPE)
+    colors = numpy.array([(c.red, c.green, c.blue, c.alpha) for c in palette],
+                         dtype=PALETTE_DTYPE)
+
+    assert 0 < columns < 65536 and 0 < rows < 65536, 'grid size is out of range'
+    assert len(records) == 0 or (records['col'].max() < columns and
+                                 records['row'].max() < rows), \
+        'brick outside of the grid'
+    assert len(records) == 0 or records['color'].max() < len(colors), \
+        'brick color outside of the palette'
+
+    output = open(filename, 'wb')
+    try:
+        output.write(LEVEL_HEADER.pack(LEVEL_MAGIC, LEVEL_VERSION, columns, rows,
+                                       len(colors), len(records)))
+        output.write(colors.tobytes())
+        output.write(records.tobytes())
+    finally:
+        output.close()
+
+
+def defaultLayout(config=None):
+    """Returns: the default layout as a (columns, rows, palette, records) tuple
+
+    The default layout is the one given by BRICKS_IN_ROW, BRICK_ROWS, and
+    ROW_COLORS of the configuration.  Every brick takes one hit to destroy.
+    The tuple can be passed (unpacked) to writeLevel after the file name.
+
+        :param config: the settings to lay out
+        **Precondition**: a GameConfig, or None for DEFAULT_CONFIG"""
+    config = DEFAULT_CONFIG if config is None else config
+    colors = [config.getRowColor(row) for row in range(config.BRICK_ROWS)]
+    palette = []
+    for color in colors:
+        if not color in palette:
+            palette.append(color)
+
+    records = numpy.zeros(config.BRICK_COUNT, dtype=BRICK_DTYPE)
+    cells = numpy.arange(len(records))
+    records['col'] = cells % config.BRICKS_IN_ROW
+    records['row'] = cells // config.BRICKS_IN_ROW
+    records['color'] = numpy.repeat([palette.index(color) for color in colors],
+                                    config.BRICKS_IN_ROW)
+    records['hits'] = 1
+    return (config.BRICKS_IN_ROW, config.BRICK_ROWS, palette, records)
+
+
+# Application code
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print('Usage: python levels.py filename')
+        sys.exit(1)
+    writeLevel(sys.argv[1], *defaultLayout())
@@ -0,0 +1,423 @@
+# memory.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Memory tracking module for Breakout
+
+This module finds out where memory goes in a long session.  It is off unless
+the game is started with the option --memory file (see __main__.py), or a soak
+is run with this module (see below), as tracing every allocation makes the game
+several times slower.
+
+It uses tracemalloc, which only exists in Python 3.  It measures two things:
+
+Every frame, it measures how much the traced memory changed in each phase of
+the frame: the update, the draw, and everything else (the view rebuilding
+shapes and Kivy itself).  A phase that keeps adding bytes frame after frame is
+holding on to something.
+
+Every MEMORY_INTERVAL frames, it takes a checkpoint: a snapshot of every live
+allocation, summed by subsystem (a module of the game, Kivy, NumPy, pygame or
+the rest of Python), and a count of the live objects of the types we suspect
+of leaking (WATCHED_TYPES).  It also counts the texture_size callbacks bound
+to Kivy Labels.  GLabel binds one to its Label, so there should never be more
+callbacks (or Labels) than GLabels.
+
+When the program exits, it writes a report with the memory at each checkpoint,
+the top allocation sites, the sites that grew the most since the first
+checkpoint, and the leaks it suspects.  The first checkpoint is the baseline,
+so the caches that fill up at the start of a game are not counted as growth.
+
+To soak test the game headless with memory tracking, run
+
+    python memory.py [report] [frames] [skill] [settings]
+
+where settings are the same as for the game (see constants.parseArgs)."""
+import atexit
+import gc
+import os
+import sys
+from constants import *
+
+try:
+    import tracemalloc
+except ImportError: # Python 2
+    tracemalloc = None
+
+
+#: the number of frames between checkpoints
+MEMORY_INTERVAL = 600
+#: the number of frames of the call stack kept for each allocation
+MEMORY_DEPTH = 1
+#: the number of allocation sites in each table of the report
+MEMORY_TOP = 15
+#: the growth (in bytes) between two checkpoints that is not a suspected leak;
+#: the tracker keeps a few hundred bytes for every checkpoint it takes
+MEMORY_SLACK = 4096
+#: the types whose live objects are counted at each checkpoint
+WATCHED_TYPES = ('GLabel', 'Label', 'Ball', 'GRectangle', 'GEllipse',
+                 'Color', 'InstructionGroup', 'Mesh', 'Texture')
+
+# The number of subsystems in the columns of the report (the rest are summed)
+_COLUMNS = 8
+
+# The folder of the game modules, to tell them from the libraries
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# The trackers made so far, by report file
+_trackers = {}
+
+
+def getTracker(path):
+    """Returns: the memory tracker that writes to the given report file
+
+    The tracker is made (and tracing started) the first time it is asked for,
+    and shared after that, so a new game does not start a new report.
+
+        :param path: the report file
+        **Precondition**: a string"""
+    if not path in _trackers:
+        _trackers[path] = MemoryTracker(path)
+    return _trackers[path]
+
+
+class MemoryTracker(object):
+    """An instance measures memory every frame and writes a report at exit.
+
+    The frame is split into phases with begin and end.  Memory that changes
+    outside of a phase is counted in the phase 'other'.
+
+    INSTANCE ATTRIBUTES:
+        _path     [str]: the report file
+        _interval [int > 0]: the number of frames between checkpoints
+        _top      [int > 0]: the number of sites in each table of the report
+        _started  [bool]: True if this tracker started tracemalloc
+        _frames   [int >= 0]: the number of frames started
+        _start    [int, or None before the first frame]: the traced memory at
+                  the start of the current frame
+        _mark     [int]: the traced memory at the end of the last phase
+        _current  [dict of str to int]: the change of each phase in the
+                  current frame, in bytes
+        _phases   [dict of str to list]: the total and the largest change of
+                  each phase in a frame, over all measured frames, in bytes
+        _measured [int >= 0]: the number of frames in _phases
+        _churn    [int >= 0]: the most memory a frame used above its start
+                  (only measured where tracemalloc.reset_peak exists)
+        _timeline [list of tuples]: each checkpoint, as (frame, traced memory,
+                  dict of subsystem to bytes, dict of type name to live objects)
+        _baseline [tracemalloc.Snapshot, or None]: the first checkpoint
+        _last     [tracemalloc.Snapshot, or None]: the last checkpoint
+        _closed   [bool]: True once the report is written
+    """
+
+    # GETTERS AND SETTERS
+
+    def getFrames(self):
+        """Returns: the number of frames measured"""
+        return self._frames
+
+    def getPhases(self):
+        """Returns: the mean change of each phase per frame, in bytes, as a dictionary"""
+        return dict((phase, float(total)/max(self._measured, 1))
+                    for phase, (total, largest) in self._phases.items())
+
+    def getTimeline(self):
+        """Returns: the checkpoints, as a list of tuples (frame, traced memory,
+        bytes of each subsystem, live objects of each watched type)"""
+        return self._timeline
+
+    def __init__(self, path, interval=MEMORY_INTERVAL, top=MEMORY_TOP, depth=MEMORY_DEPTH):
+        """Initialize a tracker, and start tracemalloc if it is not tracing.
+
+        The report is written at exit, or when close is called.
+
+            :param path: the report file
+            **Precondition**: a string
+
+            :param interval: the number of frames between checkpoints
+            **Precondition**: an int > 0
+
+            :param top: the number of sites in each table of the report
+            **Precondition**: an int > 0
+
+            :param depth: the number of frames of the call stack kept for
+            each allocation
+            **Precondition**: an int > 0"""
+        if tracemalloc is None:
+            raise RuntimeError('memory tracking needs tracemalloc (Python 3.4 or later)')
+        assert type(interval) == int and interval > 0, repr(interval)+' is not a valid interval'
+        self._path = path
+        self._interval = interval
+        self._top = top
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start(depth)
+
+        self._frames = 0
+        self._start = None
+        self._mark = 0
+        self._current = {'frame': 0, 'other': 0}
+        self._phases = {}
+        self._measured = 0
+        self._churn = 0
+        self._timeline = []
+        self._baseline = None
+        self._last = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def frame(self):
+        """Ends the last frame and starts a new one.
+
+        This should be called once at the start of every frame.  Every
+        MEMORY_INTERVAL frames it also takes a checkpoint."""
+        if self._closed:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        if self._start is not None:
+            self._add('other', current-self._mark)
+            self._add('frame', current-self._start)
+            self._fold()
+            if hasattr(tracemalloc, 'reset_peak'):
+                self._churn = max(self._churn, peak-self._start)
+
+        self._frames += 1
+        if self._frames % self._interval == 0:
+            self.checkpoint()
+            current = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        self._start = current
+        self._mark = current
+
+    def begin(self):
+        """Starts a phase of the frame.
+
+        The memory changed since the last phase is counted in 'other'."""
+        if self._start is None or self._closed:
+            return
+        current = tracemalloc.get_traced_memory()[0]
+        self._add('other', current-self._mark)
+        self._mark = current
+
+    def end(self, phase):
+        """Ends a phase of the frame, and counts the memory it changed.
+
+            :param phase: the name of the phase
+            **Precondition**: a string"""
+        if self._start is None or self._closed:
+            return
+        current = tracemalloc.get_traced_memory()[0]
+        self._add(phase, current-self._mark)
+        self._mark = current
+
+    def checkpoint(self):
+        """Takes a snapshot of the live allocations and objects."""
+        snapshot = tracemalloc.take_snapshot().filter_traces(_filters())
+        subsystems = {}
+        for stat in snapshot.statistics('filename'):
+            name = _subsystem(stat.traceback[0].filename)
+            subsystems[name] = subsystems.get(name, 0)+stat.size
+        traced = sum(subsystems.values())
+
+        self._timeline.append((self._frames, traced, subsystems, _census()))
+        if self._baseline is None:
+            self._baseline = snapshot
+        self._last = snapshot
+
+    def close(self):
+        """Takes a last checkpoint and writes the report.
+
+        Nothing is done if the report is already written."""
+        if self._closed:
+            return
+        if not self._timeline or self._timeline[-1][0] != self._frames:
+            self.checkpoint()
+        self._closed = True
+        try:
+            with open(self._path, 'w') as file:
+                file.write(self.report())
+        finally:
+            if self._started:
+                tracemalloc.stop()
+
+    def report(self):
+        """Returns: the memory report, as a string"""
+        first = self._timeline[0]
+        last = self._timeline[-1]
+        lines = ['Memory report: %d frames, %d checkpoints every %d frames' %
+                 (self._frames, len(self._timeline), self._interval)]
+        growth = last[1]-first[1]
+        rate = float(growth)/max(last[0]-first[0], 1)
+        lines.append('Traced memory: %s at frame %d, %s at frame %d (%+.1f bytes per frame)' %
+                     (_size(first[1]), first[0], _size(last[1]), last[0], rate))
+        if self._churn:
+            lines.append('Most memory used within a frame: %s' % _size(self._churn))
+
+        lines.append('')
+        lines.append('Change in traced memory per frame, by phase:')
+        lines.append('  %-8s %14s %14s' % ('phase', 'mean (bytes)', 'largest'))
+        for phase in sorted(self._phases):
+            total, largest = self._phases[phase]
+            lines.append('  %-8s %+14.1f %+14d' %
+                         (phase, float(total)/max(self._measured, 1), largest))
+
+        names = sorted(last[2], key=lambda name: -last[2][name])[:_COLUMNS]
+        lines.append('')
+        lines.append('Traced memory by subsystem (KiB):')
+        lines.append('  %8s' % 'frame' + ''.join(' %10s' % name[:10] for name in names) +
+                     ' %10s' % 'rest')
+        for frames, traced, subsystems, counts in self._timeline:
+            sizes = [subsystems.get(name, 0) for name in names]
+            sizes.append(traced-sum(sizes))
+            lines.append('  %8d' % frames + ''.join(' %10.1f' % (size/1024.0) for size in sizes))
+
+        lines.append('')
+        lines.append('Live objects:')
+        lines.append('  %8s' % 'frame' + ''.join(' %10s' % name[:10] for name in _COUNTED))
+        for frames, traced, subsystems, counts in self._timeline:
+            lines.append('  %8d' % frames + ''.join(' %10d' % counts[name] for name in _COUNTED))
+
+        lines.append('')
+        lines.append('Top allocation sites at frame %d:' % last[0])
+        for stat in self._last.statistics('lineno')[:self._top]:
+            lines.append('  %10s %8d  %s' % (_size(stat.size), stat.count, _site(stat.traceback)))
+
+        lines.append('')
+        lines.append('Growth since frame %d:' % first[0])
+        diffs = [diff for diff in self._last.compare_to(self._baseline, 'lineno')
+                 if diff.size_diff > 0]
+        for diff in diffs[:self._top]:
+            lines.append('  %10s %+8d  %s' % ('+'+_size(diff.size_diff), diff.count_diff,
+                                             _site(diff.traceback)))
+
+        lines.append('')
+        lines.append('Suspected leaks:')
+        leaks = self._leaks()
+        lines.extend('  '+leak for leak in leaks)
+        if not leaks:
+            lines.append('  none')
+        return '\n'.join(lines)+'\n'
+
+    # HELPER METHODS
+
+    def _add(self, phase, size):
+        """Adds memory changed by a phase to the current frame."""
+        self._current[phase] = self._current.get(phase, 0)+size
+
+    def _fold(self):
+        """Adds the changes of the current frame to the totals, and sets the
+        changes back to 0."""
+        for phase, size in self._current.items():
+            stats = self._phases.get(phase)
+            if stats is None:
+                stats = self._phases[phase] = [0, size]
+            stats[0] += size
+            stats[1] = max(stats[1], size)
+            self._current[phase] = 0
+        self._measured += 1
+
+    def _leaks(self):
+        """Returns: a list of descriptions of the leaks that the checkpoints suggest
+
+        A leak is suspected when something grows at every checkpoint after the
+        first one (with at least three checkpoints, and by more than MEMORY_SLACK
+        bytes for the traced memory), or when the texture_size callbacks or Kivy
+        Labels outnumber the GLabels."""
+        leaks = []
+        timeline = self._timeline
+        if len(timeline) >= 3:
+            if all(timeline[i][1] > timeline[i-1][1]+MEMORY_SLACK
+                   for i in range(2, len(timeline))):
+                leaks.append('traced memory grew at every checkpoint (%+d bytes since frame %d)' %
+                             (timeline[-1][1]-timeline[1][1], timeline[1][0]))
+            for name in _COUNTED:
+                if all(timeline[i][3][name] > timeline[i-1][3][name]
+                       for i in range(2, len(timeline))):
+                    what = 'callbacks' if name == 'texture_size' else 'objects'
+                    leaks.append('%s %s grew at every checkpoint (%d to %d)' %
+                                 (name, what, timeline[1][3][name], timeline[-1][3][name]))
+
+        counts = timeline[-1][3]
+        if counts['texture_size'] > counts['GLabel']:
+            leaks.append('%d texture_size callbacks for %d GLabels: callbacks are still bound '
+                         'to Labels whose GLabel was dropped' %
+                         (counts['texture_size'], counts['GLabel']))
+        if counts['Label'] > counts['GLabel']:
+            leaks.append('%d Kivy Labels for %d GLabels: Labels outlive their GLabel' %
+                         (counts['Label'], counts['GLabel']))
+        return leaks
+
+
+# The columns of the live object table
+_COUNTED = WATCHED_TYPES+('texture_size',)
+
+
+def _filters():
+    """Returns: the filters that remove the allocations of the tracking itself"""
+    return (tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>'))
+
+
+def _census():
+    """Returns: the number of live objects of each watched type, and the number
+    of texture_size callbacks bound to Kivy Labels, as a dictionary
+
+    Only the objects that the garbage collector tracks are counted."""
+    counts = dict((name, 0) for name in _COUNTED)
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name in counts:
+            counts[name] += 1
+            if name == 'Label' and hasattr(obj, 'get_property_observers'):
+                counts['texture_size'] += len(obj.get_property_observers('texture_size'))
+    return counts
+
+
+def _subsystem(filename):
+    """Returns: the subsystem of a source file
+
+    This is the module name for the modules of the game, the library name for
+    Kivy, NumPy and pygame, and 'python' for everything else."""
+    if filename.startswith('<'):
+        return 'python'
+    path = os.path.abspath(filename)
+    if os.path.dirname(path) == _ROOT:
+        return os.path.splitext(os.path.basename(path))[0]
+    for library in ('kivy', 'numpy', 'pygame'):
+        if os.sep+library+os.sep in path:
+            return library
+    return 'python'
+
+
+def _site(traceback):
+    """Returns: the file and line of an allocation, relative to the game folder"""
+    frame = traceback[0]
+    filename = frame.filename
+    if filename.startswith(_ROOT+os.sep):
+        filename = filename[len(_ROOT)+1:]
+    return '%s:%d' % (filename, frame.lineno)
+
+
+def _size(size):
+    """Returns: a number of bytes, in readable units"""
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024 or unit == 'MiB':
+            return ('%d %s' % (size, unit)) if unit == 'B' else ('%.1f %s' % (size, unit))
+        size /= 1024.0
+
+
+# Application code
+if __name__ == '__main__':
+    import breakout
+    from autopilot import soak
+    path   = sys.argv[1] if len(sys.argv) > 1 else 'memory.txt'
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 60*60
+    skill  = sys.argv[3] if len(sys.argv) > 3 else 'expert'
+    config = parseArgs(sys.argv[4:])
+
+    breakout.MEMORY_REPORT = path
+    soak(frames, skill, config=config)
+    getTracker(path).close()
+    print('memory report written to '+path)
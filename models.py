@@ -19,6 +19,7 @@ methods for accessing and removing individual bricks.
 You are free to add new models to this module.  You may wish to do this when you add
 new features to your game.  If you are unsure about whether to make a new class or
 not, please ask on Piazza."""
+import math
 import random # To randomly generate the ball velocity
 from constants import *
 from game2d import *
@@ -30,13 +31,85 @@ from game2d import *
 # calls the method.
 
 
+class Brick(GRectangle):
+    """Instance is a single brick in the wall.
+
+    We extend GRectangle because a brick from a level file can take more than
+    one hit, or can be unbreakable.  A brick also remembers its cell in the
+    brick grid.
+
+    INSTANCE ATTRIBUTES:
+        _row   [int >= 0]: the row of this brick in the grid (0 is the top row)
+        _col   [int >= 0]: the column of this brick in the grid
+        _hits  [int >= 0]: the number of hits left before this brick breaks
+        _flags [int >= 0]: the brick flags, such as BRICK_UNBREAKABLE
+    """
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+
+    def getRow(self):
+        """Returns: the row of this brick in the grid"""
+        return self._row
+
+    def getCol(self):
+        """Returns: the column of this brick in the grid"""
+        return self._col
+
+    def getHits(self):
+        """Returns: the number of hits left before this brick breaks"""
+        return self._hits
+
+    def setHits(self, hits):
+        """Sets the number of hits left before this brick breaks.
+
+            :param hits: the number of hits left
+            **Precondition**: an int >= 0"""
+        self._hits = hits
+
+    def isBreakable(self):
+        """Returns: True if this brick can be destroyed, False otherwise"""
+        return not (self._flags & BRICK_UNBREAKABLE)
+
+    def __init__(self, row, col, hits=1, flags=0, **keywords):
+        """Initialize a brick in grid cell (row, col).
+
+            :param row: the row of this brick
+            **Precondition**: an int >= 0
+
+            :param col: the column of this brick
+            **Precondition**: an int >= 0
+
+            :param hits: the number of hits to destroy this brick
+            **Precondition**: an int > 0
+
+            :param flags: the brick flags
+            **Precondition**: an int >= 0
+
+        The remaining keywords are the same as for GRectangle."""
+        GRectangle.__init__(self, **keywords)
+        self._row = row
+        self._col = col
+        self._hits = hits
+        self._flags = flags
+
+    def hit(self):
+        """Returns: True if this hit destroyed the brick, False otherwise.
+
+        Takes away a hit point, unless the brick is unbreakable."""
+        if not self.isBreakable():
+            return False
+
+        self._hits -= 1
+        return self._hits <= 0
+
+
 class BrickWall(object):
     """An instance represents the layer of bricks in the game.  When the wall is
     empty, the game is over and the player has won. This model class keeps track of
     all of the bricks in the game, allowing them to be added or removed.
 
     INSTANCE ATTRIBUTES:
-        _bricks [list of GRectangle, can be empty]:
+        _bricks [list of Brick, can be empty]:
             This is the list of currently active bricks in the game.  When a brick
             is destroyed, it is removed from the list.
 
@@ -48,12 +121,31 @@ class BrickWall(object):
 
     We highly recommend a getter called getBrickAt(x,y).  This method returns the first
     brick it finds for which the point (x,y) is INSIDE the brick.  This is useful for
-    collision detection (e.g. it is a helper for _getCollidingObject).
+    collision detection (e.g. it is a helper for _getContact).
 
     You will probably want a draw method too.  Otherwise, you need getters in Gameplay
     to draw the individual bricks.
 
     LIST MORE ATTRIBUTES (AND THEIR INVARIANTS) HERE IF NECESSARY
+        _breakable [int >= 0]:
+            The number of bricks in _bricks that can be destroyed.  The
+            player has won when this reaches 0.
+        _version [int >= 0]:
+            The number of bricks removed so far.  Caches that depend on the
+            bricks (such as a TrajectoryPredictor) compare it to see if
+            the wall has changed.
+        _all [list of Brick]:
+            Every brick that was laid out, removed or not, in layout order.
+        _index [dict of Brick to int]:
+            The position of each brick in _all.
+        _bits [bytearray]:
+            A bitset of the bricks in _bricks.  Bit i is set if _all[i] is
+            still in the wall.
+        _multi [list of int]:
+            The positions in _all of the bricks that take more than one hit.
+            Only these bricks need their hits saved in a snapshot.
+        _config [GameConfig]:
+            The game settings used to lay out the bricks.
     """
 
     # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
@@ -61,52 +153,212 @@ class BrickWall(object):
     def getBricks(self):
         return self._bricks
 
+    def getVersion(self):
+        """Returns: a number that changes whenever a brick is removed"""
+        return self._version
+
+    def getDestroyed(self):
+        """Returns: the number of bricks removed so far in this game"""
+        return len(self._all) - len(self._bricks)
+
     def removeBrick(self, brick):
         """Removes the given brick from the list."""
 
         self._bricks.remove(brick)
+        self._version += 1
+        if brick.isBreakable():
+            self._breakable -= 1
+
+        index = self._index[brick]
+        self._bits[index >> 3] &= ~(1 << (index & 7))
 
-    def __init__(self):
+    def __init__(self, level=None, config=None):
         """Initialize the game state. This initializer lays out bricks
         on the screen. The list of bricks is held in a list. Constants
         are used to set the number of brick rows, the bricks in a row,
         brick separations and widths and heights, and brick colors.
 
-        After creating each brick, the brick is added to a list."""
+        If level is not None, the bricks come from that level instead.
+        The number of bricks in a row, the brick colors and the brick hit
+        points are all taken from the level.  Only the separations and
+        heights still come from the constants.
+
+        After creating each brick, the brick is added to a list.
+
+            :param level: the level to lay out
+            **Precondition**: a levels.LevelFile, or None
+
+            :param config: the game settings
+            **Precondition**: a GameConfig, or None for DEFAULT_CONFIG"""
 
         # Create the list of bricks
 
+        self._config = DEFAULT_CONFIG if config is None else config
         self._bricks = []
+        self._breakable = 0
+        self._version = 0
+
+        if level is not None:
+            self._layoutLevel(level)
+        else:
+            self._layoutDefault()
+
+        self._all = list(self._bricks)
+        self._index = dict((brick, i) for i, brick in enumerate(self._all))
+        self._bits = bytearray(b'\xff'*(len(self._all) >> 3))
+        if len(self._all) & 7:
+            self._bits.append((1 << (len(self._all) & 7)) - 1)
+        self._multi = [i for i, brick in enumerate(self._all) if brick.getHits() > 1]
+
+    def _layoutDefault(self):
+        """Lays out the bricks given by the game settings."""
+
+        config = self._config
 
         # Create all rows of bricks
         row_number = 0
-        for row in range(BRICK_ROWS):
-            color = ROW_COLORS[row]
+        for row in range(config.BRICK_ROWS):
+            color = config.getRowColor(row)
 
             # Create a row of BRICKS_IN_ROW bricks
-            for i in range(BRICKS_IN_ROW):
+            for i in range(config.BRICKS_IN_ROW):
 
-                x_pos = BRICK_SEP_H/2 + i*(BRICK_SEP_H + BRICK_WIDTH)
-                y_pos = GAME_HEIGHT - BRICK_Y_OFFSET \
-                        - row_number * (BRICK_HEIGHT + BRICK_SEP_V)
+                x_pos = config.BRICK_SEP_H//2 + i*(config.BRICK_SEP_H + config.BRICK_WIDTH)
+                y_pos = config.GAME_HEIGHT - config.BRICK_Y_OFFSET \
+                        - row_number * (config.BRICK_HEIGHT + config.BRICK_SEP_V)
 
-                brick = GRectangle(
+                brick = Brick(
+                            row = row,
+                            col = i,
                             x = x_pos,
                             y = y_pos,
-                            width = BRICK_WIDTH,
-                            height = BRICK_HEIGHT,
+                            width = config.BRICK_WIDTH,
+                            height = config.BRICK_HEIGHT,
                             fillcolor = color,
                             linecolor = color
                         )
 
                 # Add this brick to the list of bricks
                 self._bricks.append( brick )
+                self._breakable += 1
 
             # Increment row number
             row_number += 1
 
+    def _layoutLevel(self, level):
+        """Lays out the bricks of a level file.
+
+        The brick positions are computed for all records at once from the
+        memory mapped record array.  The colors are converted once per
+        palette entry, not once per brick.
+
+            :param level: the level to lay out
+            **Precondition**: a levels.LevelFile"""
+        config = self._config
+        records = level.getRecords()
+        width = config.GAME_WIDTH // level.getColumns() - config.BRICK_SEP_H
+        colors = [level.getColor(i) for i in range(len(level.getPalette()))]
+
+        x_pos = config.BRICK_SEP_H//2 + records['col'].astype(float)*(config.BRICK_SEP_H + width)
+        y_pos = config.GAME_HEIGHT - config.BRICK_Y_OFFSET \
+                - records['row'].astype(float)*(config.BRICK_HEIGHT + config.BRICK_SEP_V)
+
+        for x, y, row, col, color, hits, flags in zip(
+                x_pos.tolist(), y_pos.tolist(), records['row'].tolist(),
+                records['col'].tolist(), records['color'].tolist(),
+                records['hits'].tolist(), records['flags'].tolist()):
+            brick = Brick(
+                        row = row,
+                        col = col,
+                        hits = max(1, hits),
+                        flags = flags,
+                        x = x,
+                        y = y,
+                        width = width,
+                        height = config.BRICK_HEIGHT,
+                        fillcolor = colors[color],
+                        linecolor = colors[color]
+                    )
+            self._bricks.append( brick )
+            if brick.isBreakable():
+                self._breakable += 1
+
     # ADD MORE METHODS (PROPERLY SPECIFIED) AS NECESSARY
 
+    def hitBrick(self, brick):
+        """Returns: True if the brick was destroyed by this hit, False otherwise.
+
+        Takes a hit point away from the brick. If that was its last hit
+        point, the brick is removed from the list. Unbreakable bricks are
+        never removed."""
+
+        if brick.hit():
+            self.removeBrick(brick)
+            return True
+        return False
+
+    def isCleared(self):
+        """Returns: True if there are no breakable bricks left and False
+        otherwise."""
+
+        return self._breakable == 0
+
+    def getSnapshotSize(self):
+        """Returns: the number of bytes in a snapshot of this wall"""
+        return len(self._bits)+len(self._multi)
+
+    def snapshot(self):
+        """Returns: the remaining bricks as a byte string
+
+        The result is a bitset with one bit per brick that was laid out,
+        followed by one byte with the hits left for each brick that takes
+        more than one hit.  Its size is the same for the whole game."""
+        data = bytearray(self.getSnapshotSize())
+        self.snapshotInto(data)
+        return bytes(data)
+
+    def snapshotInto(self, buffer, offset=0):
+        """Writes the snapshot of this wall into a buffer.
+
+        This is the same as snapshot, except that no new string is made.
+
+            :param buffer: the buffer to write to
+            **Precondition**: a bytearray with getSnapshotSize() bytes after offset
+
+            :param offset: the position in buffer to write to
+            **Precondition**: an int >= 0"""
+        size = len(self._bits)
+        buffer[offset:offset+size] = self._bits
+        for pos, i in enumerate(self._multi):
+            buffer[offset+size+pos] = min(self._all[i].getHits(), 255)
+
+    def restore(self, data, offset=0):
+        """Restores the bricks saved by snapshot.
+
+        The bricks are not created again.  The bricks in the snapshot are put
+        back in the wall, and the others are taken out.
+
+            :param data: a snapshot of this wall
+            **Precondition**: a byte string or bytearray from snapshot or snapshotInto
+
+            :param offset: the position of the snapshot in data
+            **Precondition**: an int >= 0"""
+        if not isinstance(data, bytearray):
+            data = bytearray(data)
+        size = len(self._bits)
+        for pos, i in enumerate(self._multi):
+            self._all[i].setHits(data[offset+size+pos])
+
+        bits = data[offset:offset+size]
+        if bits == self._bits:
+            return
+
+        self._bits[:] = bits
+        self._bricks = [brick for i, brick in enumerate(self._all)
+                        if bits[i >> 3] & (1 << (i & 7))]
+        self._breakable = len([brick for brick in self._bricks if brick.isBreakable()])
+        self._version += 1
+
     def draw(self, view):
         """Draw this shape in the provide view.
 
@@ -147,30 +399,79 @@ class Ball(GEllipse):
     header up above.
 
     LIST MORE ATTRIBUTES (AND THEIR INVARIANTS) HERE IF NECESSARY
+        _config [GameConfig]: the game settings (the size of the ball, the
+                walls it bounces off and how far the paddle steers it)
     """
 
     # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
 
-    def __init__(self):
+    def getVX(self):
+        """Returns: the velocity of the ball in the x direction"""
+        return self._vx
+
+    def getVY(self):
+        """Returns: the velocity of the ball in the y direction"""
+        return self._vy
+
+    def setVelocity(self, vx, vy):
+        """Sets the velocity of the ball.
+
+            :param vx: the velocity in the x direction
+            **Precondition**: a number
+
+            :param vy: the velocity in the y direction
+            **Precondition**: a number"""
+        self._vx = vx
+        self._vy = vy
+
+    def __init__(self, vx=None, vy=None, config=None):
         """Initialize the ball. The ball starts in the center and moves
         at random velocity in the left or right direction. It moves at a
-        random velocity downwards."""
+        random velocity downwards.
+
+        If vx and vy are given, the ball moves at that velocity instead, and
+        no random numbers are used.  The size of the ball and the walls
+        come from config (a GameConfig), or DEFAULT_CONFIG if it is None."""
+        self._config = DEFAULT_CONFIG if config is None else config
         GEllipse.__init__(self,
                           x = 0,
                           y = 0,
-                          width = 10,
-                          height = 10,
+                          width = self._config.BALL_SIZE,
+                          height = self._config.BALL_SIZE,
                           fillcolor = colormodel.BLACK,
                           linecolor = colormodel.BLACK
                           )
+        self.serve(vx, vy)
 
-        # Ball starts in the center
-        self.center_x = GAME_WIDTH / 2
-        self.center_y = GAME_HEIGHT / 2
+    def serve(self, vx=None, vy=None):
+        """Puts the ball back in the center with a new velocity, exactly as
+        if it were newly created.
 
-        # Ball moves at random velocity left or right
+        This reuses the drawing instructions of the ball, so that a GPool of
+        balls can serve without creating any objects.
+
+            :param vx: the velocity in the x direction
+            **Precondition**: a number, or None for a random velocity
+
+            :param vy: the velocity in the y direction
+            **Precondition**: a number, or None for a random velocity"""
+
+        # Ball starts in the center, and is drawn there at once (see GObject.tick)
+        self.center_x = self._config.GAME_WIDTH // 2
+        self.center_y = self._config.GAME_HEIGHT // 2
+        self.tick()
+
+        if vx is not None and vy is not None:
+            self._vx = vx
+            self._vy = vy
+            return
+
+        # Ball moves at random velocity left or right.  The side is picked
+        # from one random() call (as random.choice did in Python 2, but not in
+        # Python 3), so a seed serves the same ball in either version.
         self._vx = random.uniform(1.0,5.0)
-        self._vx = self._vx * random.choice([-1, 1])
+        if random.random() < 0.5:
+            self._vx = -self._vx
 
         # Ball always heads downward
         self._vy = random.uniform(1.0,5.0)
@@ -179,17 +480,89 @@ class Ball(GEllipse):
 
     # METHODS TO MOVE AND/OR BOUNCE THE BALL
 
-    def handleBrickCollision(self):
-        """This method reverses the ball's y velocity when it collides
-        with a brick."""
-        self._vy = -1.0 * self._vy
-
-    def handlePaddleCollision(self):
-        """This method reverses the ball's y velocity when it collides
-        with the paddle, only if the ball is traveling downwards."""
-
-        if self._vy < 0.0:
-            self._vy = -1.0 * self._vy
+    def getContact(self, rect):
+        """Returns: the tuple (nx, ny, depth) if the ball touches rect, or None
+
+        The ball is a circle and rect is a box, so there is one test however
+        the ball meets it: face, edge or corner.  (nx, ny) is the unit normal
+        of the contact, pointing from rect to the center of the ball, and depth
+        is how far the ball has sunk into rect along that normal.
+
+            :param rect: the paddle or a brick
+            **Precondition**: a GRectangle"""
+        radius = self.width / 2.0
+        cx = self.center_x
+        cy = self.center_y
+
+        # The closest point of the box to the center of the ball
+        px = min(max(cx, rect.left), rect.right)
+        py = min(max(cy, rect.bottom), rect.top)
+        dx = cx - px
+        dy = cy - py
+        distance = dx*dx + dy*dy
+        if distance > radius*radius:
+            return None
+        if distance > 0.0:
+            distance = math.sqrt(distance)
+            return (dx/distance, dy/distance, radius-distance)
+
+        # The center is inside the box, so leave by the nearest side
+        sides = [(cx-rect.left, -1.0, 0.0), (rect.right-cx, 1.0, 0.0),
+                 (cy-rect.bottom, 0.0, -1.0), (rect.top-cy, 0.0, 1.0)]
+        inside, nx, ny = min(sides)
+        return (nx, ny, radius+inside)
+
+    def handleBrickCollision(self, nx, ny, depth):
+        """This method bounces the ball off a brick.
+
+        The velocity is reflected about the normal of the contact, so a hit on
+        the top or bottom of a brick reverses vy and a hit on a side reverses
+        vx.  The ball is pushed out of the brick, so that it cannot hit the
+        same brick again on the next frame.  A ball already moving away from
+        the brick keeps its velocity.
+
+            :param nx: the x part of the contact normal (see getContact)
+            **Precondition**: a number, with nx*nx+ny*ny == 1
+
+            :param ny: the y part of the contact normal
+            **Precondition**: a number, with nx*nx+ny*ny == 1
+
+            :param depth: how far the ball has sunk into the brick
+            **Precondition**: a number >= 0"""
+        self.x += nx * depth
+        self.y += ny * depth
+        dot = self._vx*nx + self._vy*ny
+        if dot < 0.0:
+            self._vx = self._vx - 2.0*dot*nx
+            self._vy = self._vy - 2.0*dot*ny
+
+    def handlePaddleCollision(self, paddle):
+        """This method bounces the ball up off the paddle, only if the ball
+        is traveling downwards.
+
+        The point where the ball meets the paddle steers it: the center of
+        the paddle sends it straight up, and the ends send it up to
+        PADDLE_MAX_ANGLE degrees (a setting of the game) to that side.  The
+        speed of the ball does not change.  A ball that hits the side of the
+        paddle bounces off it like a brick.
+
+            :param paddle: the paddle
+            **Precondition**: a GRectangle"""
+        contact = self.getContact(paddle)
+        if contact is None:
+            return
+        nx, ny, depth = contact
+        if ny <= 0.0 or self._vy >= 0.0:
+            self.handleBrickCollision(nx, ny, depth)
+            return
+
+        self.y += ny * depth
+        offset = (self.center_x-paddle.center_x) / (paddle.width/2.0)
+        offset = min(max(offset, -1.0), 1.0)
+        angle = math.radians(self._config.PADDLE_MAX_ANGLE) * offset
+        speed = math.hypot(self._vx, self._vy)
+        self._vx = speed * math.sin(angle)
+        self._vy = speed * math.cos(angle)
 
     def handleWallCollision(self):
         """Returns: True if ball collided with bottom wall and false
@@ -207,11 +580,11 @@ class Ball(GEllipse):
             self._vx = -1.0 * self._vx
 
         # If collide with right wall, reverse vx
-        elif self.right > GAME_WIDTH:
+        elif self.right > self._config.GAME_WIDTH:
             self._vx = -1.0 * self._vx
 
         # If collide with top wall, reverse vy
-        elif self.top > GAME_HEIGHT:
+        elif self.top > self._config.GAME_HEIGHT:
             self._vy = -1.0 * self._vy
 
         # If collide with bottom wall while moving down, return
@@ -0,0 +1,304 @@
+# particles.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Particle module for Breakout
+
+This module draws the debris of destroyed bricks.  A brick breaks into small
+squares in its own color, which fly apart, fall, and fade out.
+
+There can be tens of thousands of particles, so they are not GObjects.  The
+state of every particle is a row of one NumPy array, and all of the particles
+are moved in a single vectorized step.  They are drawn as one Kivy Mesh of
+quads, whose vertices are written in place into a preallocated array.
+
+The default Kivy shader has no vertex colors, so the color of a particle comes
+from a small palette texture instead.  The texture has one column per color and
+one row per fade level, and every corner of a quad samples the same texel.
+
+Dead particles are removed by compacting the live ones to the front of the
+array with numpy.compress.  The result goes into a second array of the same
+size, and the two arrays are swapped, so nothing is allocated after the system
+is created.
+
+The particles are only for show.  They have their own random numbers (so they
+do not change the game for a given seed), and they are not part of a snapshot."""
+import numpy
+from kivy.graphics import Color, Mesh, InstructionGroup
+from kivy.graphics.texture import Texture
+from constants import *
+
+
+#: the side of a particle in pixels
+PARTICLE_SIZE = 3
+#: the downward acceleration of a particle, in pixels per frame per frame
+GRAVITY = 0.15
+#: the number of colors in the palette texture
+MAX_COLORS = 64
+#: the number of fade levels (rows) in the palette texture
+FADE_LEVELS = 8
+
+# The columns of the state array
+_X, _Y, _VX, _VY, _LIFE, _SPAN, _U = range(7)
+_COLUMNS = 7
+
+# The offsets of the four corners of a quad, and its two triangles
+_CORNER_X = numpy.array([0, PARTICLE_SIZE, PARTICLE_SIZE, 0], dtype=numpy.float32)
+_CORNER_Y = numpy.array([0, 0, PARTICLE_SIZE, PARTICLE_SIZE], dtype=numpy.float32)
+_QUAD = numpy.array([0, 1, 2, 2, 3, 0], dtype=numpy.uint16)
+
+
+class ParticleSystem(object):
+    """An instance is a set of particles that are moved and drawn together.
+
+    The live particles are the rows 0.._count-1 of _state.
+
+    INSTANCE ATTRIBUTES:
+        _capacity [int > 0]:  the number of rows in the arrays
+        _limit    [int in 0.._capacity]: the most particles alive at once
+        _burst    [int >= 0]: the number of particles spawned for a brick
+        _count    [int >= 0]: the number of live particles
+        _state    [float32 array (capacity, 7)]: the x, y, vx, vy, frames left,
+                  lifetime in frames, and palette texture column (u) of each particle
+        _spare    [float32 array (capacity, 7)]: the array to compact _state into
+        _alive    [bool array (capacity,)]: scratch flags for the live particles
+        _vertices [float32 array (capacity, 4, 4)]: the x, y, u, v of the
+                  corners of each quad
+        _indices  [uint16 array (capacity*6,)]: the two triangles of each quad
+        _colors   [list of tuples]: the RGBA color of each palette column
+        _random   [numpy.random.RandomState]: the source of velocities and lifetimes
+        _dropped  [int >= 0]: the number of particles not spawned because the
+                  system was full
+        _dirty    [bool]: True if the palette changed since it was last painted
+        _texture  [Texture, or None before the first draw]: the palette texture
+        _mesh     [Mesh, or None before the first draw]: the quads
+        _group    [InstructionGroup, or None before the first draw]: the
+                  instructions given to the view every frame
+        _drawn    [int >= 0]: the number of quads in the mesh indices
+    """
+
+    # GETTERS AND SETTERS
+
+    def getCount(self):
+        """Returns: the number of live particles"""
+        return self._count
+
+    def getCapacity(self):
+        """Returns: the number of particles the arrays can hold"""
+        return self._capacity
+
+    def getDropped(self):
+        """Returns: the number of particles not spawned because the system was full"""
+        return self._dropped
+
+    def getBurst(self):
+        """Returns: the number of particles spawned for a brick"""
+        return self._burst
+
+    def setBurst(self, burst):
+        """Sets the number of particles spawned for a brick.
+
+            :param burst: the number of particles spawned for a brick
+            **Precondition**: an int >= 0"""
+        assert type(burst) == int and burst >= 0, repr(burst)+' is not a valid burst'
+        self._burst = burst
+
+    def getLimit(self):
+        """Returns: the most particles alive at once, which is at most the capacity"""
+        return self._limit
+
+    def setLimit(self, limit):
+        """Sets the most particles alive at once.
+
+        The arrays keep their capacity, so the limit can be raised again later.
+        If there are more live particles than the new limit, the extra ones are
+        removed at once.
+
+            :param limit: the most particles alive at once
+            **Precondition**: an int in 0..capacity"""
+        assert type(limit) == int and 0 <= limit <= self._capacity, \
+            repr(limit)+' is not a valid limit'
+        self._limit = limit
+        self._count = min(self._count, limit)
+
+    def __init__(self, capacity=DEBRIS_CAPACITY, burst=DEBRIS_PER_BRICK, seed=None):
+        """Initialize an empty particle system.
+
+        All of the arrays are allocated here.  The Kivy instructions are made
+        on the first draw, so a system that is never drawn needs no window.
+
+            :param capacity: the most particles alive at once
+            **Precondition**: an int in 1..16384 (the vertices of the mesh are
+            numbered with unsigned shorts)
+
+            :param burst: the number of particles spawned for a brick
+            **Precondition**: an int >= 0
+
+            :param seed: the seed for the particle velocities and lifetimes
+            **Precondition**: an int, or None for a random seed"""
+        assert 0 < capacity <= 16384, repr(capacity)+' is not a valid capacity'
+        self._capacity = capacity
+        self._limit = capacity
+        self._burst = burst
+        self._count = 0
+        self._state = numpy.zeros((capacity, _COLUMNS), dtype=numpy.float32)
+        self._spare = numpy.zeros((capacity, _COLUMNS), dtype=numpy.float32)
+        self._alive = numpy.zeros(capacity, dtype=bool)
+        self._vertices = numpy.zeros((capacity, 4, 4), dtype=numpy.float32)
+        self._indices = (numpy.arange(capacity, dtype=numpy.uint16)[:, None]*4 +
+                         _QUAD).reshape(-1)
+        self._colors = []
+        self._random = numpy.random.RandomState(seed)
+        self._dropped = 0
+
+        self._dirty = True
+        self._texture = None
+        self._mesh = None
+        self._group = None
+        self._drawn = -1
+
+    def spawn(self, x, y, width, height, color, count=None):
+        """Spawns particles all over a rectangle, such as a destroyed brick.
+
+        The particles start in random places in the rectangle, and fly up
+        and to the sides.  If the system is full, the extra particles are
+        dropped and counted.
+
+            :param x: the left edge of the rectangle
+            **Precondition**: a number
+
+            :param y: the bottom edge of the rectangle
+            **Precondition**: a number
+
+            :param width: the width of the rectangle
+            **Precondition**: a number >= 0
+
+            :param height: the height of the rectangle
+            **Precondition**: a number >= 0
+
+            :param color: the color of the particles
+            **Precondition**: a 4-element list of floats between 0 and 1
+
+            :param count: the number of particles
+            **Precondition**: an int >= 0, or None for the burst of the system"""
+        count = self._burst if count is None else count
+        room = min(count, self._limit-self._count)
+        self._dropped += count-room
+        if room <= 0:
+            return
+
+        rand = self._random
+        rows = self._state[self._count:self._count+room]
+        rows[:, _X] = rand.uniform(x, x+width, room)
+        rows[:, _Y] = rand.uniform(y, y+height, room)
+        rows[:, _VX] = rand.uniform(-2.0, 2.0, room)
+        rows[:, _VY] = rand.uniform(-0.5, 3.0, room)
+        rows[:, _SPAN] = rand.randint(20, 50, room)
+        rows[:, _LIFE] = rows[:, _SPAN]
+        rows[:, _U] = (self._column(color)+0.5)/MAX_COLORS
+        self._count += room
+
+    def update(self):
+        """Moves every particle by one frame, and removes the dead ones.
+
+        A particle dies when its lifetime is over or it falls off the bottom
+        of the screen."""
+        n = self._count
+        if n == 0:
+            return
+
+        state = self._state[:n]
+        state[:, _X:_Y+1] += state[:, _VX:_VY+1]
+        state[:, _VY] -= GRAVITY
+        state[:, _LIFE] -= 1.0
+
+        alive = self._alive[:n]
+        numpy.greater(state[:, _LIFE], 0.0, out=alive)
+        alive &= state[:, _Y] > -PARTICLE_SIZE
+        live = int(numpy.count_nonzero(alive))
+        if live < n:
+            numpy.compress(alive, state, axis=0, out=self._spare[:live])
+            self._state, self._spare = self._spare, self._state
+        self._count = live
+
+    def clear(self):
+        """Removes every particle."""
+        self._count = 0
+
+    def draw(self, view):
+        """Draws the particles in the view, on top of every shape.
+
+        The vertices of the live particles are written into the vertex array
+        in place, and the mesh is given slices of the arrays.  The mesh is
+        added to the view every frame, as the particles move every frame.
+
+            :param view: view to draw to
+            **Precondition**: an *instance of* `GView`"""
+        n = self._count
+        if n == 0:
+            return
+        if self._group is None:
+            self._build()
+        if self._dirty:
+            self._paint()
+
+        state = self._state[:n]
+        vertices = self._vertices[:n]
+        numpy.add(state[:, _X, None], _CORNER_X, out=vertices[:, :, 0])
+        numpy.add(state[:, _Y, None], _CORNER_Y, out=vertices[:, :, 1])
+        vertices[:, :, 2] = state[:, _U, None]
+
+        # Sample the middle of the fade level row, from faint (0) to solid (1)
+        fade = vertices[:, :, 3]
+        numpy.divide(state[:, _LIFE, None], state[:, _SPAN, None], out=fade)
+        fade *= FADE_LEVELS-1
+        numpy.floor(fade, out=fade)
+        fade += 0.5
+        fade /= FADE_LEVELS
+
+        self._mesh.vertices = self._vertices.reshape(-1)[:n*16]
+        if self._drawn != n:
+            self._mesh.indices = self._indices[:n*6]
+            self._drawn = n
+        view.draw(self._group)
+
+    # HELPER METHODS
+
+    def _column(self, color):
+        """Returns: the palette column of a color, adding it if necessary
+
+        If the palette is full, this is the column of the closest color."""
+        color = tuple(color)
+        if color in self._colors:
+            return self._colors.index(color)
+        if len(self._colors) < MAX_COLORS:
+            self._colors.append(color)
+            self._dirty = True
+            return len(self._colors)-1
+
+        distance = ((numpy.array(self._colors)-color)**2).sum(axis=1)
+        return int(numpy.argmin(distance))
+
+    def _build(self):
+        """Makes the palette texture, the mesh and the instruction group."""
+        self._texture = Texture.create(size=(MAX_COLORS, FADE_LEVELS), colorfmt='rgba')
+        self._texture.mag_filter = 'nearest'
+        self._texture.min_filter = 'nearest'
+        self._mesh = Mesh(vertices=[], indices=[], mode='triangles',
+                          texture=self._texture)
+        self._group = InstructionGroup()
+        self._group.add(Color(1, 1, 1, 1))
+        self._group.add(self._mesh)
+        self._drawn = -1
+
+    def _paint(self):
+        """Copies the palette into the texture.
+
+        Row r of the texture has the palette colors with (r+1)/FADE_LEVELS of
+        their opacity."""
+        texels = numpy.zeros((FADE_LEVELS, MAX_COLORS, 4))
+        if self._colors:
+            texels[:, :len(self._colors)] = self._colors
+        texels[:, :, 3] *= (numpy.arange(FADE_LEVELS)+1.0)[:, None]/FADE_LEVELS
+        data = numpy.round(texels*255).astype(numpy.uint8)
+        self._texture.blit_buffer(data.tobytes(), colorfmt='rgba', bufferfmt='ubyte')
+        self._dirty = False
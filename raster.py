@@ -0,0 +1,522 @@
+# raster.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Software rasterizer module for Breakout
+
+This module draws GObjects into a NumPy frame buffer instead of a Kivy canvas,
+so that frames can be produced without a display or a GPU.  The frame buffer
+is a uint8 array of shape (height, width, 3), at the size of the game or scaled
+down.  It feeds observation pipelines, thumbnails and visual regression checks.
+
+A FrameBuffer can be used in place of a GView.  To render a game, do
+
+    frame = FrameBuffer(GAME_WIDTH, GAME_HEIGHT, scale=0.5)
+    game.draw(frame)
+    frame.flush()
+    pixels = frame.getPixels()
+
+The buffer is reused between frames.  Just like GView, the frame buffer only
+repaints the regions that changed: where a shape appeared, disappeared, moved,
+resized, or changed color.  Everything else keeps the pixels of the last frame.
+
+Raw Kivy instructions cannot be rasterized, and are ignored.  The one exception
+is the text of the HUD (see hud.py): a GlyphText is painted from the pixels of
+its glyph atlas, just as the GPU draws it from the atlas texture.
+
+All fills are vectorized over the pixels of a region.  A pixel is covered by a
+shape if the center of the pixel is inside the shape.
+
+To check that every image in the Images folder is drawn upright and in place,
+compared with the pixels of the file, run
+
+    python raster.py"""
+import math
+import os
+import sys
+import numpy
+import pygame
+from game2d import *
+from hud import GlyphText
+
+
+class FrameBuffer(object):
+    """An instance is a reusable frame buffer that GObjects can be drawn to.
+
+    INSTANCE ATTRIBUTES:
+        _width   [int > 0]:   the buffer width in pixels
+        _height  [int > 0]:   the buffer height in pixels
+        _scale   [float > 0]: the number of pixels per game unit
+        _back    [uint8 array (3,)]: the background color
+        _pixels  [uint8 array (height,width,3)]: the pixels, with row 0 at the
+                 bottom (game coordinates have y going up)
+        _frame   [list of GObject]: the shapes drawn in the current frame
+        _last    [dict]: maps id(shape) to (shape, signature, bounds) for the
+                 shapes drawn in the last frame
+        _repainted [float in 0..1]: the fraction of the buffer repainted in
+                 the last frame
+        _images  [dict]: maps image file names to (rgb, alpha) arrays
+        _fonts   [dict]: maps (font name, size) to pygame fonts
+    """
+
+    # GETTERS AND SETTERS
+
+    def getPixels(self):
+        """Returns: the pixels as a uint8 array of shape (height, width, 3)
+
+        The first row is the top of the game, as in an image file.  This is a
+        view of the buffer, so it changes when the next frame is flushed."""
+        return self._pixels[::-1]
+
+    def getRepainted(self):
+        """Returns: the fraction of the buffer repainted in the last frame"""
+        return self._repainted
+
+    def __init__(self, width, height, scale=1.0, background=(255,255,255)):
+        """Initialize a frame buffer for a game of the given size.
+
+            :param width: the game width
+            **Precondition**: a number > 0
+
+            :param height: the game height
+            **Precondition**: a number > 0
+
+            :param scale: the number of pixels per game unit (1 for native size)
+            **Precondition**: a number > 0
+
+            :param background: the background color
+            **Precondition**: a tuple of three ints in 0..255"""
+        self._scale  = float(scale)
+        self._width  = int(math.ceil(width*self._scale))
+        self._height = int(math.ceil(height*self._scale))
+        self._back   = numpy.array(background, dtype=numpy.uint8)
+        self._pixels = numpy.empty((self._height, self._width, 3), dtype=numpy.uint8)
+        self._pixels[:] = self._back
+        self._frame  = []
+        self._last   = {}
+        self._repainted = 0.0
+        self._images = {}
+        self._fonts  = {}
+
+    def draw(self, cmd):
+        """Ignores a raw Kivy drawing instruction, which cannot be rasterized."""
+        pass
+
+    def drawObject(self, shape):
+        """Adds a shape to the current frame.
+
+        This is the same method that GObject.draw calls on a GView.
+
+            :param shape: the shape to draw
+            **Precondition**: a GObject"""
+        self._frame.append(shape)
+
+    def drawGlyphs(self, text):
+        """Adds a line of HUD text to the current frame.
+
+        This is the method that GlyphText.draw calls on a frame buffer.
+
+            :param text: the text to draw
+            **Precondition**: a GlyphText"""
+        self._frame.append(text)
+
+    def render(self, shapes):
+        """Draws the given shapes (in order) as a complete frame.
+
+            :param shapes: the shapes to draw
+            **Precondition**: a list of GObject"""
+        self._frame.extend(shapes)
+        self.flush()
+
+    def flush(self):
+        """Finishes the current frame, repainting the regions that changed."""
+        damage = []
+        current = {}
+        for shape in self._frame:
+            key = id(shape)
+            signature = _signature(shape)
+            bounds = _bounds(shape)
+            current[key] = (shape, signature, bounds)
+
+            old = self._last.get(key)
+            if old is None:
+                damage.append(bounds)
+            elif old[1] != signature:
+                damage.append(old[2])
+                damage.append(bounds)
+
+        for key in self._last:
+            if not key in current:
+                damage.append(self._last[key][2])
+
+        # Repaint each damaged region from the background up
+        area = 0
+        for box in _merge([self._pixelbox(box) for box in damage]):
+            x0, y0, x1, y1 = box
+            if x1 <= x0 or y1 <= y0:
+                continue
+            area += (x1-x0)*(y1-y0)
+            self._pixels[y0:y1,x0:x1] = self._back
+            for shape in self._frame:
+                if _overlaps(self._pixelbox(current[id(shape)][2]), box):
+                    self._paint(shape, box)
+
+        self._repainted = min(1.0, area/float(self._width*self._height))
+        self._last = current
+        self._frame = []
+
+    # HELPER METHODS
+
+    def _pixelbox(self, bounds):
+        """Returns: the game bounds (left,bottom,right,top) as a clipped pixel
+        box (x0,y0,x1,y1), where x1 and y1 are exclusive"""
+        s = self._scale
+        x0 = max(0, int(math.floor(bounds[0]*s)))
+        y0 = max(0, int(math.floor(bounds[1]*s)))
+        x1 = min(self._width,  int(math.ceil(bounds[2]*s)))
+        y1 = min(self._height, int(math.ceil(bounds[3]*s)))
+        return (x0, y0, x1, y1)
+
+    def _grid(self, box):
+        """Returns: the game coordinates (x,y) of the pixel centers in box
+
+        The results are arrays of shape (1,width) and (height,1), which
+        broadcast to the shape of the box."""
+        x0, y0, x1, y1 = box
+        xs = (numpy.arange(x0, x1) + 0.5)/self._scale
+        ys = (numpy.arange(y0, y1) + 0.5)/self._scale
+        return xs[numpy.newaxis,:], ys[:,numpy.newaxis]
+
+    def _fill(self, box, mask, color):
+        """Fills the pixels of box selected by mask with an RGBA color.
+
+            :param box: the pixel box to fill
+            **Precondition**: a tuple (x0,y0,x1,y1)
+
+            :param mask: the pixels to fill, or None for all of them
+            **Precondition**: a bool array of the box shape, or None
+
+            :param color: the color as floats in 0..1
+            **Precondition**: a 4-element sequence"""
+        alpha = color[3]
+        if alpha <= 0:
+            return
+        x0, y0, x1, y1 = box
+        region = self._pixels[y0:y1,x0:x1]
+        rgb = numpy.array(color[:3])*255.0
+        if mask is None:
+            if alpha >= 1:
+                region[:] = rgb
+            else:
+                region[:] = region*(1-alpha) + rgb*alpha
+        elif alpha >= 1:
+            region[mask] = rgb
+        else:
+            region[mask] = region[mask]*(1-alpha) + rgb*alpha
+
+    def _paint(self, shape, clip):
+        """Paints the part of a shape inside the pixel box clip."""
+        if isinstance(shape, GlyphText):
+            self._paintGlyphs(shape, clip)
+        elif isinstance(shape, GLabel):
+            self._paintRectangle(shape, clip, False)
+            self._paintText(shape, clip)
+        elif isinstance(shape, GImage):
+            self._paintImage(shape, clip)
+        elif isinstance(shape, GEllipse):
+            self._paintEllipse(shape, clip)
+        elif isinstance(shape, GRectangle):
+            self._paintRectangle(shape, clip, True)
+        elif isinstance(shape, GTriangle) or isinstance(shape, GPolygon):
+            self._paintPolygon(shape, clip)
+        elif isinstance(shape, GLine):
+            self._paintLine(shape, clip)
+
+    def _paintRectangle(self, shape, clip, border):
+        """Paints a rectangle (with a border if border is True)."""
+        if border:
+            box = _intersect(self._pixelbox(_bounds(shape)), clip)
+            self._fill(box, None, shape.linecolor)
+        box = _intersect(self._pixelbox((shape.left, shape.bottom, shape.right, shape.top)), clip)
+        self._fill(box, None, shape.fillcolor)
+
+    def _paintEllipse(self, shape, clip):
+        """Paints an ellipse with its border."""
+        for grow, color in ((LINE_SIZE, shape.linecolor), (0, shape.fillcolor)):
+            rx = shape.width/2.0 + grow
+            ry = shape.height/2.0 + grow
+            box = self._pixelbox((shape.center_x-rx, shape.center_y-ry,
+                                  shape.center_x+rx, shape.center_y+ry))
+            box = _intersect(box, clip)
+            if rx <= 0 or ry <= 0 or box[2] <= box[0] or box[3] <= box[1]:
+                continue
+            xs, ys = self._grid(box)
+            mask = ((xs-shape.center_x)/rx)**2 + ((ys-shape.center_y)/ry)**2 <= 1.0
+            self._fill(box, mask, color)
+
+    def _paintPolygon(self, shape, clip):
+        """Paints a triangle or a polygon (a triangle fan) with its border."""
+        box = _intersect(self._pixelbox(_bounds(shape)), clip)
+        if box[2] <= box[0] or box[3] <= box[1]:
+            return
+        xs, ys = self._grid(box)
+        points = shape.points
+        if isinstance(shape, GTriangle):
+            triangles = [points]
+        else:
+            # The fan is closed, just like the Mesh in GPolygon._cache
+            ring = points + points[0:2]
+            triangles = [shape.centroid+ring[i:i+4] for i in range(0, len(ring)-2, 2)]
+
+        mask = numpy.zeros((box[3]-box[1], box[2]-box[0]), dtype=bool)
+        for t in triangles:
+            mask |= _in_triangles(xs, ys, t)
+        self._fill(box, mask, shape.fillcolor)
+        self._paintLine(shape, clip)
+
+    def _paintLine(self, shape, clip):
+        """Paints the (closed) outline of a line shape."""
+        box = _intersect(self._pixelbox(_bounds(shape)), clip)
+        if box[2] <= box[0] or box[3] <= box[1]:
+            return
+        xs, ys = self._grid(box)
+        points = shape.points + shape.points[0:2]
+        mask = numpy.zeros((box[3]-box[1], box[2]-box[0]), dtype=bool)
+        half = max(LINE_SIZE/2.0, 0.5/self._scale)
+        for i in range(0, len(points)-2, 2):
+            mask |= _near_segment(xs, ys, points[i:i+4], half)
+        self._fill(box, mask, shape.linecolor)
+
+    def _paintImage(self, shape, clip):
+        """Paints an image, scaled to the size of the shape."""
+        if shape.source is None:
+            return
+        full = self._pixelbox((shape.left, shape.bottom, shape.right, shape.top))
+        box = _intersect(full, clip)
+        if box[2] <= box[0] or box[3] <= box[1]:
+            return
+
+        rgb, alpha = self._image(shape.source)
+
+        # Nearest neighbor sampling of the image over the box.  The rows of v
+        # are in image order (top row first), as _blend expects.
+        xs, ys = self._grid(box)
+        u = ((xs[0]-shape.left)/max(shape.width, 1e-9)*rgb.shape[1]).astype(int)
+        v = ((shape.top-ys[::-1,0])/max(shape.height, 1e-9)*rgb.shape[0]).astype(int)
+        u = numpy.clip(u, 0, rgb.shape[1]-1)
+        v = numpy.clip(v, 0, rgb.shape[0]-1)
+        self._blend(box, rgb[v][:,u], alpha[v][:,u])
+
+    def _paintText(self, shape, clip):
+        """Paints the text of a label in its line color."""
+        if not shape.text:
+            return
+        rgb, alpha = self._text(shape)
+        height, width = alpha.shape
+
+        # Place the text inside the label rectangle by the label alignment
+        s = self._scale
+        if shape.halign == 'left':
+            x = shape.left*s
+        elif shape.halign == 'center':
+            x = shape.center_x*s - width/2.0
+        else:
+            x = shape.right*s - width
+        if shape.valign == 'bottom':
+            y = shape.bottom*s
+        elif shape.valign == 'middle':
+            y = shape.center_y*s - height/2.0
+        else:
+            y = shape.top*s - height
+        x = int(round(x))
+        y = int(round(y))
+
+        box = _intersect((max(x,0), max(y,0), min(x+width,self._width),
+                          min(y+height,self._height)), clip)
+        if box[2] <= box[0] or box[3] <= box[1]:
+            return
+        rows = slice(y+height-box[3], y+height-box[1])
+        cols = slice(box[0]-x, box[2]-x)
+        self._blend(box, rgb[rows,cols], alpha[rows,cols])
+
+    def _paintGlyphs(self, text, clip):
+        """Paints the characters of a GlyphText from the pixels of its atlas."""
+        atlas = text.getAtlas()
+        pixels = atlas.getPixels()
+        height, width = pixels.shape[:2]
+        color = text.getColor()
+        rgb = numpy.array(color[:3])*255.0
+
+        for quad in text.getQuads():
+            (left, bottom, u0, v0), (right, top, u1, v1) = quad[0], quad[2]
+            box = _intersect(self._pixelbox((left, bottom, right, top)), clip)
+            if box[2] <= box[0] or box[3] <= box[1]:
+                continue
+
+            # Nearest neighbor sampling of the glyph.  The atlas rows are
+            # bottom row first, like the frame buffer.
+            xs, ys = self._grid(box)
+            u = ((u0 + (xs[0]-left)/(right-left)*(u1-u0))*width).astype(int)
+            v = ((v0 + (ys[:,0]-bottom)/(top-bottom)*(v1-v0))*height).astype(int)
+            u = numpy.clip(u, 0, width-1)
+            v = numpy.clip(v, 0, height-1)
+            a = pixels[v][:,u,3,numpy.newaxis]*(color[3]/255.0)
+
+            x0, y0, x1, y1 = box
+            region = self._pixels[y0:y1,x0:x1]
+            region[:] = region*(1-a) + rgb*a
+
+    def _blend(self, box, rgb, alpha):
+        """Blends an image onto the pixels of box.
+
+        The image arrays are in image order (first row on top)."""
+        x0, y0, x1, y1 = box
+        region = self._pixels[y0:y1,x0:x1]
+        a = alpha[::-1,:,numpy.newaxis]/255.0
+        region[:] = region*(1-a) + rgb[::-1]*a
+
+    def _image(self, source):
+        """Returns: the (rgb, alpha) arrays of an image file, loaded once."""
+        if not source in self._images:
+            surface = pygame.image.load(os.path.join(IMAGE_PATH, source))
+            rgb = pygame.surfarray.array3d(surface).transpose(1,0,2)
+            try:
+                alpha = pygame.surfarray.array_alpha(surface).T
+            except ValueError:
+                alpha = numpy.empty(rgb.shape[:2], dtype=numpy.uint8)
+                alpha[:] = 255
+            self._images[source] = (rgb, alpha)
+        return self._images[source]
+
+    def _text(self, shape):
+        """Returns: the (rgb, alpha) arrays of the text of a label."""
+        size = max(1, int(round(shape.font_size*self._scale)))
+        name = shape.font_name
+        key = (name, size)
+        if not key in self._fonts:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            path = os.path.join(FONT_PATH, name) if name and os.path.exists(
+                os.path.join(FONT_PATH, name)) else None
+            self._fonts[key] = pygame.font.Font(path, size)
+
+        color = [int(c*255) for c in shape.linecolor[:3]]
+        surface = self._fonts[key].render(shape.text, True, color)
+        rgb = pygame.surfarray.array3d(surface).transpose(1,0,2)
+        alpha = pygame.surfarray.array_alpha(surface).T
+        alpha = (alpha*shape.linecolor[3]).astype(numpy.uint8)
+        return rgb, alpha
+
+
+def checkImage(source):
+    """Returns: the mean error, per channel, of an image drawn at its native size
+
+    The image is drawn into a FrameBuffer with a black background, and the
+    pixels are compared with the pixels of the file, blended over black.  Any
+    error above rounding means that the image is drawn shifted or flipped.
+
+        :param source: the image file
+        **Precondition**: a string, the name of a file in the Images folder"""
+    import game2d # for the image loader of GImage
+    pixels = game2d._load_image(os.path.join(IMAGE_PATH, source))
+    height, width = pixels.shape[:2]
+
+    frame = FrameBuffer(width, height, background=(0,0,0))
+    frame.render([GImage(x=0, y=0, width=width, height=height, source=source)])
+    expected = pixels[:,:,:3]*(pixels[:,:,3:]/255.0)
+    return float(numpy.abs(frame.getPixels()-expected).mean())
+
+
+def _bounds(shape):
+    """Returns: the (left,bottom,right,top) of a shape, including its border"""
+    if isinstance(shape, GlyphText):
+        return shape.getBounds()
+    return (shape.left-LINE_SIZE, shape.bottom-LINE_SIZE,
+            shape.right+LINE_SIZE, shape.top+LINE_SIZE)
+
+
+def _signature(shape):
+    """Returns: a tuple that changes whenever the pixels of a shape change"""
+    if isinstance(shape, GlyphText):
+        return (GlyphText, shape.getText(), shape.getBounds(), tuple(shape.getColor()))
+    extra = None
+    if isinstance(shape, GLabel):
+        extra = (shape.text, shape.font_size, shape.font_name, shape.halign, shape.valign)
+    elif isinstance(shape, GImage):
+        extra = shape.source
+    elif isinstance(shape, GLine):
+        extra = shape.points
+    return (shape.__class__, shape.x, shape.y, shape.width, shape.height,
+            tuple(shape.fillcolor), tuple(shape.linecolor), extra)
+
+
+def _overlaps(a, b):
+    """Returns: True if the pixel boxes a and b overlap"""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _intersect(a, b):
+    """Returns: the intersection of the pixel boxes a and b (possibly empty)"""
+    return (max(a[0],b[0]), max(a[1],b[1]), min(a[2],b[2]), min(a[3],b[3]))
+
+
+def _merge(boxes):
+    """Returns: a list of pixel boxes covering boxes, where overlapping boxes
+    are merged so that no pixel is repainted twice"""
+    result = []
+    for box in boxes:
+        if box[2] <= box[0] or box[3] <= box[1]:
+            continue
+        merged = True
+        while merged:
+            merged = False
+            for other in result:
+                if _overlaps(box, other):
+                    result.remove(other)
+                    box = (min(box[0],other[0]), min(box[1],other[1]),
+                           max(box[2],other[2]), max(box[3],other[3]))
+                    merged = True
+                    break
+        result.append(box)
+    return result
+
+
+def _in_triangles(xs, ys, t):
+    """Returns: a bool array that is True for the points inside triangle t
+
+    Precondition: xs, ys are broadcastable arrays, t is a 6-element tuple."""
+    def edge(ax, ay, bx, by):
+        return (bx-ax)*(ys-ay) - (by-ay)*(xs-ax)
+    e0 = edge(t[0], t[1], t[2], t[3])
+    e1 = edge(t[2], t[3], t[4], t[5])
+    e2 = edge(t[4], t[5], t[0], t[1])
+    return ((e0 >= 0) & (e1 >= 0) & (e2 >= 0)) | ((e0 <= 0) & (e1 <= 0) & (e2 <= 0))
+
+
+def _near_segment(xs, ys, s, half):
+    """Returns: a bool array that is True for the points within half of the
+    segment s
+
+    Precondition: xs, ys are broadcastable arrays, s is a 4-element tuple."""
+    ax, ay, bx, by = s
+    dx = bx-ax
+    dy = by-ay
+    length = dx*dx + dy*dy
+    if length == 0:
+        t = 0.0
+    else:
+        t = numpy.clip(((xs-ax)*dx + (ys-ay)*dy)/length, 0.0, 1.0)
+    px = ax + t*dx - xs
+    py = ay + t*dy - ys
+    return px*px + py*py <= half*half
+
+
+# Application code
+if __name__ == '__main__':
+    # Checks that every image in the Images folder is drawn as it is stored
+    failed = 0
+    for source in sorted(os.listdir(IMAGE_PATH)):
+        error = checkImage(source)
+        print('%s: mean error %.2f' % (source, error))
+        if error > 1.0:
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,234 @@
+# replay.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Session recording module for Breakout
+
+This module records a session of the game, so that it can be played again
+exactly: for a bug report, or to export it as a video (see export.py).
+
+The game is deterministic apart from its inputs and the random serves.  So a
+recording is only the settings of the game, the seed of the random module and
+the mouse position of every simulation tick.  That is 17 bytes a tick, or about
+a megabyte for a quarter of an hour of play.
+
+A session file has a fixed header (MAGIC, the version, the seed, the tick rate
+and the length of the settings), the settings as JSON, and then one TICK record
+per tick.  The ticks are written as they are played, so a session that ends
+abruptly can still be played up to its last full tick.
+
+To record the sessions you play, start the game with the option --record file
+(see __main__.py).  To play a session again, give a ReplayPilot to
+Breakout.setPilot."""
+import atexit
+import json
+import random
+import struct
+import colormodel
+from constants import *
+from game2d import *
+
+
+#: the first bytes of a session file
+MAGIC = b'BRKS'
+#: the version of the session format
+VERSION = 1
+
+#: the header of a session file: magic, version, seed, tick rate, settings length
+HEADER = struct.Struct('<4sHIHI')
+#: the record of a tick: flags (1 if the mouse is pressed), then the mouse x and y
+TICK = struct.Struct('<B2d')
+
+
+class Recorder(object):
+    """An instance writes the inputs of a session to a file.
+
+    The file is written through a buffer, so recording a tick does not wait
+    for the disk.  The buffer is flushed when the recorder is closed, which
+    happens at exit if it is not closed earlier.
+
+    INSTANCE ATTRIBUTES:
+        _path  [str]: the file to write to
+        _seed  [int >= 0]: the seed of the random module for this session
+        _ticks [int >= 0]: the number of ticks recorded
+        _file  [file, or None if closed]: the open session file
+    """
+
+    # GETTERS AND SETTERS
+
+    def getSeed(self):
+        """Returns: the seed of the random module for this session"""
+        return self._seed
+
+    def getTicks(self):
+        """Returns: the number of ticks recorded"""
+        return self._ticks
+
+    def __init__(self, path, config, seed=None):
+        """Initialize a recorder and write the header of the session.
+
+        The caller must seed the random module with getSeed before the game
+        starts, or the serves cannot be played again.
+
+            :param path: the file to write to
+            **Precondition**: a string
+
+            :param config: the settings of the session
+            **Precondition**: a GameConfig
+
+            :param seed: the seed of the random module
+            **Precondition**: an int in 0..2**32-1, or None for a random seed"""
+        self._path = path
+        self._seed = random.SystemRandom().getrandbits(32) if seed is None else seed
+        self._ticks = 0
+
+        settings = json.dumps(_encode(config), sort_keys=True).encode('utf-8')
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, self._seed, TICK_RATE, len(settings)))
+        self._file.write(settings)
+        atexit.register(self.close)
+
+    def record(self, touch):
+        """Records the input of one tick.
+
+            :param touch: the mouse position for the tick
+            **Precondition**: a GPoint, or None if the mouse is not pressed"""
+        if self._file is None:
+            return
+        if touch is None:
+            self._file.write(TICK.pack(0, 0.0, 0.0))
+        else:
+            self._file.write(TICK.pack(1, touch.x, touch.y))
+        self._ticks += 1
+
+    def close(self):
+        """Writes the buffered ticks and closes the file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Session(object):
+    """An instance is a recorded session, read from a file.
+
+    INSTANCE ATTRIBUTES:
+        _config [GameConfig]: the settings of the session
+        _seed   [int >= 0]: the seed of the random module
+        _data   [bytes]: the TICK records
+        _ticks  [int >= 0]: the number of complete TICK records in _data
+    """
+
+    # GETTERS AND SETTERS
+
+    def getConfig(self):
+        """Returns: the settings of the session"""
+        return self._config
+
+    def getSeed(self):
+        """Returns: the seed of the random module for the session"""
+        return self._seed
+
+    def getTicks(self):
+        """Returns: the number of ticks in the session"""
+        return self._ticks
+
+    def getTouch(self, tick):
+        """Returns: the mouse position of a tick, or None if the mouse was not
+        pressed
+
+            :param tick: the tick
+            **Precondition**: an int in 0..getTicks()-1"""
+        assert 0 <= tick < self._ticks, repr(tick)+' is not a tick of the session'
+        flags, x, y = TICK.unpack_from(self._data, tick*TICK.size)
+        return GPoint(x, y) if flags & 1 else None
+
+    def __init__(self, path):
+        """Initialize a session from a file written by a Recorder.
+
+        A partial record at the end of the file (from a session that ended
+        abruptly) is ignored.
+
+            :param path: the session file
+            **Precondition**: a string"""
+        with open(path, 'rb') as file:
+            data = file.read()
+        if len(data) < HEADER.size:
+            raise IOError(path+' is not a session file')
+        magic, version, seed, rate, length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise IOError(path+' is not a session file of version '+str(VERSION))
+        if rate != TICK_RATE:
+            raise IOError(path+' was recorded at '+str(rate)+' ticks a second, not '+
+                          str(TICK_RATE))
+
+        start = HEADER.size+length
+        self._config = _decode(json.loads(data[HEADER.size:start].decode('utf-8')))
+        self._seed = seed
+        self._data = data[start:]
+        self._ticks = len(self._data)//TICK.size
+
+
+class ReplayPilot(object):
+    """An instance plays the inputs of a recorded session, in place of the mouse.
+
+    It is used like an AutoPilot (see Breakout.setPilot).  Before the game
+    starts, the random module must be seeded with the seed of the session.
+    After the last tick of the session, the mouse is released.
+
+    INSTANCE ATTRIBUTES:
+        _session [Session]: the session played
+        _tick    [int >= 0]: the next tick to play
+    """
+
+    # GETTERS AND SETTERS
+
+    def getTick(self):
+        """Returns: the next tick of the session to play"""
+        return self._tick
+
+    def isDone(self):
+        """Returns: True if every tick of the session has been played"""
+        return self._tick >= self._session.getTicks()
+
+    def __init__(self, session):
+        """Initialize a pilot at the start of a session.
+
+            :param session: the session to play
+            **Precondition**: a Session"""
+        self._session = session
+        self._tick = 0
+
+    def touch(self, game):
+        """Returns: the recorded mouse position for this tick, or None
+
+        This method should be called exactly once per tick.
+
+            :param game: the game being played (unused)
+            **Precondition**: a Gameplay, or None if there is no game yet"""
+        if self.isDone():
+            return None
+        touch = self._session.getTouch(self._tick)
+        self._tick += 1
+        return touch
+
+
+# HELPER FUNCTIONS
+
+def _encode(config):
+    """Returns: the settings of a configuration as a JSON object
+
+        :param config: the configuration
+        **Precondition**: a GameConfig"""
+    settings = config.getSettings()
+    settings['ROW_COLORS'] = [[color.red, color.green, color.blue, color.alpha]
+                              for color in settings['ROW_COLORS']]
+    return {'name': config.getName(), 'settings': settings}
+
+
+def _decode(data):
+    """Returns: the configuration of a JSON object written by _encode
+
+        :param data: the JSON object
+        **Precondition**: a dictionary"""
+    settings = dict((str(key), value) for key, value in data['settings'].items())
+    settings['ROW_COLORS'] = [colormodel.RGB(*color) for color in settings['ROW_COLORS']]
+    return GameConfig(str(data['name']), **settings)
@@ -0,0 +1,576 @@
+# server.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Session server module for Breakout
+
+This module runs Breakout as a network service.  Each client that connects to
+the server gets its own session, which is a headless game of Breakout (a Match
+object, the same state machine as the Breakout App uses).  There is no
+window and no Kivy event loop.  All sessions are advanced by a single fixed-rate
+scheduler, one frame per tick.
+
+THE PROTOCOL
+
+All messages are little-endian binary records.  The client sends INPUT records:
+
+    flags [uint8]: bit 0 is set if the mouse is pressed
+    x     [int16]: the mouse x position in pixels
+
+Only the most recent INPUT received before a tick is used for that tick.
+
+The server sends a FRAME record for every tick in which something changed:
+
+    kind   [uint8]:   FRAME_KEY or FRAME_DELTA
+    tick   [uint32]:  the frame number of the session
+    state  [uint8]:   the session state (STATE_INACTIVE, ... STATE_COMPLETE)
+    balls  [uint8]:   the number of balls left
+    paddle [float32]: the paddle x position
+    ball   [4 float32]: the ball x, y, vx, vy (all NaN if there is no ball)
+
+A key frame is followed by the size of the brick grid (columns and rows as two
+uint16), and then the remaining bricks as a bitset with one bit per grid cell
+(bit row*columns+col, least significant bit first).  A delta frame is followed
+by the number of bricks removed since the last frame (a uint16), and then the
+row and column of each of those bricks (two uint16 each).  A level file may be
+up to 65535 bricks wide and tall, so these fields are as wide as the grid.
+
+FAIRNESS
+
+A slow client must not stall the others.  The server never blocks on a socket.
+Output for a session is queued, and when the queue grows past OUTPUT_LIMIT the
+session stops queueing frames.  Once the client has read the queue, the session
+sends a key frame so the client catches up with the frames it missed.
+
+Each session also has a CPU budget per tick.  A session that takes longer than
+its budget builds up a debt, and it skips ticks until the debt is paid off.
+If the whole server falls behind, it skips ticks rather than trying to catch up.
+
+To run a server, type
+
+    python server.py [port] [settings]
+
+where settings are the same as for the game (see constants.parseArgs).
+
+The event loop is built directly on select.poll (or select.select where poll
+is not available), so the server runs the same on Python 2, which has no
+asyncio, and on Python 3."""
+import errno
+import math
+import select
+import socket
+import struct
+import sys
+import time
+from constants import *
+from game2d import *
+from gameplay import *
+from levels import LevelFile
+
+
+#: the INPUT record sent by clients
+INPUT = struct.Struct('<Bh')
+#: the INPUT flag for a pressed mouse
+INPUT_PRESSED = 1
+
+#: the FRAME record sent by the server
+FRAME = struct.Struct('<BIBB5f')
+#: the grid size that follows a key frame
+FRAME_GRID = struct.Struct('<HH')
+#: the brick count that follows a delta frame
+FRAME_COUNT = struct.Struct('<H')
+#: the position of a brick removed in a delta frame
+FRAME_BRICK = struct.Struct('<HH')
+#: a frame with the full brick bitset
+FRAME_KEY = ord('K')
+#: a frame with the bricks removed since the last frame
+FRAME_DELTA = ord('D')
+
+#: the number of output bytes queued before a session stops sending frames
+OUTPUT_LIMIT = 16*1024
+#: the number of input bytes read from a client per tick
+INPUT_LIMIT = 1024
+#: the number of new clients accepted per tick
+ACCEPT_LIMIT = 64
+#: the default CPU time (in seconds) a session may use per tick
+SESSION_BUDGET = 0.002
+#: the number of ticks the scheduler may fall behind before it skips ticks
+MAX_BEHIND = 5
+
+
+class Session(object):
+    """An instance is a single headless game of Breakout played by a client.
+
+    The states are run by a Match, as in the Breakout App, except that a new
+    game starts when the player clicks after a game is complete.
+
+    INSTANCE ATTRIBUTES:
+        _socket    [socket]:  the connection to the client
+        _level     [LevelFile, or None for the default layout]: the level to play
+        _config    [GameConfig]: the game settings
+        _grid      [tuple (columns, rows)]: the size of the brick grid
+        _match     [Match]: the state of the game, the balls left and the game
+        _touch     [GPoint, or None if mouse button is not pressed]:
+                   the most recent mouse position sent by the client
+        _tick      [int >= 0]: the number of frames played
+        _debt      [float >= 0]: CPU time used beyond the budget
+        _input     [bytearray]: received bytes that are not a full INPUT yet
+        _output    [bytearray]: queued bytes not yet sent to the client
+        _resync    [bool]: True if frames were dropped and a key frame is needed
+        _dynamics  [bytes]: the packed FRAME of the last frame sent
+        _wall      [BrickWall or None]: the wall of the last frame sent
+        _version   [int or None]: the wall version of the last frame sent
+        _bricks    [set of (row, col)]: the bricks in the last frame sent
+    """
+
+    # GETTERS AND SETTERS
+
+    def getSocket(self):
+        """Returns: the connection to the client"""
+        return self._socket
+
+    def getState(self):
+        """Returns: the current state of the game"""
+        return self._match.getState()
+
+    def getTick(self):
+        """Returns: the number of frames played"""
+        return self._tick
+
+    def hasOutput(self):
+        """Returns: True if there are queued bytes for the client"""
+        return len(self._output) > 0
+
+    def __init__(self, sock, level=None, config=None):
+        """Initialize a session for a newly connected client.
+
+            :param sock: the connection to the client
+            **Precondition**: a non-blocking socket
+
+            :param level: the level to play
+            **Precondition**: a LevelFile, or None for the default layout
+
+            :param config: the game settings
+            **Precondition**: a GameConfig, or None for DEFAULT_CONFIG"""
+        self._socket = sock
+        self._level = level
+        self._config = DEFAULT_CONFIG if config is None else config
+        if level is None:
+            self._grid = (self._config.BRICKS_IN_ROW, self._config.BRICK_ROWS)
+        else:
+            self._grid = (level.getColumns(), level.getRows())
+
+        self._match = Match(level, self._config, restart=True)
+        self._touch = None
+        self._tick = 0
+        self._debt = 0.0
+
+        self._input = bytearray()
+        self._output = bytearray()
+        self._resync = True
+        self._dynamics = None
+        self._wall = None
+        self._version = None
+        self._bricks = set()
+
+    def receive(self):
+        """Returns: False if the client closed the connection, True otherwise
+
+        This reads the input available on the socket (up to INPUT_LIMIT bytes)
+        without blocking."""
+        try:
+            data = self._socket.recv(INPUT_LIMIT)
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return True
+            return False
+        if not data:
+            return False
+
+        self._input += data
+        count = len(self._input) // INPUT.size
+        if count > 0:
+            # Only the last input matters
+            last = (count-1)*INPUT.size
+            flags, x = INPUT.unpack_from(bytes(self._input[last:last+INPUT.size]))
+            self._touch = GPoint(x, self._config.PADDLE_OFFSET) if flags & INPUT_PRESSED else None
+            del self._input[:count*INPUT.size]
+        return True
+
+    def send(self):
+        """Returns: False if the connection failed, True otherwise
+
+        This sends as much of the queued output as the socket accepts without
+        blocking."""
+        try:
+            sent = self._socket.send(bytes(self._output))
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return True
+            return False
+        del self._output[:sent]
+        return True
+
+    def update(self):
+        """Animates a single frame of the game."""
+        self._tick += 1
+        self._match.step(self._touch)
+
+    def isThrottled(self):
+        """Returns: True if the session used too much CPU time and must skip
+        this tick"""
+        return self._debt > 0.0
+
+    def charge(self, seconds, budget):
+        """Charges the CPU time of a tick to the session.
+
+        The session pays off one budget of its debt each tick, so a session
+        that skips a tick should be charged 0.
+
+            :param seconds: the CPU time the session used this tick
+            **Precondition**: a float >= 0
+
+            :param budget: the CPU time a session may use per tick
+            **Precondition**: a float > 0"""
+        self._debt = max(0.0, self._debt + seconds - budget)
+
+    def publish(self):
+        """Queues a frame for the client if anything has changed.
+
+        If the output queue is full, the frame is dropped and the next frame
+        sent will be a key frame."""
+        if len(self._output) > OUTPUT_LIMIT:
+            self._resync = True
+            return
+
+        paddle = 0.0
+        ball = (float('nan'),)*4
+        wall = None
+        game = self._match.getGame()
+        if game is not None:
+            paddle = game.getPaddle().x
+            wall = game.getWall()
+            if game.getBall() is not None:
+                b = game.getBall()
+                ball = (b.x, b.y, b.getVX(), b.getVY())
+
+        version = None if wall is None else wall.getVersion()
+        kind = FRAME_KEY if self._resync or wall is not self._wall else FRAME_DELTA
+        dynamics = FRAME.pack(kind, self._tick & 0xFFFFFFFF, self._match.getState(),
+                              self._match.getBallCount(), paddle, *ball)
+        if kind == FRAME_DELTA and version == self._version and \
+           dynamics[5:] == self._dynamics[5:]:
+            return
+
+        bricks = self._brickSet(wall, version)
+        self._output += dynamics
+        if kind == FRAME_KEY:
+            self._output += self._keyFrame(bricks)
+        else:
+            removed = sorted(self._bricks - bricks)
+            self._output += FRAME_COUNT.pack(len(removed))
+            for row, col in removed:
+                self._output += FRAME_BRICK.pack(row, col)
+
+        self._resync = False
+        self._dynamics = dynamics
+        self._wall = wall
+        self._version = version
+        self._bricks = bricks
+
+    def close(self):
+        """Closes the connection to the client."""
+        try:
+            self._socket.close()
+        except socket.error:
+            pass
+
+    # HELPER METHODS FOR FRAMES
+
+    def _brickSet(self, wall, version):
+        """Returns: the set of (row, col) of the bricks in the wall"""
+        if wall is None:
+            return set()
+        if wall is self._wall and version == self._version:
+            return self._bricks
+        return set((brick.getRow(), brick.getCol()) for brick in wall.getBricks())
+
+    def _keyFrame(self, bricks):
+        """Returns: the grid size and brick bitset that follow a key frame"""
+        columns, rows = self._grid
+        bits = bytearray((columns*rows+7)//8)
+        for row, col in bricks:
+            index = row*columns+col
+            bits[index >> 3] |= 1 << (index & 7)
+        return FRAME_GRID.pack(columns, rows) + bytes(bits)
+
+
+class SessionServer(object):
+    """An instance hosts many sessions of Breakout on one socket.
+
+    INSTANCE ATTRIBUTES:
+        _listener [socket]: the listening socket
+        _config   [GameConfig]: the settings of every session
+        _level    [LevelFile or None]: the level every session plays
+        _period   [float > 0]: the time between ticks, in seconds
+        _budget   [float > 0]: the CPU time a session may use per tick
+        _sessions [dict of int to Session]: the sessions by file descriptor
+        _poller   [select.poll, or None if poll is not available]:
+                  the poll object watching the sockets
+        _ticks    [int >= 0]: the number of ticks run
+        _skipped  [int >= 0]: the number of ticks skipped to catch up
+    """
+
+    # GETTERS AND SETTERS
+
+    def getAddress(self):
+        """Returns: the (host, port) the server listens on"""
+        return self._listener.getsockname()
+
+    def getSessions(self):
+        """Returns: the list of active sessions"""
+        return list(self._sessions.values())
+
+    def getTicks(self):
+        """Returns: the number of ticks run"""
+        return self._ticks
+
+    def getSkipped(self):
+        """Returns: the number of ticks skipped because the server fell behind"""
+        return self._skipped
+
+    def __init__(self, host='127.0.0.1', port=0, rate=60, budget=SESSION_BUDGET,
+                 config=None):
+        """Initialize a server listening on the given address.
+
+            :param host: the address to listen on
+            **Precondition**: a string
+
+            :param port: the port to listen on, or 0 for any free port
+            **Precondition**: an int >= 0
+
+            :param rate: the number of ticks per second
+            **Precondition**: a number > 0
+
+            :param budget: the CPU time (in seconds) a session may use per tick
+            **Precondition**: a number > 0
+
+            :param config: the settings of every session, including the level file
+            **Precondition**: a GameConfig, or None for DEFAULT_CONFIG"""
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((host, port))
+        self._listener.listen(128)
+        self._listener.setblocking(False)
+
+        self._config = DEFAULT_CONFIG if config is None else config
+        level = self._config.LEVEL_FILE
+        self._level = None if level is None else LevelFile(level)
+        self._period = 1.0/rate
+        self._budget = float(budget)
+        self._sessions = {}
+        self._ticks = 0
+        self._skipped = 0
+
+        self._poller = select.poll() if hasattr(select, 'poll') else None
+        if self._poller is not None:
+            self._poller.register(self._listener.fileno(), select.POLLIN)
+
+    def serve(self, duration=None):
+        """Runs the server for the given number of seconds.
+
+            :param duration: the number of seconds to run
+            **Precondition**: a number > 0, or None to run forever"""
+        start = time.time()
+        deadline = start + self._period
+        while duration is None or time.time()-start < duration:
+            self._wait(max(0.0, deadline-time.time()))
+            now = time.time()
+            if now >= deadline:
+                self.tick()
+                deadline += self._period
+                if now - deadline > MAX_BEHIND*self._period:
+                    # Too far behind; drop the ticks we missed
+                    missed = int((now - deadline)/self._period)
+                    self._skipped += missed
+                    deadline += missed*self._period
+
+    def tick(self):
+        """Advances every session by one frame and queues its output."""
+        self._ticks += 1
+        for session in self.getSessions():
+            if session.isThrottled():
+                session.charge(0.0, self._budget)
+                continue
+            before = time.time()
+            session.update()
+            session.publish()
+            session.charge(time.time()-before, self._budget)
+            self._watch(session)
+
+    def close(self):
+        """Closes all sessions and the listening socket."""
+        for session in self.getSessions():
+            self._drop(session)
+        self._listener.close()
+        if self._level is not None:
+            self._level.close()
+
+    # HELPER METHODS
+
+    def _accept(self):
+        """Accepts up to ACCEPT_LIMIT new clients."""
+        for pos in range(ACCEPT_LIMIT):
+            try:
+                sock, address = self._listener.accept()
+            except socket.error:
+                return
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = Session(sock, self._level, self._config)
+            self._sessions[sock.fileno()] = session
+            if self._poller is not None:
+                self._poller.register(sock.fileno(), select.POLLIN)
+
+    def _drop(self, session):
+        """Removes a session and closes its connection."""
+        fd = session.getSocket().fileno()
+        if self._poller is not None:
+            self._poller.unregister(fd)
+        del self._sessions[fd]
+        session.close()
+
+    def _watch(self, session):
+        """Watches the session socket for writing if it has queued output."""
+        if self._poller is not None:
+            mask = select.POLLIN
+            if session.hasOutput():
+                mask |= select.POLLOUT
+            self._poller.modify(session.getSocket().fileno(), mask)
+
+    def _wait(self, timeout):
+        """Handles socket events for up to timeout seconds."""
+        listener = self._listener.fileno()
+        if self._poller is not None:
+            events = self._poller.poll(int(math.ceil(timeout*1000)))
+            closed = select.POLLHUP | select.POLLERR
+            readable = [fd for fd, event in events if event & (select.POLLIN | closed)]
+            writable = [fd for fd, event in events if event & select.POLLOUT]
+        else:
+            readers = [listener] + list(self._sessions)
+            writers = [fd for fd, session in self._sessions.items() if session.hasOutput()]
+            readable, writable, failed = select.select(readers, writers, [], timeout)
+
+        for fd in readable:
+            if fd == listener:
+                self._accept()
+            elif fd in self._sessions and not self._sessions[fd].receive():
+                self._drop(self._sessions[fd])
+
+        for fd in writable:
+            if fd in self._sessions:
+                session = self._sessions[fd]
+                if session.send():
+                    self._watch(session)
+                else:
+                    self._drop(session)
+
+
+class Client(object):
+    """An instance is a simple blocking client for a SessionServer.
+
+    It is meant for testing the server on localhost.
+
+    INSTANCE ATTRIBUTES:
+        _socket [socket]: the connection to the server
+        _buffer [bytearray]: received bytes not yet decoded
+        bricks  [set of (row, col)]: the bricks remaining, as of the last frame
+        frame   [dict or None]: the fields of the last frame received
+    """
+
+    def __init__(self, host, port):
+        """Initialize a client connected to the given server."""
+        self._socket = socket.create_connection((host, port))
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._buffer = bytearray()
+        self.bricks = set()
+        self.frame = None
+
+    def touch(self, x=None):
+        """Sends the mouse position to the server.
+
+            :param x: the mouse x position
+            **Precondition**: a number, or None if the mouse is not pressed"""
+        if x is None:
+            self._socket.sendall(INPUT.pack(0, 0))
+        else:
+            self._socket.sendall(INPUT.pack(INPUT_PRESSED, int(x)))
+
+    def receive(self):
+        """Returns: the list of frames received (each a dictionary)
+
+        This waits for at least one frame to arrive."""
+        frames = []
+        while not frames:
+            data = self._socket.recv(65536)
+            if not data:
+                raise EOFError('server closed the connection')
+            self._buffer += data
+            frame = self._decode()
+            while frame is not None:
+                frames.append(frame)
+                frame = self._decode()
+        return frames
+
+    def close(self):
+        """Closes the connection to the server."""
+        self._socket.close()
+
+    def _decode(self):
+        """Returns: the next frame in the buffer, or None if it is incomplete"""
+        if len(self._buffer) < FRAME.size:
+            return None
+        fields = FRAME.unpack_from(bytes(self._buffer[:FRAME.size]))
+        pos = FRAME.size
+        data = bytes(self._buffer)
+
+        if fields[0] == FRAME_KEY:
+            if len(data) < pos+FRAME_GRID.size:
+                return None
+            columns, rows = FRAME_GRID.unpack_from(data, pos)
+            pos += FRAME_GRID.size
+            size = (columns*rows+7)//8
+            if len(data) < pos+size:
+                return None
+            bits = bytearray(data[pos:pos+size])
+            pos += size
+            self.bricks = set((index // columns, index % columns)
+                              for index in range(columns*rows)
+                              if bits[index >> 3] & (1 << (index & 7)))
+        else:
+            if len(data) < pos+FRAME_COUNT.size:
+                return None
+            count = FRAME_COUNT.unpack_from(data, pos)[0]
+            pos += FRAME_COUNT.size
+            if len(data) < pos+count*FRAME_BRICK.size:
+                return None
+            for brick in range(count):
+                self.bricks.discard(FRAME_BRICK.unpack_from(data, pos))
+                pos += FRAME_BRICK.size
+
+        del self._buffer[:pos]
+        self.frame = {'kind': fields[0], 'tick': fields[1], 'state': fields[2],
+                      'balls': fields[3], 'paddle': fields[4],
+                      'ball': None if math.isnan(fields[5]) else fields[5:9]}
+        return self.frame
+
+
+# Application code
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    server = SessionServer(host='0.0.0.0', port=port, config=parseArgs(sys.argv[2:]))
+    print('serving Breakout on port %d' % server.getAddress()[1])
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    server.close()
@@ -0,0 +1,246 @@
+# telemetry.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Telemetry module for Breakout
+
+This module records what happens in a game as a stream of events: serves,
+paddle hits, brick breaks, lost balls, state changes, frame times and quality
+changes.  Each event is a small tuple (time, kind, a, b), where the meaning of
+a and b depends on the kind (see EVENTS).
+
+The game never waits for the disk.  The method emit only appends the event to
+a bounded queue.  A background thread takes the events off the queue in
+batches and writes them to a file.  If the queue is full, the event is dropped
+and counted instead.  The queue is a deque, whose append and popleft are atomic,
+so the game thread and the writer thread never take a lock.
+
+The file is either JSON lines (one object per event) or binary (one EVENT
+record per event).  When the file grows past a size limit it is rotated, like
+a log file: events.jsonl becomes events.jsonl.1, and so on.
+
+To record telemetry while playing, start the game with the option --telemetry
+file (see __main__.py)."""
+import atexit
+import collections
+import json
+import os
+import struct
+import threading
+import time
+
+
+#: a ball was served (a, b = vx, vy)
+EVENT_SERVE  = 0
+#: the ball hit the paddle (a, b = ball center x, paddle x)
+EVENT_PADDLE = 1
+#: a brick was destroyed (a, b = row, col)
+EVENT_BRICK  = 2
+#: the ball was lost (a, b = ball center x, paddle x)
+EVENT_LOST   = 3
+#: the game state changed (a, b = old state, new state)
+EVENT_STATE  = 4
+#: a frame was played (a, b = seconds since the last frame, seconds in update)
+EVENT_FRAME  = 5
+#: the frame governor changed the quality level (a, b = old level, new level)
+EVENT_QUALITY = 6
+
+#: the name and field names of each kind of event, for JSON lines
+EVENTS = {
+    EVENT_SERVE:  ('serve',  'vx', 'vy'),
+    EVENT_PADDLE: ('paddle', 'x', 'paddle'),
+    EVENT_BRICK:  ('brick',  'row', 'col'),
+    EVENT_LOST:   ('lost',   'x', 'paddle'),
+    EVENT_STATE:  ('state',  'old', 'new'),
+    EVENT_FRAME:  ('frame',  'dt', 'update'),
+    EVENT_QUALITY: ('quality', 'old', 'new'),
+}
+
+#: the record of an event in a binary file: time, kind, a, b
+EVENT = struct.Struct('<dBdd')
+
+
+class Telemetry(object):
+    """An instance writes game events to a file in the background.
+
+    INSTANCE ATTRIBUTES:
+        _path     [str]: the file to write to
+        _binary   [bool]: True for binary records, False for JSON lines
+        _capacity [int > 0]: the number of events the queue can hold
+        _batch    [int > 0]: the most events written at once
+        _limit    [int > 0]: the file size that causes a rotation, in bytes
+        _backups  [int >= 0]: the number of rotated files to keep
+        _interval [float > 0]: the time between flushes, in seconds
+        _queue    [deque of tuples]: the events waiting to be written
+        _dropped  [int >= 0]: the number of events dropped because the queue was full
+        _written  [int >= 0]: the number of events written
+        _errors   [int >= 0]: the number of failed writes
+        _file     [file or None]: the open file (only used by the writer thread)
+        _stop     [threading.Event]: set when the writer should finish
+        _thread   [threading.Thread]: the writer thread
+    """
+
+    # GETTERS AND SETTERS
+
+    def getDropped(self):
+        """Returns: the number of events dropped because the queue was full"""
+        return self._dropped
+
+    def getWritten(self):
+        """Returns: the number of events written to the file"""
+        return self._written
+
+    def getErrors(self):
+        """Returns: the number of batches that could not be written"""
+        return self._errors
+
+    def __init__(self, path, binary=None, capacity=4096, batch=512,
+                 limit=16*1024*1024, backups=4, interval=0.25):
+        """Initialize telemetry and start the writer thread.
+
+            :param path: the file to write to
+            **Precondition**: a string
+
+            :param binary: True for binary records, False for JSON lines
+            **Precondition**: a bool, or None to use binary unless path ends in .jsonl
+
+            :param capacity: the number of events the queue can hold
+            **Precondition**: an int > 0
+
+            :param batch: the most events written at once
+            **Precondition**: an int > 0
+
+            :param limit: the file size that causes a rotation, in bytes
+            **Precondition**: an int > 0
+
+            :param backups: the number of rotated files to keep
+            **Precondition**: an int >= 0
+
+            :param interval: the time between flushes, in seconds
+            **Precondition**: a number > 0"""
+        self._path = path
+        self._binary = not path.endswith('.jsonl') if binary is None else binary
+        self._capacity = capacity
+        self._batch = batch
+        self._limit = limit
+        self._backups = backups
+        self._interval = interval
+
+        self._queue = collections.deque()
+        self._dropped = 0
+        self._written = 0
+        self._errors = 0
+        self._file = None
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='telemetry')
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def emit(self, kind, a=0, b=0):
+        """Queues an event.  This never blocks.
+
+        If the queue is full, the event is dropped and counted.
+
+            :param kind: the kind of event
+            **Precondition**: a key of EVENTS
+
+            :param a: the first value of the event
+            **Precondition**: a number
+
+            :param b: the second value of the event
+            **Precondition**: a number"""
+        if len(self._queue) >= self._capacity:
+            self._dropped += 1
+            return
+        self._queue.append((time.time(), kind, a, b))
+
+    def close(self):
+        """Writes the events still in the queue and stops the writer thread."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+
+    # HELPER METHODS (WRITER THREAD ONLY)
+
+    def _run(self):
+        """The body of the writer thread."""
+        try:
+            while not self._stop.wait(self._interval):
+                self._flush()
+            self._flush()
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _flush(self):
+        """Writes all of the queued events, one batch at a time."""
+        while self._queue:
+            events = []
+            while self._queue and len(events) < self._batch:
+                events.append(self._queue.popleft())
+            try:
+                self._write(events)
+                self._written += len(events)
+            except (IOError, OSError):
+                self._errors += 1
+
+    def _write(self, events):
+        """Writes a batch of events, rotating the file if it is too big."""
+        if self._file is None:
+            self._file = open(self._path, 'ab' if self._binary else 'a')
+
+        if self._binary:
+            data = b''.join([EVENT.pack(*event) for event in events])
+        else:
+            lines = []
+            for stamp, kind, a, b in events:
+                name, first, second = EVENTS[kind]
+                lines.append(json.dumps({'t': round(stamp, 6), 'event': name,
+                                         first: a, second: b}, sort_keys=True))
+            data = '\n'.join(lines) + '\n'
+        self._file.write(data)
+        self._file.flush()
+
+        if self._file.tell() >= self._limit:
+            self._rotate()
+
+    def _rotate(self):
+        """Renames the file to path.1 (and path.1 to path.2, and so on)."""
+        self._file.close()
+        self._file = None
+        if self._backups == 0:
+            os.remove(self._path)
+            return
+
+        for number in range(self._backups-1, 0, -1):
+            older = '%s.%d' % (self._path, number)
+            if os.path.exists(older):
+                os.rename(older, '%s.%d' % (self._path, number+1))
+        os.rename(self._path, self._path+'.1')
+
+
+def read(path):
+    """Returns: a generator of the events in a telemetry file
+
+    Each event is a tuple (time, kind, a, b), whichever format the file is in.
+
+        :param path: the file to read
+        **Precondition**: a string, the name of a telemetry file"""
+    if path.endswith('.jsonl') or '.jsonl.' in path:
+        names = dict((value[0], (key,)+value[1:]) for key, value in EVENTS.items())
+        with open(path) as file:
+            for line in file:
+                record = json.loads(line)
+                kind, first, second = names[record['event']]
+                yield (record['t'], kind, record[first], record[second])
+    else:
+        with open(path, 'rb') as file:
+            while True:
+                data = file.read(EVENT.size*1024)
+                if not data:
+                    break
+                for pos in range(0, len(data) - len(data) % EVENT.size, EVENT.size):
+                    yield EVENT.unpack_from(data, pos)
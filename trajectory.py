@@ -0,0 +1,316 @@
+# trajectory.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Trajectory prediction module for Breakout
+
+This module contains a service that predicts the future path of the ball: the
+sequence of wall bounces and brick hits, and the frame at which each happens.
+It is meant for the autopilot, aim-assist overlays and analytics, which all
+want to look at the future path every frame.
+
+The prediction follows the same frame-by-frame rules as Gameplay.moveBall and
+Ball.handleWallCollision, but it does not simulate the frames one at a time.
+Between two impacts the ball moves in a straight line, so the predictor casts
+a ray along that line and jumps straight to the first frame where the ball
+touches a brick (as a circle, like Ball.getContact) or crosses a wall.  The
+prediction stops when the ball comes down to the top of the paddle, since the
+paddle position is up to the player.
+
+Predictions are cached.  As long as no brick is removed and the ball stays on
+the predicted path (including its predicted bounces), a query only looks up
+where the ball is on the cached path."""
+import math
+from constants import *
+
+
+#: an impact with the left, right or top wall
+IMPACT_WALL  = 'wall'
+#: an impact with a brick
+IMPACT_BRICK = 'brick'
+#: the ball reaching the top of the paddle (the end of the prediction)
+IMPACT_FLOOR = 'floor'
+
+# How far (in pixels) the ball may be from the cached path and still be on it
+EPSILON = 1e-6
+
+
+class Impact(object):
+    """An instance is a single predicted impact of the ball.
+
+    INSTANCE ATTRIBUTES:
+        kind  [one of IMPACT_WALL, IMPACT_BRICK, IMPACT_FLOOR]: what the ball hits
+        tick  [int >= 0]: the number of frames from now until the impact
+        x     [float]:    the ball center x at the impact
+        y     [float]:    the ball center y at the impact
+        brick [Brick, or None if kind is not IMPACT_BRICK]: the brick hit
+        _at   [int >= 1]: the frame of the impact counted from the start of
+                          the cached prediction
+    """
+
+    def __init__(self, kind, at, x, y, brick=None):
+        """Initialize an impact at frame at of the prediction."""
+        self.kind = kind
+        self.tick = at
+        self.x = x
+        self.y = y
+        self.brick = brick
+        self._at = at
+
+    def __repr__(self):
+        """Returns: Unambiguous String representation of this impact."""
+        return 'Impact(%s,%d,%.1f,%.1f)' % (self.kind, self.tick, self.x, self.y)
+
+
+class TrajectoryPredictor(object):
+    """An instance predicts and caches the path of the ball.
+
+    INSTANCE ATTRIBUTES:
+        _horizon  [int > 0]: the number of frames to predict
+        _wall     [BrickWall or None]: the wall of the cached prediction
+        _version  [int]: the version of _wall used for the cached prediction
+        _segments [list of tuples (at, x, y, vx, vy, length)]:
+            the straight pieces of the cached path.  The piece starts at frame
+            at with the ball at (x,y) (bottom left) moving at (vx,vy), and
+            lasts for length frames.
+        _impacts  [list of Impact]: the impacts of the cached path
+        _current  [int >= 0]: the segment the ball was on at the last query
+        _hits     [int >= 0]: the number of queries answered from the cache
+        _misses   [int >= 0]: the number of queries that needed a new prediction
+        _config   [GameConfig]: the settings of the game (the walls and paddle)
+    """
+
+    # GETTERS AND SETTERS
+
+    def getHits(self):
+        """Returns: the number of queries answered from the cache"""
+        return self._hits
+
+    def getMisses(self):
+        """Returns: the number of queries that needed a new prediction"""
+        return self._misses
+
+    def __init__(self, horizon=600, config=None):
+        """Initialize a predictor for the given number of frames.
+
+            :param horizon: the number of frames to predict
+            **Precondition**: an int > 0
+
+            :param config: the settings of the game
+            **Precondition**: a GameConfig, or None for DEFAULT_CONFIG"""
+        self._horizon = horizon
+        self._config = DEFAULT_CONFIG if config is None else config
+        self._wall = None
+        self._version = None
+        self._segments = []
+        self._impacts = []
+        self._current = 0
+        self._hits = 0
+        self._misses = 0
+
+    def predict(self, ball, wall):
+        """Returns: the list of upcoming impacts of the ball, in order
+
+        The attribute tick of each impact is the number of frames from now.
+        The list is owned by the predictor, so do not modify it.
+
+            :param ball: the ball in play
+            **Precondition**: a Ball
+
+            :param wall: the bricks in play
+            **Precondition**: a BrickWall"""
+        at = None
+        if wall is self._wall and wall.getVersion() == self._version:
+            at = self._locate(ball)
+
+        if at is None:
+            self._misses += 1
+            self._cast(ball, wall)
+            at = 0
+        else:
+            self._hits += 1
+
+        # Skip the impacts that are behind the ball
+        first = 0
+        while first < len(self._impacts) and self._impacts[first]._at <= at:
+            first += 1
+        for pos in range(first, len(self._impacts)):
+            impact = self._impacts[pos]
+            impact.tick = impact._at - at
+        return self._impacts[first:]
+
+    def invalidate(self):
+        """Forces the next query to make a new prediction."""
+        self._wall = None
+
+    # HELPER METHODS
+
+    def _locate(self, ball):
+        """Returns: the frame of the cached path that the ball is at, or None
+        if the ball is not on the cached path."""
+        vx = ball.getVX()
+        vy = ball.getVY()
+        for pos in range(self._current, len(self._segments)):
+            at, x, y, svx, svy, length = self._segments[pos]
+            if svx != vx or svy != vy:
+                continue
+            step = int(round((ball.y - y)/vy)) if vy != 0 else int(round((ball.x - x)/vx))
+            if (0 <= step < max(length,1) and abs(x+step*vx-ball.x) < EPSILON and
+                abs(y+step*vy-ball.y) < EPSILON):
+                self._current = pos
+                return at+step
+        return None
+
+    def _cast(self, ball, wall):
+        """Makes a new prediction for the ball and the wall."""
+        self._wall = wall
+        self._version = wall.getVersion()
+        self._segments = []
+        self._impacts = []
+        self._current = 0
+
+        x = ball.x
+        y = ball.y
+        w = ball.width
+        h = ball.height
+        vx = ball.getVX()
+        vy = ball.getVY()
+        width = self._config.GAME_WIDTH
+        height = self._config.GAME_HEIGHT
+        floor = self._config.PADDLE_OFFSET + self._config.PADDLE_HEIGHT
+
+        # Only the bricks that are hit in the prediction need their hits copied
+        bricks = list(wall.getBricks())
+        hits = {}
+
+        at = 0
+        while at < self._horizon:
+            # Frames until the next impact of each kind
+            wall_steps = _exit_step(x, vx, 0.0, width - w)
+            if vy > 0:
+                wall_steps = min(wall_steps, _exit_step(y, vy, 0.0, height - h))
+            floor_steps = _floor_step(y, vy, floor)
+
+            # On a tie, the ball bounces off the brick it sinks deepest into
+            brick = None
+            brick_steps = float('inf')
+            depth = None
+            for candidate in bricks:
+                step = _brick_step(x, y, w, h, vx, vy, candidate)
+                if step is None or step > brick_steps:
+                    continue
+                contact = _contact(x+step*vx, y+step*vy, w/2.0, candidate)
+                if step < brick_steps or contact[2] > depth:
+                    brick_steps = step
+                    brick = candidate
+                    depth = contact[2]
+
+            steps = min(self._horizon - at, wall_steps, floor_steps, brick_steps)
+            if brick_steps > steps:
+                brick = None
+
+            self._segments.append((at, x, y, vx, vy, steps))
+            at += steps
+            x += steps*vx
+            y += steps*vy
+
+            # Bricks are checked before walls, just like Gameplay.moveBall
+            if brick is not None:
+                self._impacts.append(Impact(IMPACT_BRICK, at, x+w/2.0, y+h/2.0, brick))
+                # Reflect about the contact normal, as Ball.handleBrickCollision
+                nx, ny, depth = _contact(x, y, w/2.0, brick)
+                x += nx*depth
+                y += ny*depth
+                dot = vx*nx + vy*ny
+                if dot < 0.0:
+                    vx = vx - 2.0*dot*nx
+                    vy = vy - 2.0*dot*ny
+                if brick.isBreakable():
+                    left = hits.get(brick, brick.getHits()) - 1
+                    hits[brick] = left
+                    if left <= 0:
+                        bricks.remove(brick)
+            elif steps == floor_steps:
+                self._impacts.append(Impact(IMPACT_FLOOR, at, x+w/2.0, y+h/2.0))
+                break
+
+            # The same checks (in the same order) as Ball.handleWallCollision
+            if x < 0.0 or x+w > width:
+                self._impacts.append(Impact(IMPACT_WALL, at, x+w/2.0, y+h/2.0))
+                vx = -vx
+            elif y+h > height:
+                self._impacts.append(Impact(IMPACT_WALL, at, x+w/2.0, y+h/2.0))
+                vy = -vy
+
+        self._segments.append((at, x, y, vx, vy, 0))
+
+
+def _exit_step(p, v, lo, hi):
+    """Returns: the first frame k >= 1 where p+k*v is outside of [lo,hi]
+
+    The result is infinite if v is 0."""
+    if v > 0:
+        return max(1, int(math.floor((hi - p)/v)) + 1)
+    if v < 0:
+        return max(1, int(math.floor((lo - p)/v)) + 1)
+    return float('inf')
+
+
+def _floor_step(y, vy, floor):
+    """Returns: the first frame k >= 1 where y+k*vy is at or below floor
+
+    The result is infinite if the ball is not moving down."""
+    if vy >= 0:
+        return float('inf')
+    return max(1, int(math.ceil((floor - y)/vy)))
+
+
+def _brick_step(x, y, w, h, vx, vy, brick):
+    """Returns: the first frame k >= 1 where the ball touches the brick, or
+    None if this does not happen.
+
+    The ball touches the brick at a subset of the frames where its bounding
+    box overlaps the brick.  Those frames are found with a ray cast, and then
+    only they are tested as a circle against the brick."""
+    lo = 1.0
+    hi = float('inf')
+    for p, v, a, b in ((x, vx, brick.left - w, brick.right),
+                       (y, vy, brick.bottom - h, brick.top)):
+        if v == 0:
+            if p < a or p > b:
+                return None
+            continue
+        t0 = (a - p)/v
+        t1 = (b - p)/v
+        if t0 > t1:
+            t0, t1 = t1, t0
+        lo = max(lo, t0)
+        hi = min(hi, t1)
+        if lo > hi:
+            return None
+
+    step = int(math.ceil(lo))
+    while step <= hi:
+        if _contact(x+step*vx, y+step*vy, w/2.0, brick) is not None:
+            return step
+        step += 1
+    return None
+
+
+def _contact(x, y, radius, brick):
+    """Returns: the tuple (nx, ny, depth) of Ball.getContact for a ball with
+    bottom left corner (x,y), or None if the ball does not touch the brick."""
+    cx = x + radius
+    cy = y + radius
+    dx = cx - min(max(cx, brick.left), brick.right)
+    dy = cy - min(max(cy, brick.bottom), brick.top)
+    distance = dx*dx + dy*dy
+    if distance > radius*radius:
+        return None
+    if distance > 0.0:
+        distance = math.sqrt(distance)
+        return (dx/distance, dy/distance, radius-distance)
+
+    sides = [(cx-brick.left, -1.0, 0.0), (brick.right-cx, 1.0, 0.0),
+             (cy-brick.bottom, 0.0, -1.0), (brick.top-cy, 0.0, 1.0)]
+    inside, nx, ny = min(sides)
+    return (nx, ny, radius+inside)
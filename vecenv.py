@@ -0,0 +1,392 @@
+# vecenv.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Vectorized environment module for Breakout
+
+This module contains an environment for training and evaluating paddle
+policies.  It runs many independent games of Breakout in lockstep.  Instead
+of one Gameplay object (with a Ball, a paddle and a BrickWall) per game, the
+state of all games is kept in NumPy arrays, and a single call to step advances
+every game by one frame.
+
+The rules are the same as in Gameplay.moveBall: the ball moves, the ball (a
+circle) is tested against the paddle and then the bricks around it, and then
+the ball bounces off the walls.  The only differences are that a lost
+ball is served again immediately (there is no countdown), and that the paddle
+is moved by actions instead of the mouse.
+
+Only the default layout of bricks is supported, so the settings may not have a
+LEVEL_FILE (the bricks of a level may take several hits, or none at all), and
+there are no power-ups or extra balls, so POWERUP_EVERY must be 0.
+
+The interface follows the usual reinforcement learning conventions:
+
+    env = VectorBreakoutEnv(256, seed=0)
+    obs = env.reset()
+    obs, rewards, dones, info = env.step(actions)
+
+A game that is done is reset automatically, so the observation returned for
+it is the first observation of the next game."""
+import numpy
+from constants import *
+
+
+#: the action that keeps the paddle still
+ACTION_STAY  = 0
+#: the action that moves the paddle left
+ACTION_LEFT  = 1
+#: the action that moves the paddle right
+ACTION_RIGHT = 2
+
+#: the number of values in an observation before the brick occupancy:
+#: ball x, ball y, ball vx, ball vy and paddle x
+OBS_DYNAMICS = 5
+
+
+class VectorBreakoutEnv(object):
+    """An instance is a batch of independent Breakout games.
+
+    All attributes are arrays with one entry (or row) per game.  The ball and
+    paddle positions are the bottom left corners, as with GObject.
+
+    INSTANCE ATTRIBUTES:
+        _count  [int > 0]:  the number of games
+        _config [GameConfig]: the settings shared by every game
+        _speed  [float > 0]: the paddle movement of ACTION_LEFT and ACTION_RIGHT
+        _limit  [int > 0 or None]: the number of frames before a game is cut
+                short, or None for no limit
+        _random [list of numpy.random.RandomState]: the random source of each game
+        _ball   [float array (4,count)]: ball x, y, vx, vy
+        _paddle [float array (count,)]: paddle x
+        _bricks [bool array (count,rows,bricks in a row)]: brick occupancy
+        _left   [int array (count,)]: the number of bricks left
+        _lives  [int array (count,)]: the number of serves left
+        _steps  [int array (count,)]: the number of frames played
+        _obs    [float32 array (count,OBS_DYNAMICS+BRICK_COUNT)]: the
+                observation buffer
+    """
+
+    # GETTERS AND SETTERS
+
+    def getCount(self):
+        """Returns: the number of games in this environment"""
+        return self._count
+
+    def getConfig(self):
+        """Returns: the settings shared by every game"""
+        return self._config
+
+    def getObservationSize(self):
+        """Returns: the number of values in the observation of one game"""
+        return self._obs.shape[1]
+
+    def getBricks(self):
+        """Returns: the brick occupancy as a (read only) bool array of shape
+        (count, BRICK_ROWS, BRICKS_IN_ROW) of the configuration"""
+        view = self._bricks.view()
+        view.flags.writeable = False
+        return view
+
+    def __init__(self, count, seed=None, speed=8.0, limit=None, buffer=None,
+                 config=None):
+        """Initialize a batch of count games.
+
+        The games are not ready to play until reset is called.
+
+            :param count: the number of games
+            **Precondition**: an int > 0
+
+            :param seed: the seed of the first game (game i uses seed+i)
+            **Precondition**: an int, or None for random seeds
+
+            :param speed: the paddle movement per frame for the move actions
+            **Precondition**: a number > 0
+
+            :param limit: the number of frames before a game is cut short
+            **Precondition**: an int > 0, or None for no limit
+
+            :param buffer: the array to write observations into
+            **Precondition**: a float32 array of shape (count, observation size),
+            or None to allocate one
+
+            :param config: the settings shared by every game
+            **Precondition**: a GameConfig with no LEVEL_FILE and POWERUP_EVERY
+            0, or None for DEFAULT_CONFIG"""
+        config = DEFAULT_CONFIG if config is None else config
+        _checkConfig(config)
+        self._config = config
+        self._count = count
+        self._speed = float(speed)
+        self._limit = limit
+        self.seed(seed)
+
+        self._ball   = numpy.zeros((4, count))
+        self._paddle = numpy.zeros(count)
+        self._bricks = numpy.zeros((count, config.BRICK_ROWS, config.BRICKS_IN_ROW),
+                                   dtype=bool)
+        self._left   = numpy.zeros(count, dtype=int)
+        self._lives  = numpy.zeros(count, dtype=int)
+        self._steps  = numpy.zeros(count, dtype=int)
+        size = observationSize(config)
+        if buffer is None:
+            buffer = numpy.zeros((count, size), dtype=numpy.float32)
+        assert buffer.shape == (count, size) and buffer.dtype == numpy.float32, \
+            'observation buffer has the wrong shape or type'
+        self._obs    = buffer
+        self._index  = numpy.arange(count)
+
+    def seed(self, seed=None):
+        """Reseeds every game.  Game i uses the seed seed+i.
+
+            :param seed: the seed of the first game
+            **Precondition**: an int, or None for random seeds"""
+        if seed is None:
+            self._random = [numpy.random.RandomState() for i in range(self._count)]
+        else:
+            self._random = [numpy.random.RandomState(seed+i) for i in range(self._count)]
+
+    def reset(self):
+        """Returns: the first observation of every game
+
+        This starts a new game in every slot.  The result is an internal
+        buffer that is overwritten by the next call to step or reset."""
+        self._restart(self._index)
+        return self._observe()
+
+    def step(self, actions):
+        """Returns: a tuple (observations, rewards, dones, info) after one frame
+
+        The reward of a game is the number of bricks it broke this frame,
+        minus one if it lost a ball.  A game is done when it has no bricks or
+        no serves left (or reached the frame limit), and it is then reset.
+        The info dictionary has arrays 'bricks' and 'lives' with the bricks and
+        serves left in each game at the end of the frame (before any reset).
+
+            :param actions: the action for each game
+            **Precondition**: an int array of shape (count,) with values in
+            ACTION_STAY, ACTION_LEFT, ACTION_RIGHT"""
+        config = self._config
+        actions = numpy.asarray(actions)
+        assert actions.shape == (self._count,), repr(actions.shape)+' is not the number of games'
+
+        # Move the paddle (Gameplay.updatePaddle keeps it on screen)
+        self._paddle += self._speed*((actions == ACTION_RIGHT).astype(float) -
+                                     (actions == ACTION_LEFT))
+        numpy.clip(self._paddle, 0, config.GAME_WIDTH - config.PADDLE_WIDTH,
+                   out=self._paddle)
+
+        # Move the ball
+        x, y, vx, vy = self._ball
+        x += vx
+        y += vy
+
+        # Test the ball against the paddle, as Gameplay._getContact does
+        size = config.BALL_SIZE
+        radius = size/2.0
+        cx = x + radius
+        cy = y + radius
+        bottom = float(config.PADDLE_OFFSET)
+        nx, ny, depth, paddle = _contact(cx, cy, radius, self._paddle, bottom,
+                                         self._paddle+config.PADDLE_WIDTH,
+                                         bottom+config.PADDLE_HEIGHT)
+
+        # Then against the bricks around the center of the ball, keeping the
+        # deepest contact (the first one in the wall on a tie)
+        brick = numpy.zeros(self._count, dtype=bool)
+        row = numpy.zeros(self._count, dtype=int)
+        col = numpy.zeros(self._count, dtype=int)
+        best = numpy.full(self._count, -1.0)
+        center_row, center_col = _cell(cx, cy, config)[:2]
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                r = center_row + dr
+                c = center_col + dc
+                there = ~paddle & (r >= 0) & (r < config.BRICK_ROWS) & \
+                        (c >= 0) & (c < config.BRICKS_IN_ROW)
+                there[there] = self._bricks[self._index[there], r[there], c[there]]
+                left, low, right, high = _brick(r, c, config)
+                bx, by, bdepth, touch = _contact(cx, cy, radius, left, low, right, high)
+                better = there & touch & (bdepth > best)
+                brick |= better
+                best[better] = bdepth[better]
+                row[better] = r[better]
+                col[better] = c[better]
+                nx[better] = bx[better]
+                ny[better] = by[better]
+                depth[better] = bdepth[better]
+
+        # Ball.handlePaddleCollision steers a ball that lands on the paddle
+        steer = paddle & (ny > 0.0) & (vy < 0.0)
+        half = config.PADDLE_WIDTH/2.0
+        offset = (cx[steer] - (self._paddle[steer]+half)) / half
+        angle = numpy.radians(config.PADDLE_MAX_ANGLE) * numpy.clip(offset, -1.0, 1.0)
+        speed = numpy.hypot(vx[steer], vy[steer])
+        y[steer] += ny[steer]*depth[steer]
+        vx[steer] = speed*numpy.sin(angle)
+        vy[steer] = speed*numpy.cos(angle)
+
+        # Ball.handleBrickCollision reflects the rest about the contact normal
+        bounce = brick | (paddle & ~steer)
+        x[bounce] += nx[bounce]*depth[bounce]
+        y[bounce] += ny[bounce]*depth[bounce]
+        dot = vx*nx + vy*ny
+        bounce &= dot < 0.0
+        vx[bounce] -= 2.0*dot[bounce]*nx[bounce]
+        vy[bounce] -= 2.0*dot[bounce]*ny[bounce]
+        self._bricks[self._index[brick], row[brick], col[brick]] = False
+        self._left -= brick
+        rewards = brick.astype(float)
+
+        # Ball.handleWallCollision
+        side = (x < 0.0) | (x+size > config.GAME_WIDTH)
+        top  = ~side & (y+size > config.GAME_HEIGHT)
+        lost = ~side & ~top & (y < 0.0) & (vy < 0.0)
+        vx[side] *= -1
+        vy[top]  *= -1
+
+        # A lost ball is served again right away
+        rewards -= lost
+        self._lives -= lost
+        self._steps += 1
+        info = {'bricks': self._left.copy(), 'lives': self._lives.copy()}
+
+        dones = (self._left == 0) | (self._lives == 0)
+        if self._limit is not None:
+            dones |= self._steps >= self._limit
+        serve = lost & ~dones
+        if serve.any():
+            self._serve(self._index[serve])
+        if dones.any():
+            self._restart(self._index[dones])
+
+        return self._observe(), rewards, dones, info
+
+    # HELPER METHODS
+
+    def _restart(self, games):
+        """Starts new games in the given slots.
+
+            :param games: the slots to restart
+            **Precondition**: an int array of game indices"""
+        self._paddle[games] = 0.0
+        self._bricks[games] = True
+        self._left[games] = self._config.BRICK_COUNT
+        self._lives[games] = self._config.NUMBER_TURNS
+        self._steps[games] = 0
+        self._serve(games)
+
+    def _serve(self, games):
+        """Serves a new ball in the given slots, just like Ball.__init__.
+
+            :param games: the slots to serve in
+            **Precondition**: an int array of game indices"""
+        config = self._config
+        for game in games:
+            rand = self._random[game]
+            self._ball[0, game] = config.GAME_WIDTH // 2 - config.BALL_SIZE/2.0
+            self._ball[1, game] = config.GAME_HEIGHT // 2 - config.BALL_SIZE/2.0
+            self._ball[2, game] = rand.uniform(1.0, 5.0)*rand.choice([-1, 1])
+            self._ball[3, game] = -rand.uniform(1.0, 5.0)
+
+    def _observe(self):
+        """Returns: the observation buffer, filled in from the current state"""
+        self._obs[:, 0:4] = self._ball.T
+        self._obs[:, 4] = self._paddle
+        self._obs[:, OBS_DYNAMICS:] = self._bricks.reshape(self._count, -1)
+        return self._obs
+
+
+def observationSize(config=None):
+    """Returns: the number of values in the observation of one game
+
+        :param config: the settings of the games
+        **Precondition**: a GameConfig with no LEVEL_FILE and POWERUP_EVERY 0,
+        or None for DEFAULT_CONFIG"""
+    config = DEFAULT_CONFIG if config is None else config
+    _checkConfig(config)
+    return OBS_DYNAMICS+config.BRICK_COUNT
+
+
+def _checkConfig(config):
+    """Checks that the games of a configuration can be vectorized.
+
+        :param config: the settings of the games
+        **Precondition**: a GameConfig"""
+    assert config.LEVEL_FILE is None, \
+        repr(config.LEVEL_FILE)+' is a level file, but only the default layout is supported'
+    assert config.POWERUP_EVERY == 0, \
+        'power-ups are not supported (POWERUP_EVERY is '+repr(config.POWERUP_EVERY)+')'
+
+
+def _contact(cx, cy, radius, left, bottom, right, top):
+    """Returns: a tuple (nx, ny, depth, touch) for circles against boxes
+
+    This is Ball.getContact for many balls at once.  The value of touch is True
+    where the circle touches the box, and (nx, ny) and depth are the normal and
+    depth of that contact.  They are meaningless where touch is False.
+
+    Precondition: cx, cy are the centers of the circles, and left, bottom,
+    right, top the sides of the boxes, all float arrays of the same shape (or
+    numbers).  radius is a number > 0."""
+    dx = cx - numpy.clip(cx, left, right)
+    dy = cy - numpy.clip(cy, bottom, top)
+    distance = numpy.sqrt(dx*dx + dy*dy)
+    touch = distance <= radius
+    outside = distance > 0.0
+    scale = numpy.where(outside, distance, 1.0)
+    nx = dx / scale
+    ny = dy / scale
+    depth = radius - distance
+
+    # A center inside its box leaves by the nearest side.  The sides are in
+    # the order Ball.getContact breaks ties in.
+    inside = ~outside
+    if inside.any():
+        sides = numpy.array(numpy.broadcast_arrays(cx-left, cy-bottom, top-cy, right-cx))
+        side = numpy.argmin(sides, axis=0)
+        nx[inside] = numpy.array([-1.0, 0.0, 0.0, 1.0])[side[inside]]
+        ny[inside] = numpy.array([0.0, -1.0, 1.0, 0.0])[side[inside]]
+        depth[inside] = radius + sides.min(axis=0)[inside]
+    return nx, ny, depth, touch
+
+
+def _brick(row, col, config):
+    """Returns: a tuple (left, bottom, right, top) of the bricks at row, col
+
+    Precondition: row, col are int arrays of the same shape, and config is the
+    GameConfig of the brick wall."""
+    left = config.BRICK_SEP_H//2 + col*(config.BRICK_SEP_H + config.BRICK_WIDTH)
+    bottom = config.GAME_HEIGHT - config.BRICK_Y_OFFSET - \
+             row*(config.BRICK_HEIGHT + config.BRICK_SEP_V)
+    return (left.astype(float), bottom.astype(float),
+            (left+config.BRICK_WIDTH).astype(float),
+            (bottom+config.BRICK_HEIGHT).astype(float))
+
+
+def _cell(x, y, config):
+    """Returns: a tuple (row, col, inside) for the points (x,y)
+
+    The row and column are the brick grid cell of each point.  The value of
+    inside is True if the point is inside that brick, so it is False in the
+    separations between bricks and outside the grid.
+
+    Precondition: x, y are float arrays of the same shape, and config is the
+    GameConfig of the brick wall."""
+    pitch_x = config.BRICK_SEP_H + config.BRICK_WIDTH
+    pitch_y = config.BRICK_HEIGHT + config.BRICK_SEP_V
+
+    dx = x - config.BRICK_SEP_H//2
+    col = numpy.floor(dx / pitch_x).astype(int)
+    inside = (col >= 0) & (col < config.BRICKS_IN_ROW) & \
+             (dx - col*pitch_x <= config.BRICK_WIDTH)
+
+    # Rows count down from the top row, which has its top at top_y
+    top_y = config.GAME_HEIGHT - config.BRICK_Y_OFFSET + config.BRICK_HEIGHT
+    dy = top_y - y
+    row = numpy.floor(dy / pitch_y).astype(int)
+    inside &= (row >= 0) & (row < config.BRICK_ROWS) & \
+              (dy - row*pitch_y <= config.BRICK_HEIGHT)
+
+    numpy.clip(col, 0, config.BRICKS_IN_ROW-1, out=col)
+    numpy.clip(row, 0, config.BRICK_ROWS-1, out=row)
+    return row, col, inside
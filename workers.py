@@ -0,0 +1,239 @@
+# workers.py
+# Honora Ip, hi52
+# December 12, 2014
+"""Multi-process worker module for Breakout
+
+This module spreads games of Breakout over several processes.  Each worker
+process runs a VectorBreakoutEnv (see vecenv.py) for its share of the games.
+
+The workers do not send their results back through pipes.  Observations,
+rewards, done flags and the per-game brick and serve counts all live in shared
+memory, and each worker writes straight into its own rows.  The pipes only
+carry one-byte commands and acknowledgements.  The parent sees the results as
+NumPy arrays that are views of the shared memory, so nothing is copied or
+pickled per step.
+
+The pool can be stepped synchronously,
+
+    pool = WorkerPool(4, 256, seed=0)
+    obs = pool.reset()
+    obs, rewards, dones = pool.step(actions)
+
+or asynchronously, to overlap the simulation with work in the parent:
+
+    pool.stepAsync(actions)
+    ...
+    obs, rewards, dones = pool.stepWait()
+
+The arrays returned are the same shared arrays every time.  They are only
+valid until the next step."""
+import multiprocessing
+import multiprocessing.sharedctypes
+import numpy
+from constants import *
+from vecenv import *
+
+
+# Commands sent to the workers
+_RESET = b'r'
+_STEP  = b's'
+_CLOSE = b'c'
+# Acknowledgement sent by the workers
+_DONE  = b'k'
+
+
+class WorkerPool(object):
+    """An instance is a pool of processes running games of Breakout.
+
+    The games are numbered 0..count-1, and worker w runs the games
+    w*per..(w+1)*per-1, where per is the number of games per worker.
+
+    INSTANCE ATTRIBUTES:
+        _per       [int > 0]: the number of games per worker
+        _count     [int > 0]: the total number of games
+        _pipes     [list of Connection]: the command pipe of each worker
+        _processes [list of Process]: the worker processes
+        _waiting   [bool]: True if a step was started and not waited for
+        _obs       [float32 array (count, observation size)]: observations
+        _rewards   [float64 array (count,)]: rewards of the last step
+        _dones     [bool array (count,)]: done flags of the last step
+        _actions   [int32 array (count,)]: actions for the next step
+        _bricks    [int32 array (count,)]: bricks left after the last step
+        _lives     [int32 array (count,)]: serves left after the last step
+    """
+
+    # GETTERS AND SETTERS
+
+    def getCount(self):
+        """Returns: the total number of games in the pool"""
+        return self._count
+
+    def getBricks(self):
+        """Returns: the bricks left in each game after the last step"""
+        return self._bricks
+
+    def getLives(self):
+        """Returns: the serves left in each game after the last step"""
+        return self._lives
+
+    def __init__(self, workers, per, seed=None, **options):
+        """Initialize a pool and start its worker processes.
+
+            :param workers: the number of worker processes
+            **Precondition**: an int > 0
+
+            :param per: the number of games per worker
+            **Precondition**: an int > 0
+
+            :param seed: the seed of game 0 (game i uses seed+i)
+            **Precondition**: an int, or None for random seeds
+
+        The remaining keywords (speed, limit, config) are passed on to each
+        VectorBreakoutEnv."""
+        self._per = per
+        self._count = workers*per
+        self._waiting = False
+        size = observationSize(options.get('config'))
+
+        shared = {
+            'obs':     multiprocessing.sharedctypes.RawArray('f', self._count*size),
+            'rewards': multiprocessing.sharedctypes.RawArray('d', self._count),
+            'dones':   multiprocessing.sharedctypes.RawArray('b', self._count),
+            'actions': multiprocessing.sharedctypes.RawArray('i', self._count),
+            'bricks':  multiprocessing.sharedctypes.RawArray('i', self._count),
+            'lives':   multiprocessing.sharedctypes.RawArray('i', self._count),
+        }
+        views = _views(shared, self._count)
+        self._obs     = views['obs']
+        self._rewards = views['rewards']
+        self._dones   = views['dones']
+        self._actions = views['actions']
+        self._bricks  = views['bricks']
+        self._lives   = views['lives']
+
+        self._pipes = []
+        self._processes = []
+        for worker in range(workers):
+            parent, child = multiprocessing.Pipe()
+            wseed = None if seed is None else seed+worker*per
+            process = multiprocessing.Process(target=_work,
+                args=(child, shared, self._count, worker*per, per, wseed, options))
+            process.daemon = True
+            process.start()
+            child.close()
+            self._pipes.append(parent)
+            self._processes.append(process)
+
+    def reset(self):
+        """Returns: the first observation of every game (a shared array)"""
+        self._send(_RESET)
+        self._wait()
+        return self._obs
+
+    def step(self, actions):
+        """Returns: a tuple (observations, rewards, dones) after one frame
+
+        The results are shared arrays that are overwritten by the next step.
+        See VectorBreakoutEnv.step for the meaning of the results.
+
+            :param actions: the action for each game
+            **Precondition**: an int array of shape (count,)"""
+        self.stepAsync(actions)
+        return self.stepWait()
+
+    def stepAsync(self, actions):
+        """Starts a step of every game, without waiting for it to finish.
+
+            :param actions: the action for each game
+            **Precondition**: an int array of shape (count,)"""
+        assert not self._waiting, 'the last step has not been waited for'
+        self._actions[:] = actions
+        self._send(_STEP)
+        self._waiting = True
+
+    def stepWait(self):
+        """Returns: a tuple (observations, rewards, dones) for the step started
+        by stepAsync, once every worker has finished it."""
+        assert self._waiting, 'no step has been started'
+        self._wait()
+        self._waiting = False
+        return (self._obs, self._rewards, self._dones)
+
+    def close(self):
+        """Stops the worker processes."""
+        if self._waiting:
+            self.stepWait()
+        for pipe in self._pipes:
+            try:
+                pipe.send_bytes(_CLOSE)
+            except (IOError, EOFError):
+                pass
+        for process in self._processes:
+            process.join()
+        for pipe in self._pipes:
+            pipe.close()
+        self._pipes = []
+        self._processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # HELPER METHODS
+
+    def _send(self, command):
+        """Sends a command to every worker."""
+        for pipe in self._pipes:
+            pipe.send_bytes(command)
+
+    def _wait(self):
+        """Waits for every worker to acknowledge its last command."""
+        for pipe in self._pipes:
+            if pipe.recv_bytes() != _DONE:
+                raise RuntimeError('worker failed')
+
+
+def _views(shared, count):
+    """Returns: a dictionary of NumPy views of the shared arrays"""
+    obs = numpy.frombuffer(shared['obs'], dtype=numpy.float32).reshape(count, -1)
+    return {'obs':     obs,
+            'rewards': numpy.frombuffer(shared['rewards'], dtype=numpy.float64),
+            'dones':   numpy.frombuffer(shared['dones'], dtype=numpy.int8).view(bool),
+            'actions': numpy.frombuffer(shared['actions'], dtype=numpy.int32),
+            'bricks':  numpy.frombuffer(shared['bricks'], dtype=numpy.int32),
+            'lives':   numpy.frombuffer(shared['lives'], dtype=numpy.int32)}
+
+
+def _work(pipe, shared, count, first, per, seed, options):
+    """The body of a worker process.
+
+    The worker runs games first..first+per-1, and writes their results into
+    its rows of the shared arrays."""
+    views = _views(shared, count)
+    rows = slice(first, first+per)
+    env = VectorBreakoutEnv(per, seed=seed, buffer=views['obs'][rows], **options)
+
+    try:
+        while True:
+            command = pipe.recv_bytes()
+            if command == _STEP:
+                obs, rewards, dones, info = env.step(views['actions'][rows])
+                views['rewards'][rows] = rewards
+                views['dones'][rows] = dones
+                views['bricks'][rows] = info['bricks']
+                views['lives'][rows] = info['lives']
+            elif command == _RESET:
+                env.reset()
+                views['rewards'][rows] = 0.0
+                views['dones'][rows] = False
+                views['bricks'][rows] = env.getBricks().reshape(per, -1).sum(axis=1)
+                views['lives'][rows] = env.getConfig().NUMBER_TURNS
+            else:
+                break
+            pipe.send_bytes(_DONE)
+    except (KeyboardInterrupt, EOFError):
+        pass
+    finally:
+        pipe.close()